@@ -2,6 +2,10 @@
 ASGI config for attendance_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Билдирмелердин агымы (SSE жана long-poll, core.notification_stream) Django'дон
+мурун өзүнчө багытталат - узак туташуулар middleware жана thread'терди кармабайт.
+Ишке киргизүү ASGI сервери менен, мисалы:
+    gunicorn attendance_system.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +17,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_system.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Django орнотулгандан кийин гана (моделдер керек)
+from core import notification_stream  # noqa: E402
+
+STREAM_PATHS = (notification_stream.STREAM_PATH, notification_stream.POLL_PATH)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] in STREAM_PATHS:
+        await notification_stream.application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -33,22 +33,19 @@ def site_config(request):
 def unread_notifications(request):
     """
     Окулбаган билдирүүлөрдүн санын template ичинде жеткиликтүү кылат
+    (жеке жана жалпы билдирмелер - core.unread_counter эсептегичинин бир сабы)
     """
     if request.user.is_authenticated:
         try:
-            from core.models import Notification
-            count = Notification.objects.filter(
-                user=request.user,
-                is_read=False
-            ).count()
+            from core.unread_counter import get_count
             return {
-                'unread_notifications_count': count
+                'unread_notifications_count': get_count(request.user.pk)
             }
         except Exception as e:
-            # Эгер модель жок болсо же ката болсо
+            # Эгер таблица жок болсо же ката болсо
             return {
                 'unread_notifications_count': 0
             }
     return {
         'unread_notifications_count': 0
-    }
\ No newline at end of file
+    }
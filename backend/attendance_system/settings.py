@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 from .site_config import *  # Site configuration импорту
 
 import os
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
 ]
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',  # SQL/убакыт/көлөм метрикалары - бардыгын ороп турат
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS - CommonMiddleware алдында болуш керек
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -185,11 +187,110 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# ============= КЭШ =============
+
+# Эскиртүү жана JWT чакыртып алуу маалымат базасына таянат - LocMem менен да бир нече worker туура иштейт.
+# Жалпы backend (Redis/Memcached) principal'дарды жана JWT абалын да кэштөөгө мүмкүндүк берет (SHARED_CACHE)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'attendance-default'),
+    }
+}
+
+# Жумалык расписаниенин кэшинин мөөнөтү (секунд) - версиялары маалымат базасында (core.schedule_cache),
+# ошондуктан LocMem менен да өзгөртүү бардык процесстерге дароо жетет
+SCHEDULE_CACHE_TIMEOUT = int(os.getenv('SCHEDULE_CACHE_TIMEOUT', '600'))
+
+# Кэш бардык процесстерге жалпыбы (Redis/Memcached ж.б.) - LocMem/Dummy процесске жергиликтүү
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Колдонуучунун ролу жана жазуулары (core.principal) кэштелген мөөнөт (секунд), 0 - өчүк
+# Эскиртүү кэштеги версия аркылуу - жалпы кэш жок болсо демейки боюнча өчүк, антпесе
+# башка процесстер эски ролду/балдарды мөөнөт бүткөнчө колдонуп калат
+PRINCIPAL_CACHE_TIMEOUT = int(os.getenv('PRINCIPAL_CACHE_TIMEOUT', '300' if SHARED_CACHE else '0'))
+
+# ============= ФОНДУК ОТЧЕТТОР =============
+
+# Бүткөн отчет жумуштары (жана файлдары) канча күн сакталат - run_report_worker тазалайт
+REPORT_JOB_RETENTION_DAYS = int(os.getenv('REPORT_JOB_RETENTION_DAYS', '7'))
+
+# ============= КЕЛБЕГЕНДИК ЭСКЕРТҮҮЛӨРҮ =============
+
+# Акыркы ABSENCE_ALERT_DAYS күндө ABSENCE_ALERT_THRESHOLD жолудан кем эмес келбеген
+# студенттин ата-энелерине жана мугалимдерине (manage.py check_excessive_absences)
+ABSENCE_ALERT_DAYS = int(os.getenv('ABSENCE_ALERT_DAYS', '10'))
+ABSENCE_ALERT_THRESHOLD = int(os.getenv('ABSENCE_ALERT_THRESHOLD', '3'))
+
+# ============= МОБИЛДИК SYNC =============
+
+# Өзгөрүүлөр журналы канча күн сакталат (manage.py prune_changelog) -
+# мындан эски токен менен келген кардар толук snapshot алат
+CHANGELOG_RETENTION_DAYS = int(os.getenv('CHANGELOG_RETENTION_DAYS', '30'))
+
+# ============= БИЛДИРМЕЛЕРДИН АГЫМЫ (SSE) =============
+
+# Агымдарды ойготуучу брокер: InProcessBroker - бир ASGI worker,
+# ChangeLogBroker - бир нече worker/сервер (sync журналын окуйт)
+NOTIFICATION_STREAM_BACKEND = os.getenv(
+    'NOTIFICATION_STREAM_BACKEND', 'core.notification_stream.InProcessBroker'
+)
+# ChangeLogBroker журналды канча секунд сайын текшерет
+NOTIFICATION_STREAM_POLL_SECONDS = float(os.getenv('NOTIFICATION_STREAM_POLL_SECONDS', '2'))
+# Агымдын тикети канча секунд жарактуу
+NOTIFICATION_STREAM_TICKET_SECONDS = int(os.getenv('NOTIFICATION_STREAM_TICKET_SECONDS', '60'))
+
+# ============= ЛОГДОР ЖАНА МЕТРИКАЛАР =============
+
+# CORE_DEBUG=1 - core.* модулдарынын debug каналын (жана диагностикалык суроолорду) күйгүзөт
+CORE_DEBUG = os.getenv('CORE_DEBUG', '0') == '1'
+
+# manage.py test - сурамдардын логу демейки боюнча басылат
+TESTING = sys.argv[1:2] == ['test']
+
+# Ар бир сурамдын метрикалары (core.requests логу жана /metrics/)
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'True') == 'True'
+
+# /metrics/ үчүн Bearer токен (бош болсо staff колдонуучулар гана көрөт)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'core.instrumentation.JsonFormatter'},
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': os.getenv('LOG_FORMAT', 'json'),
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': 'DEBUG' if CORE_DEBUG else 'INFO',
+            'propagate': False,
+        },
+        'core.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'WARNING' if TESTING else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # ============= REST FRAMEWORK НАСТРОЙКАЛАРЫ =============
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # JWT биринчи
+        # JWT биринчи - кирүүдө берилген токенден User жана principal (core.authentication).
+        # Чакыртып алуу маалымат базасында - ар бир сурамда бир кичи суроо (жалпы кэш болсо кэштен)
+        'core.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
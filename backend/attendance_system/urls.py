@@ -6,8 +6,8 @@ from django.conf.urls.static import static
 from django.views.generic import RedirectView
 from django.conf.urls.i18n import i18n_patterns
 from django.http import JsonResponse
-from rest_framework_simplejwt.views import TokenRefreshView
-from core.jwt_views import CustomTokenObtainPairView
+from core.jwt_views import CustomTokenObtainPairView, CustomTokenRefreshView
+from core.instrumentation import metrics_view
 
 def chrome_devtools_json(request):
     """Chrome DevTools үчүн жооп"""
@@ -19,9 +19,11 @@ urlpatterns = [
     path('.well-known/appspecific/com.chrome.devtools.json', chrome_devtools_json, name='chrome_devtools'),
     # JWT Authentication endpoints (i18n patterns'тен тышкары)
     path('api/auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/auth/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     # REST API endpoints (i18n'сиз)
     path('api/v1/', include('core.api_urls')),
+    # Prometheus метрикалары (i18n'сиз)
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 # Add i18n patterns for multilingual URLs
@@ -0,0 +1,130 @@
+"""
+Көп жолу келбеген студенттер боюнча эскертүүлөр
+Акыркы ABSENCE_ALERT_DAYS күндө ABSENCE_ALERT_THRESHOLD жолудан кем эмес келбеген студенттин
+ата-энелерине жана группасы менен иштеген мугалимдерге билдирме жөнөтүлөт.
+- Келбегендер бир GROUP BY суроосу менен саналат
+- Жаңы белгиленген студенттердин ата-энелери жана мугалимдери - бир UNION суроосу
+- Бардык билдирмелер бир bulk_create менен
+- AbsenceAlert - ар бир студент чекке жеткенде бир гана жолу эскертилет,
+  саны чектен түшкөндө абал тазаланат
+Ишке киргизүү: manage.py check_excessive_absences (cron менен күнүнө бир жолу)
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Value
+
+from . import sync, unread_counter
+from .models import AbsenceAlert, Attendance, Notification, Student
+
+
+def alert_days():
+    return getattr(settings, 'ABSENCE_ALERT_DAYS', 10)
+
+
+def alert_threshold():
+    return getattr(settings, 'ABSENCE_ALERT_THRESHOLD', 3)
+
+
+def flagged_students(since, threshold):
+    """
+    {student_id: келбеген саны} - since'тен бери threshold жолудан кем эмес
+    Өчүрүлгөн студенттин жолдору (student=NULL) саналбайт
+    """
+    return dict(
+        Attendance.objects.filter(date__gte=since, status='Absent', student__isnull=False)
+        .order_by().values('student_id').annotate(total=Count('id'))
+        .filter(total__gte=threshold).values_list('student_id', 'total')
+    )
+
+
+def alert_recipients(student_ids):
+    """
+    {student_id: {'parents': {user_id, ...}, 'teachers': {user_id, ...}}} - бир суроо
+    Мугалимдер - студенттин группасынын расписаниесиндеги сабактардын мугалимдери
+    """
+    students = Student.objects.filter(pk__in=student_ids).order_by()
+    parents = students.filter(parents__isnull=False).annotate(role=Value('parents')).values_list(
+        'id', 'parents__user_id', 'role',
+    )
+    teachers = students.filter(group__schedule__subject__teacher__user__isnull=False).annotate(
+        role=Value('teachers'),
+    ).values_list('id', 'group__schedule__subject__teacher__user_id', 'role')
+
+    recipients = {student_id: {'parents': set(), 'teachers': set()} for student_id in student_ids}
+    for student_id, user_id, role in parents.union(teachers):
+        recipients[student_id][role].add(user_id)
+    return recipients
+
+
+def build_notifications(student, absence_count, days, recipients):
+    """Студенттин ата-энелерине жана мугалимдерине билдирмелер (сакталбаган)"""
+    title = f'⚠️ {student.name} көп жолу келбеди'
+    notifications = [
+        Notification(
+            recipient_id=user_id,
+            notification_type='ABSENCE',
+            title=title,
+            message=f'Сиздин балаңыз {student.name} соңку {days} күн ичинде {absence_count} жолу сабактан келген жок. Анын себебин аныктап, зарыл чараларды көрүүгө өтүнөбүз.',
+            student=student,
+        )
+        for user_id in sorted(recipients['parents'])
+    ]
+    if student.group:
+        notifications += [
+            Notification(
+                recipient_id=user_id,
+                notification_type='ABSENCE',
+                title=title,
+                message=f'Студент {student.name} ({student.group.name}) соңку {days} күн ичинде {absence_count} жолу сабактан келген жок.',
+                student=student,
+            )
+            for user_id in sorted(recipients['teachers'])
+        ]
+    return notifications
+
+
+def check_excessive_absences(days=None, threshold=None, today=None, dry_run=False):
+    """
+    Эскертүүлөрдү жаңылоо жана жаңы чекке жеткендерге билдирме жөнөтүү
+    Натыйжа: {'flagged', 'alerted', 'cleared', 'notifications'}
+    """
+    days = alert_days() if days is None else days
+    threshold = alert_threshold() if threshold is None else threshold
+    since = (today or date.today()) - timedelta(days=days)
+
+    flagged = flagged_students(since, threshold)
+    active = set(AbsenceAlert.objects.values_list('student_id', flat=True))
+    new_ids = sorted(set(flagged) - active)
+    cleared_ids = sorted(active - set(flagged))
+
+    notifications = []
+    if new_ids:
+        recipients = alert_recipients(new_ids)
+        students = Student.objects.select_related('group').in_bulk(new_ids)
+        for student_id in new_ids:
+            notifications += build_notifications(
+                students[student_id], flagged[student_id], days, recipients[student_id],
+            )
+
+    report = {
+        'flagged': len(flagged),
+        'alerted': len(new_ids),
+        'cleared': len(cleared_ids),
+        'notifications': len(notifications),
+    }
+    if dry_run:
+        return report
+
+    with transaction.atomic():
+        AbsenceAlert.objects.filter(student_id__in=cleared_ids).delete()
+        AbsenceAlert.objects.bulk_create(
+            [AbsenceAlert(student_id=student_id, absence_count=flagged[student_id]) for student_id in new_ids],
+            ignore_conflicts=True,
+        )
+        # bulk_create сигналдарды чакырбайт - sync журналы жана эсептегич түздөн-түз
+        Notification.objects.bulk_create(notifications)
+        sync.record_changes(notifications)
+        unread_counter.notifications_created(notifications)
+    return report
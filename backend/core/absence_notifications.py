@@ -0,0 +1,115 @@
+"""
+Катышпагандар тууралуу мугалимге билдирмелер
+Белгилөө сурамынын ичинде эч нерсе жазылбайт: транзакцияда түзүлгөн катышпагандар
+чогултулуп, commit'тен кийин бир жолу иштетилет (transaction.on_commit).
+- Бир сабак (мугалим, сабак, күн) - бир билдирме: "5 студент X сабагына катышкан жок"
+- Мугалимдер жана студенттер бир суроо менен, билдирмелер бир bulk_create менен -
+  группаны белгилөөнүн баасы студенттердин санына көз каранды эмес
+- Транзакция артка кайтарылса, билдирме жок; commit'ке чейин статусу өзгөргөндөр өткөрүлөт
+Чогултуу транзакция ичинде болгондо гана биригет: бир нече Attendance'ты save() менен
+жазган көрүнүштөр циклди transaction.atomic() ичинде аткарат.
+"""
+import threading
+
+from django.db import transaction
+
+from . import sync, unread_counter
+from .models import Attendance, Notification
+
+_local = threading.local()
+
+
+class _Batch:
+    """Бир транзакцияда түзүлгөн катышпагандардын id'лери - on_commit чакыруусу"""
+
+    def __init__(self):
+        self.attendance_ids = set()
+
+    def __call__(self):
+        send_absence_notifications(self.attendance_ids)
+
+
+def _current_batch():
+    """
+    Учурдагы транзакциянын топтому же None
+    Транзакция (же анын savepoint'и) артка кайтарылганда Django on_commit чакырууларын
+    алып салат - ошондуктан топтом ошол тизмеде калганда гана жарактуу
+    """
+    batch = getattr(_local, 'batch', None)
+    if batch is None:
+        return None
+    connection = transaction.get_connection()
+    if any(callback is batch for _, callback, *_ in connection.run_on_commit):
+        return batch
+    return None
+
+
+def collect(attendances):
+    """
+    Жаңы түзүлгөн Attendance'тардын катышпагандарын commit'тен кийинки билдирмеге кошуу
+    Транзакциядан тышкары (autocommit) дароо жөнөтүлөт
+    """
+    ids = {attendance.pk for attendance in attendances if attendance.status == 'Absent' and attendance.pk}
+    if not ids:
+        return
+    batch = _current_batch()
+    if batch is not None:
+        batch.attendance_ids |= ids
+        return
+    batch = _local.batch = _Batch()
+    batch.attendance_ids |= ids
+    transaction.on_commit(batch)
+
+
+def lesson_notification(teacher_user_id, subject_name, lesson_date, students):
+    """Бир сабактын катышпагандары - бир билдирме (сакталбаган); students: [(id, аты), ...]"""
+    if len(students) == 1:
+        student_id, name = students[0]
+        return Notification(
+            recipient_id=teacher_user_id,
+            notification_type='ABSENCE',
+            title='Студент катышкан жок',
+            message=f"{name} {subject_name} сабагына катышкан жок ({lesson_date}).",
+            student_id=student_id,
+        )
+    names = ', '.join(name for _, name in students)
+    return Notification(
+        recipient_id=teacher_user_id,
+        notification_type='ABSENCE',
+        title='Студенттер катышкан жок',
+        message=f"{len(students)} студент {subject_name} сабагына катышкан жок ({lesson_date}): {names}.",
+    )
+
+
+def send_absence_notifications(attendance_ids):
+    """
+    Катышпагандар боюнча сабактын мугалимине билдирмелер - бир окуу, бир bulk_create
+    Мурунку абалы сакталбаган (артка кайтарылган же статусу өзгөргөн) жолдор өткөрүлөт
+    """
+    if not attendance_ids:
+        return []
+    rows = (
+        Attendance.objects.filter(
+            pk__in=attendance_ids, status='Absent',
+            student__isnull=False, subject__teacher__user__isnull=False,
+        )
+        .order_by('subject_id', 'date', 'student__name')
+        .values_list('subject__teacher__user_id', 'subject_id', 'subject__subject_name', 'date',
+                     'student_id', 'student__name')
+    )
+    lessons = {}
+    for teacher_user_id, subject_id, subject_name, lesson_date, student_id, student_name in rows:
+        lessons.setdefault((teacher_user_id, subject_id, lesson_date), (subject_name, []))[1].append(
+            (student_id, student_name)
+        )
+    notifications = [
+        lesson_notification(teacher_user_id, subject_name, lesson_date, students)
+        for (teacher_user_id, _, lesson_date), (subject_name, students) in lessons.items()
+    ]
+    if notifications:
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications)
+            # bulk_create сигналдарды чакырбайт - sync журналы жана эсептегич түздөн-түз
+            sync.record_changes(notifications)
+            unread_counter.notifications_created(notifications)
+    return notifications
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     UserProfile, Student, Teacher, Course, Group, Subject, 
-    Schedule, TimeSlot, Attendance, LeaveRequest, Notification
+    Schedule, TimeSlot, Attendance, LeaveRequest, Notification, ReportJob, ChangeLog, DataVersion,
+    UnreadNotificationCounter, BroadcastNotification, AbsenceAlert
 )
 
 @admin.register(TimeSlot)
@@ -128,3 +129,38 @@ class NotificationAdmin(admin.ModelAdmin):
     list_display = ('title', 'recipient', 'notification_type', 'is_read')
     list_filter = ('notification_type', 'is_read')
     search_fields = ('title',)
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('created_by__username',)
+    readonly_fields = ('worker', 'claim_token', 'attempts', 'started_at', 'heartbeat_at', 'finished_at')
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ('id', 'model', 'object_id', 'action', 'group_id', 'student_id', 'user_id', 'created_at')
+    list_filter = ('model', 'action')
+    search_fields = ('object_id',)
+
+@admin.register(DataVersion)
+class DataVersionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'version', 'updated_at')
+    readonly_fields = ('version', 'updated_at')
+
+@admin.register(UnreadNotificationCounter)
+class UnreadNotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'count', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('count', 'updated_at')
+
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    list_display = ('title', 'notification_type', 'role', 'group', 'course', 'sender', 'created_at')
+    list_filter = ('notification_type', 'role')
+    search_fields = ('title', 'message')
+
+@admin.register(AbsenceAlert)
+class AbsenceAlertAdmin(admin.ModelAdmin):
+    list_display = ('student', 'absence_count', 'created_at')
+    search_fields = ('student__name',)
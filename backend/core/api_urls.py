@@ -4,9 +4,10 @@ from rest_framework.authtoken.views import obtain_auth_token
 from .api_views import (
     StudentViewSet, TeacherViewSet, TimeSlotViewSet, AttendanceViewSet, LeaveRequestViewSet,
     NotificationViewSet, CourseViewSet, GroupViewSet,
-    SubjectViewSet, ScheduleViewSet, ReportViewSet
+    SubjectViewSet, ScheduleViewSet, ReportViewSet, ReportJobViewSet
 )
 from .dashboard_api import dashboard_stats, profile_update, change_password, change_username, delete_profile_photo
+from .sync_api import reference_snapshot, sync_changes
 
 # API Router
 router = DefaultRouter()
@@ -21,6 +22,7 @@ router.register(r'groups', GroupViewSet)
 router.register(r'subjects', SubjectViewSet)
 router.register(r'schedules', ScheduleViewSet)
 router.register(r'reports', ReportViewSet, basename='report')
+router.register(r'report-jobs', ReportJobViewSet)
 
 urlpatterns = [
     # Dashboard stats
@@ -34,6 +36,10 @@ urlpatterns = [
     path('profile/change-username/', change_username, name='change_username'),
     path('profile/delete-photo/', delete_profile_photo, name='delete_profile_photo'),
     
+    # Мобилдик тиркеменин delta-sync'и
+    path('sync/', sync_changes, name='sync_changes'),
+    path('reference/', reference_snapshot, name='reference_snapshot'),
+    
     # API endpoints
     path('', include(router.urls)),
     
@@ -3,38 +3,102 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
-from django.db.models import Count, Q
+from rest_framework.pagination import CursorPagination
+from django.db.models import Count
 from datetime import date, timedelta
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse, StreamingHttpResponse
+import logging
 
 from .models import (
-    UserProfile, Student, Teacher, Course, Group, Subject,
-    Schedule, Attendance, LeaveRequest, Notification
+    Student, Teacher, Course, Group, Subject,
+    Schedule, Attendance, LeaveRequest, Notification, ReportJob, BroadcastNotification
 )
 from .serializers import (
-    UserProfileSerializer, StudentSerializer, TeacherSerializer,
+    StudentSerializer, TeacherSerializer,
     CourseSerializer, GroupSerializer, SubjectSerializer,
     ScheduleSerializer, AttendanceSerializer, AttendanceCreateSerializer,
     LeaveRequestSerializer, LeaveRequestCreateSerializer,
-    NotificationSerializer, AttendanceStatsSerializer, GroupStatsSerializer
+    NotificationSerializer, BroadcastNotificationSerializer, AttendanceStatsSerializer, GroupStatsSerializer,
+    ReportJobSerializer, group_student_counts, week_attendance_map
+)
+from .attendance_bulk import bulk_mark_attendance
+from .report_jobs import submit_job
+from .reports import (
+    ATTENDANCE_REPORT_MAX_PAGE_SIZE, ATTENDANCE_REPORT_PAGE_SIZE, attendance_report_page,
+    stream_attendance_csv, stream_attendance_ndjson,
+)
+from .principal import get_principal
+from .rollup import rollup_queryset
+from . import broadcasts, data_versions, notification_stream, sync, unread_counter
+from .statistics import (
+    EMPTY_COUNTS, GRANULARITIES, MAX_BUCKETS, annotate_group_counts, bucket_count, get_status_counts,
+    get_group_status_counts, get_status_time_series,
 )
 
+logger = logging.getLogger(__name__)
+
 class RoleBasedPermission(permissions.BasePermission):
     """Ролго негизделген кирүү укуктары"""
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        return hasattr(request.user, 'userprofile')
+        return get_principal(request).has_profile
 
 class AdminOrManagerPermission(permissions.BasePermission):
     """Админ же менеджер укугу"""
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        try:
-            return request.user.userprofile.role in ['ADMIN', 'MANAGER']
-        except:
-            return False
+        return get_principal(request).is_admin
+
+class AttendanceHistoryPagination(CursorPagination):
+    """Катышуу тарыхы үчүн курсор барактоо (OFFSET жок, жаңылары биринчи)"""
+    ordering = ('-date', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ConditionalGetMixin:
+    """
+    list/retrieve үчүн ETag/Last-Modified маалыматтын версияларынан (core.data_versions)
+    If-None-Match же If-Modified-Since дал келсе - 304, queryset окулбайт
+    """
+    version_names = ()
+    
+    def list(self, request, *args, **kwargs):
+        handler = super().list
+        return data_versions.conditional_response(
+            request, self.version_names, lambda: handler(request, *args, **kwargs)
+        )
+    
+    def retrieve(self, request, *args, **kwargs):
+        handler = super().retrieve
+        return data_versions.conditional_response(
+            request, self.version_names, lambda: handler(request, *args, **kwargs)
+        )
+
+
+def timeslot_data(timeslots):
+    """Убакыт слоттору API'дегидей тизме катары"""
+    return [
+        {
+            'id': ts.id,
+            'name': ts.name,
+            'start_time': ts.start_time.strftime('%H:%M'),
+            'end_time': ts.end_time.strftime('%H:%M'),
+            'order': ts.order
+        }
+        for ts in timeslots
+    ]
+
+
+# Compact тарыхтагы статустардын коддору: status[i] - ушул тизмедеги индекс
+HISTORY_STATUS_CODES = [choice for choice, _ in Attendance.STATUS_CHOICES]
+HISTORY_STATUS_INDEX = {status: index for index, status in enumerate(HISTORY_STATUS_CODES)}
+# STATUS_CHOICES'те жок (эски) статус
+HISTORY_UNKNOWN_STATUS = -1
 
 class StudentViewSet(viewsets.ReadOnlyModelViewSet):
     """Студенттер API"""
@@ -44,20 +108,15 @@ class StudentViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Ролго жараша фильтр"""
-        user = self.request.user
+        principal = get_principal(self.request)
         
         # UserProfile барбы текшерүү
-        try:
-            profile = user.userprofile
-        except:
+        if not principal.has_profile:
             return Student.objects.none()
             
-        if profile.role == 'STUDENT':
-            # Студент өзүн гана көрө алат
-            return Student.objects.filter(user=user)
-        elif profile.role == 'PARENT':
-            # Ата-эне өз балдарын көрөт (Student.parents related_name='parent_profiles')
-            return profile.parent_profiles.all()
+        if principal.role in ['STUDENT', 'PARENT']:
+            # Студент өзүн гана, ата-эне өз балдарын көрөт
+            return Student.objects.filter(id__in=principal.student_ids)
         else:
             # Админ, менеджер, мугалим бардыгын көрө алат
             queryset = Student.objects.all()
@@ -69,38 +128,33 @@ class StudentViewSet(viewsets.ReadOnlyModelViewSet):
             
             return queryset
 
-class TeacherViewSet(viewsets.ReadOnlyModelViewSet):
+class TeacherViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Мугалимдер API"""
     queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
     permission_classes = [IsAuthenticated, RoleBasedPermission]
+    version_names = data_versions.TEACHERS
     
     def get_queryset(self):
         """Бардык мугалимдерди кайтаруу"""
-        return Teacher.objects.all()
+        return Teacher.objects.select_related('user')
 
-class TimeSlotViewSet(viewsets.ReadOnlyModelViewSet):
+class TimeSlotViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Убакыт слоттары API"""
     from .models import TimeSlot
     queryset = TimeSlot.objects.filter(is_active=True)
     permission_classes = [IsAuthenticated, RoleBasedPermission]
+    version_names = data_versions.TIMESLOTS
     
     def list(self, request, *args, **kwargs):
         """Убакыт слоттарын тизме катары кайтаруу"""
         from .models import TimeSlot
-        timeslots = TimeSlot.objects.filter(is_active=True).order_by('order')
-        
-        data = []
-        for ts in timeslots:
-            data.append({
-                'id': ts.id,
-                'name': ts.name,
-                'start_time': ts.start_time.strftime('%H:%M'),
-                'end_time': ts.end_time.strftime('%H:%M'),
-                'order': ts.order
-            })
         
-        return Response(data)
+        def build():
+            timeslots = TimeSlot.objects.filter(is_active=True).order_by('order')
+            return Response(timeslot_data(timeslots))
+        
+        return data_versions.conditional_response(request, self.version_names, build)
 
 class AttendanceViewSet(viewsets.ModelViewSet):
     """Катышуу API"""
@@ -108,6 +162,15 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated, RoleBasedPermission]
     
+    # AttendanceSerializer колдонгон байланыштар - бир JOIN менен
+    related_fields = (
+        'student__user__userprofile', 'student__course', 'student__group__course',
+        'subject__teacher__user', 'subject__course',
+        'schedule__subject__teacher__user', 'schedule__subject__course',
+        'schedule__group__course', 'schedule__teacher__user', 'schedule__time_slot',
+        'created_by',
+    )
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return AttendanceCreateSerializer
@@ -115,25 +178,16 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Ролго жараша фильтр"""
-        user = self.request.user
+        principal = get_principal(self.request)
         queryset = Attendance.objects.all()
         
         # UserProfile барбы текшерүү
-        try:
-            profile = user.userprofile
-        except:
+        if not principal.has_profile:
             return Attendance.objects.none()
         
-        if profile.role == 'STUDENT':
-            try:
-                student = Student.objects.get(user=user)
-                queryset = queryset.filter(student=student)
-            except Student.DoesNotExist:
-                queryset = Attendance.objects.none()
-        elif profile.role == 'PARENT':
-            # Ата-энелер өз балдарынын катышуусун көрө алат
-            student_ids = profile.parent_profiles.values_list('id', flat=True)
-            queryset = queryset.filter(student_id__in=student_ids)
+        if principal.role in ['STUDENT', 'PARENT']:
+            # Студент өзүнүн, ата-энелер өз балдарынын катышуусун көрө алат
+            queryset = queryset.filter(student_id__in=principal.student_ids)
         
         # Дата фильтри
         start_date = self.request.query_params.get('start_date')
@@ -186,55 +240,14 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        created_records = []
-        updated_records = []
-        errors = []
-        
-        for record in attendance_records:
-            try:
-                # Студентти табуу
-                student = Student.objects.get(id=record.get('student_id'))
-                
-                # Бар катышууну текшерүү
-                existing = Attendance.objects.filter(
-                    student=student,
-                    date=record.get('date'),
-                    subject_id=record.get('subject_id'),
-                    time_slot_id=record.get('time_slot_id')
-                ).first()
-                
-                if existing:
-                    # Эгерде бар болсо, жаңылайбыз
-                    existing.status = record.get('status', 'Present')
-                    existing.created_by = request.user
-                    # schedule_id дагы жаңылайбыз
-                    if record.get('schedule_id'):
-                        existing.schedule_id = record.get('schedule_id')
-                    existing.save()
-                    updated_records.append(existing)
-                else:
-                    # Жаңыны түзөбүз
-                    attendance = Attendance.objects.create(
-                        student=student,
-                        date=record.get('date'),
-                        subject_id=record.get('subject_id'),
-                        time_slot_id=record.get('time_slot_id'),
-                        schedule_id=record.get('schedule_id'),  # schedule_id кошулду
-                        status=record.get('status', 'Present'),
-                        created_by=request.user
-                    )
-                    created_records.append(attendance)
-                    
-            except Student.DoesNotExist:
-                errors.append(f"Студент ID {record.get('student_id')} табылган жок")
-            except Exception as e:
-                errors.append(f"Ката: {str(e)}")
+        # Бардык жазуулар бир транзакцияда, бир нече суроо менен сакталат
+        result = bulk_mark_attendance(attendance_records, request.user)
         
         response_data = {
-            'success': len(created_records) + len(updated_records),
-            'created': len(created_records),
-            'updated': len(updated_records),
-            'errors': errors
+            'success': result['created'] + result['updated'],
+            'created': result['created'],
+            'updated': result['updated'],
+            'errors': result['errors']
         }
         
         return Response(response_data, status=status.HTTP_201_CREATED)
@@ -268,9 +281,57 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(date__lte=end_date)
         
-        # Serializer менен кайтаруу
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        paginator = AttendanceHistoryPagination()
+        
+        # Compact режими (мобилдик клиент үчүн): саптардын ордуна мамычалар
+        if request.query_params.get('compact') in ('1', 'true'):
+            rows = paginator.paginate_queryset(
+                queryset.values(
+                    'id', 'date', 'status', 'student_id', 'subject_id', 'schedule_id',
+                    'student__name', 'subject__subject_name'
+                ),
+                request, view=self
+            )
+            return Response({
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'statuses': HISTORY_STATUS_CODES,
+                'ids': [row['id'] for row in rows],
+                'dates': [row['date'].isoformat() for row in rows],
+                'status': [HISTORY_STATUS_INDEX.get(row['status'], HISTORY_UNKNOWN_STATUS) for row in rows],
+                'student_ids': [row['student_id'] for row in rows],
+                'subject_ids': [row['subject_id'] for row in rows],
+                'schedule_ids': [row['schedule_id'] for row in rows],
+                'students': {row['student_id']: row['student__name'] for row in rows},
+                'subjects': {
+                    row['subject_id']: row['subject__subject_name']
+                    for row in rows if row['subject_id'] is not None
+                },
+            })
+        
+        # Толук режим: AttendanceSerializer колдонгон байланыштар бир JOIN менен
+        page = paginator.paginate_queryset(
+            queryset.select_related(*self.related_fields), request, view=self
+        )
+        
+        # Группалардын студент сандары - бир GROUP BY суроосу
+        group_ids = set()
+        for attendance in page:
+            # Өчүрүлгөн студенттин жазуусу (student=NULL) да тарыхта калат
+            if attendance.student_id is not None:
+                group_ids.add(attendance.student.group_id)
+            if attendance.schedule:
+                group_ids.add(attendance.schedule.group_id)
+        
+        serializer = self.get_serializer(
+            page, many=True,
+            context={
+                **self.get_serializer_context(),
+                'group_student_counts': group_student_counts(group_ids),
+                'attendance_map': week_attendance_map(request.user),
+            }
+        )
+        return paginator.get_paginated_response(serializer.data)
 
 
 class LeaveRequestViewSet(viewsets.ModelViewSet):
@@ -279,6 +340,9 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     serializer_class = LeaveRequestSerializer
     permission_classes = [IsAuthenticated, RoleBasedPermission]
     
+    # LeaveRequestSerializer колдонгон байланыштар
+    related_fields = ('student__user', 'student__course', 'student__group__course', 'approved_by')
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return LeaveRequestCreateSerializer
@@ -286,49 +350,35 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Ролго жараша фильтр"""
-        user = self.request.user
-        queryset = LeaveRequest.objects.select_related('student', 'student__user', 'student__group').all()
+        principal = get_principal(self.request)
+        queryset = LeaveRequest.objects.select_related(*self.related_fields)
         
         # UserProfile барбы текшерүү
-        try:
-            profile = user.userprofile
-        except:
+        if not principal.has_profile:
             return LeaveRequest.objects.none()
         
-        if profile.role == 'STUDENT':
-            try:
-                student = Student.objects.get(user=user)
-                queryset = queryset.filter(student=student)
-            except Student.DoesNotExist:
-                queryset = LeaveRequest.objects.none()
-        elif profile.role == 'PARENT':
+        if principal.role in ['STUDENT', 'TEACHER']:
+            # Студенттер жана мугалимдер өз арыздарын көрүшөт
+            if principal.student_id is None:
+                return LeaveRequest.objects.none()
+            queryset = queryset.filter(student_id=principal.student_id)
+        elif principal.role == 'PARENT':
             # Ата-энелер өз балдарынын арыздарын көрүшөт
-            student_ids = profile.parent_profiles.values_list('id', flat=True)
-            queryset = queryset.filter(student_id__in=student_ids)
-        elif profile.role == 'TEACHER':
-            # Мугалимдер өз арыздарын көрүшөт
-            try:
-                student = Student.objects.get(user=user)
-                queryset = queryset.filter(student=student)
-            except Student.DoesNotExist:
-                queryset = LeaveRequest.objects.none()
+            queryset = queryset.filter(student_id__in=principal.children_ids)
         # ADMIN жана MANAGER бардык арыздарды көрүшөт
         
         return queryset.order_by('-created_at')
     
     def perform_create(self, serializer):
         """Бошотуу сурамын түзгөндө студентти автоматтык көрсөтүү"""
-        try:
-            profile = self.request.user.userprofile
-        except:
+        principal = get_principal(self.request)
+        if not principal.has_profile:
             raise serializers.ValidationError("Колдонуучу профили табылган жок")
         
-        if profile.role in ['STUDENT', 'TEACHER']:
-            try:
-                student = Student.objects.get(user=self.request.user)
-                serializer.save(student=student)
-            except Student.DoesNotExist:
+        if principal.role in ['STUDENT', 'TEACHER']:
+            if principal.student_id is None:
                 raise serializers.ValidationError("Студент профили табылган жок")
+            serializer.save(student_id=principal.student_id)
         else:
             raise serializers.ValidationError("Бул функция студенттер жана мугалимдер үчүн гана")
     
@@ -365,18 +415,66 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 class NotificationViewSet(viewsets.ModelViewSet):
-    """Билдирмелер API"""
+    """
+    Билдирмелер API
+    Тизме жеке билдирмелерди жана колдонуучуга тиешелүү жалпы билдирмелерди (core.broadcasts)
+    бирге берет - жалпы билдирменин id'си 'b12' түрүндө, detail/mark_read/DELETE аны кабыл алат
+    """
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ['get', 'post', 'delete', 'head', 'options']  # PUT/PATCH жок
+    related_fields = (
+        'recipient', 'sender',
+        'student__user', 'student__course', 'student__group__course',
+        'leave_request__student__user', 'leave_request__student__course',
+        'leave_request__student__group__course', 'leave_request__approved_by',
+    )
     
     def get_queryset(self):
         """Колдонуучунун өз билдирмелери"""
         return Notification.objects.filter(recipient=self.request.user).order_by('-created_at')
     
+    def user_scope(self):
+        if not hasattr(self, '_user_scope'):
+            self._user_scope = sync.user_scope(self.request.user)
+        return self._user_scope
+    
+    def get_object(self):
+        """Жалпы билдирме ('b12') - колдонуучунун аудиториясынан гана"""
+        broadcast_id = broadcasts.parse_id(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if broadcast_id is None:
+            return super().get_object()
+        return get_object_or_404(broadcasts.visible(self.user_scope()).select_related('sender'), pk=broadcast_id)
+    
+    def get_serializer(self, *args, **kwargs):
+        if args and isinstance(args[0], BroadcastNotification):
+            kwargs.setdefault('context', self.get_serializer_context())
+            return BroadcastNotificationSerializer(*args, **kwargs)
+        return super().get_serializer(*args, **kwargs)
+    
+    def list(self, request, *args, **kwargs):
+        """Жеке жана жалпы билдирмелер бир барактоодо, жаңылары биринчи"""
+        scope = self.user_scope()
+        rows = broadcasts.feed(request.user, scope)
+        page = self.paginate_queryset(rows)
+        items = broadcasts.load_feed(page if page is not None else rows, scope, self.related_fields)
+        context = self.get_serializer_context()
+        data = [
+            (BroadcastNotificationSerializer if isinstance(item, BroadcastNotification) else NotificationSerializer)(
+                item, context=context,
+            ).data
+            for item in items
+        ]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+    
     def perform_destroy(self, instance):
-        """Билдирмени өчүрүү - толук өз билдирмелерин гана"""
+        """Билдирмени өчүрүү - толук өз билдирмелерин гана, жалпы билдирме колдонуучунун өзүнөн гана"""
+        if isinstance(instance, BroadcastNotification):
+            broadcasts.dismiss(self.request.user.pk, instance)
+            return
         if instance.recipient != self.request.user:
             raise PermissionDenied("Башка адамдын билдирмелерин өчүрүүгө болбойт")
         instance.delete()
@@ -385,60 +483,131 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_read(self, request, pk=None):
         """Билдирмени окулган деп белгилөө"""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        if isinstance(notification, BroadcastNotification):
+            broadcasts.mark_read(request.user.pk, [notification])
+        else:
+            notification.is_read = True
+            notification.save()
         
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        """Бардык билдирмелерди окулган деп белгилөө"""
-        updated = Notification.objects.filter(
+        """Бардык билдирмелерди (жалпыларын да) окулган деп белгилөө"""
+        unread = list(Notification.objects.filter(
             recipient=request.user, 
             is_read=False
-        ).update(is_read=True)
+        ).only('id', 'recipient_id'))
+        updated = Notification.objects.filter(pk__in=[n.pk for n in unread], is_read=False).update(is_read=True)
+        # UPDATE сигналдарды чакырбайт - sync журналы жана эсептегич түздөн-түз
+        sync.record_changes(unread)
+        unread_counter.notifications_read(request.user.pk, updated)
+        updated += broadcasts.mark_all_read(self.user_scope())
         
         return Response({'updated': updated})
+    
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Окулбаган билдирмелердин саны (эсептегичтен жана жалпы билдирмелерден)"""
+        return Response({'unread_count': broadcasts.unread_total(self.user_scope())})
+    
+    @action(detail=False, methods=['post'])
+    def stream_ticket(self, request):
+        """Билдирмелердин агымы (SSE / long-poll) үчүн кыска мөөнөттүү тикет"""
+        return Response({
+            'ticket': notification_stream.issue_ticket(request.user),
+            'expires_in': notification_stream.ticket_seconds(),
+            'stream': notification_stream.STREAM_PATH,
+            'poll': notification_stream.POLL_PATH,
+        })
+
+class ReportJobViewSet(viewsets.ModelViewSet):
+    """
+    Фондук отчеттор API
+    POST {kind, params} - жумушту кезекке коюу (202), GET - абалын текшерүү,
+    GET {id}/download/ - даяр файлды жүктөө
+    """
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated, AdminOrManagerPermission]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']  # PUT/PATCH жок
+    
+    def get_queryset(self):
+        """Колдонуучунун өз жумуштары"""
+        return ReportJob.objects.filter(created_by=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        """Жумушту кезекке коюу - файл worker тарабынан даярдалат"""
+        params = request.data.get('params') or {}
+        if not isinstance(params, dict):
+            raise serializers.ValidationError({'params': 'Объект болушу керек'})
+        try:
+            job = submit_job(request.user, request.data.get('kind'), params)
+        except ValueError as exc:
+            raise serializers.ValidationError({'detail': str(exc)})
+        serializer = self.get_serializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+    
+    def perform_destroy(self, instance):
+        """Жумушту файлы менен өчүрүү"""
+        if instance.file:
+            instance.file.delete(save=False)
+        instance.delete()
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Даяр отчет файлы"""
+        job = self.get_object()
+        if job.status != 'DONE' or not job.file:
+            return Response(
+                {'detail': 'Отчет али даяр эмес', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        filename = job.file.name.rsplit('/', 1)[-1].split('-', 1)[-1]
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename)
 
 # ============= READ-ONLY VIEWSETS =============
 
-class CourseViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Курстар API (окуу гана)"""
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticated, RoleBasedPermission]
+    version_names = data_versions.COURSES
 
-class GroupViewSet(viewsets.ReadOnlyModelViewSet):
+class GroupViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Группалар API (окуу гана)"""
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     permission_classes = [IsAuthenticated, RoleBasedPermission]
+    version_names = data_versions.GROUPS
     
     def get_queryset(self):
-        """Курс боюнча фильтрлөө"""
-        queryset = Group.objects.all()
+        """
+        Курс боюнча фильтрлөө
+        Студент сандары (stats үчүн катышуу сандары да) аннотация катары - бир суроо
+        """
+        queryset = Group.objects.select_related('course')
         course_id = self.request.query_params.get('course', None)
         
         if course_id:
             queryset = queryset.filter(course_id=course_id)
         
+        queryset = annotate_group_counts(queryset, attendance=self.action == 'stats')
         return queryset.order_by('name')
     
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
-        """Группанын статистикасы"""
+        """Группанын статистикасы - get_object() аннотацияланган сандары менен"""
         group = self.get_object()
-        attendances = Attendance.objects.filter(student__group=group)
-        
-        total_students = Student.objects.filter(group=group).count()
-        total_records = attendances.count()
-        present_count = attendances.filter(status='Present').count()
+        total_records = group.attendance_total
+        present_count = group.attendance_present
         attendance_percentage = (present_count / total_records * 100) if total_records > 0 else 0
         
         stats_data = {
             'group_name': group.name,
-            'total_students': total_students,
+            'total_students': group.student_count,
             'total_records': total_records,
             'present_count': present_count,
             'attendance_percentage': round(attendance_percentage, 2)
@@ -447,11 +616,12 @@ class GroupViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = GroupStatsSerializer(stats_data)
         return Response(serializer.data)
 
-class SubjectViewSet(viewsets.ReadOnlyModelViewSet):
+class SubjectViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Сабактар API (окуу гана)"""
-    queryset = Subject.objects.all()
+    queryset = Subject.objects.select_related('teacher__user', 'course')
     serializer_class = SubjectSerializer
     permission_classes = [IsAuthenticated, RoleBasedPermission]
+    version_names = data_versions.SUBJECTS
 
 class ScheduleViewSet(viewsets.ModelViewSet):
     """Расписание API (CRUD)"""
@@ -459,6 +629,12 @@ class ScheduleViewSet(viewsets.ModelViewSet):
     serializer_class = ScheduleSerializer
     permission_classes = [IsAuthenticated, RoleBasedPermission]
     
+    # ScheduleSerializer'дин ичиндеги serializer'лер колдонгон байланыштар
+    related_fields = (
+        'subject__teacher__user', 'subject__course', 'teacher__user',
+        'group__course', 'time_slot',
+    )
+    
     def get_queryset(self):
         """
         Фильтрлөө логикасы:
@@ -471,85 +647,83 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         show_all = self.request.query_params.get('show_all', '').lower() == 'true'
         teacher_id = self.request.query_params.get('teacher')
         
-        print(f"🔍 ScheduleViewSet.get_queryset() - user: {user}, show_all: {show_all}, teacher_id: {teacher_id}")
+        logger.debug("ScheduleViewSet.get_queryset: user=%s, show_all=%s, teacher_id=%s", user, show_all, teacher_id)
+        principal = get_principal(self.request)
         
         if show_all:
             # Schedule бети: БААРДЫК сабактарды көрсөт
             queryset = Schedule.objects.all()
-            print(f"📋 Schedule бети: баардык {queryset.count()} сабак")
         elif teacher_id:
             # Specific teacher ID боюнча фильтрлөө
             queryset = Schedule.objects.filter(teacher_id=teacher_id)
-            print(f"✅ Teacher ID={teacher_id} боюнча {queryset.count()} сабак табылды")
-        elif hasattr(user, 'userprofile') and user.userprofile.role == 'TEACHER':
+        elif principal.role == 'TEACHER':
             # Calendar бети: мугалимдин өзүнүн гана сабактарын көрсөт
-            try:
-                teacher = Teacher.objects.get(user=user)
-                queryset = Schedule.objects.filter(teacher=teacher)
-                print(f"📅 Calendar бети: текущий мугалим {teacher.id} үчүн {queryset.count()} сабак")
-            except Teacher.DoesNotExist:
+            if principal.teacher_id is not None:
+                queryset = Schedule.objects.filter(teacher_id=principal.teacher_id)
+            else:
                 queryset = Schedule.objects.none()
-                print(f"❌ Teacher профили табылган жок!")
+                logger.warning("ScheduleViewSet: user %s үчүн Teacher профили табылган жок", user)
         else:
             # Башка роллор үчүн бардык расписаниени көрсөт
             queryset = Schedule.objects.all()
-            print(f"👥 Башка роль: бардык {queryset.count()} сабак")
         
         # Day боюнча фильтр (Monday, Tuesday, ...)
         day = self.request.query_params.get('day')
         if day:
             queryset = queryset.filter(day=day)
-            print(f"📆 Day фильтри: {day}, калды {queryset.count()} сабак")
         
         # Group боюнча фильтр
         group_id = self.request.query_params.get('group')
         if group_id:
             queryset = queryset.filter(group_id=group_id)
-            print(f"👥 Group фильтри: {group_id}, калды {queryset.count()} сабак")
         
-        return queryset.select_related('subject', 'teacher', 'group', 'group__course', 'time_slot')
+        if logger.isEnabledFor(logging.DEBUG):
+            # Диагностикалык count() debug каналы күйгүзүлгөндө гана
+            logger.debug("ScheduleViewSet: day=%s, group=%s → %d сабак", day, group_id, queryset.count())
+        
+        return queryset.select_related(*self.related_fields)
+    
+    def get_serializer_context(self):
+        """Ар бир сабакка суроо жибербөө үчүн катышуу картасы жана группалардын сандары алдын ала"""
+        context = super().get_serializer_context()
+        context['attendance_map'] = week_attendance_map(self.request.user)
+        context['group_student_counts'] = group_student_counts()
+        return context
     
     @action(detail=False, methods=['get'])
     def my_schedule(self, request):
         """Мугалимдин өз сабактары"""
-        user = request.user
+        principal = get_principal(request)
         
-        try:
-            profile = user.userprofile
-        except:
+        if not principal.has_profile:
             return Response({'error': 'Profile not found'}, status=400)
         
-        if profile.role == 'TEACHER':
-            try:
-                teacher = Teacher.objects.get(user=user)
-                queryset = Schedule.objects.filter(teacher=teacher)
-                
-                # Day фильтри
-                day = request.query_params.get('day')
-                if day:
-                    queryset = queryset.filter(day=day)
-                
-                serializer = self.get_serializer(queryset, many=True)
-                return Response(serializer.data)
-            except Teacher.DoesNotExist:
+        if principal.role == 'TEACHER':
+            if principal.teacher_id is None:
                 return Response({'error': 'Teacher profile not found'}, status=404)
-        elif profile.role == 'STUDENT':
-            try:
-                student = Student.objects.get(user=user)
-                if student.group:
-                    queryset = Schedule.objects.filter(group=student.group)
-                    
-                    # Day фильтри
-                    day = request.query_params.get('day')
-                    if day:
-                        queryset = queryset.filter(day=day)
-                    
-                    serializer = self.get_serializer(queryset, many=True)
-                    return Response(serializer.data)
-                else:
-                    return Response({'error': 'Student has no group'}, status=404)
-            except Student.DoesNotExist:
+            queryset = Schedule.objects.filter(teacher_id=principal.teacher_id).select_related(*self.related_fields)
+            
+            # Day фильтри
+            day = request.query_params.get('day')
+            if day:
+                queryset = queryset.filter(day=day)
+            
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+        elif principal.role == 'STUDENT':
+            if principal.student_id is None:
                 return Response({'error': 'Student profile not found'}, status=404)
+            if principal.student_group_id is None:
+                return Response({'error': 'Student has no group'}, status=404)
+            queryset = Schedule.objects.filter(group_id=principal.student_group_id).select_related(*self.related_fields)
+            
+            # Day фильтри
+            day = request.query_params.get('day')
+            if day:
+                queryset = queryset.filter(day=day)
+            
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
         else:
             return Response({'error': 'This endpoint is for teachers and students only'}, status=403)
     
@@ -633,6 +807,17 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 
+def role_filtered_attendance(queryset, principal):
+    """Отчеттор үчүн: мугалим - өз сабактары, студент - өзү, ата-эне - балдары, админ/менеджер - баары"""
+    if principal.role == 'TEACHER':
+        if principal.teacher_id is None:
+            return queryset.none()
+        return queryset.filter(schedule__teacher_id=principal.teacher_id)
+    if principal.role in ['STUDENT', 'PARENT']:
+        return queryset.filter(student_id__in=principal.student_ids)
+    return queryset
+
+
 class ReportViewSet(viewsets.ViewSet):
     """Reports API - көп функционалдуу отчеттор"""
     permission_classes = [IsAuthenticated, RoleBasedPermission]
@@ -640,8 +825,7 @@ class ReportViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def attendance(self, request):
         """Attendance отчету - фильтрлер менен"""
-        user = request.user
-        profile = user.userprofile
+        principal = get_principal(request)
         
         # Фильтрлер
         start_date = request.query_params.get('start_date')
@@ -652,28 +836,11 @@ class ReportViewSet(viewsets.ViewSet):
         teacher_id = request.query_params.get('teacher')
         status_filter = request.query_params.get('status')  # Present, Absent, Late
         
-        # Базалык queryset
-        queryset = Attendance.objects.all().select_related(
-            'student', 'student__user', 'student__group',
-            'subject', 'schedule', 'schedule__teacher'
-        )
+        # Базалык queryset (саптар values_list менен окулат - моделдер түзүлбөйт)
+        queryset = Attendance.objects.all()
         
         # Ролго жараша фильтр
-        if profile.role == 'TEACHER':
-            try:
-                teacher = Teacher.objects.get(user=user)
-                queryset = queryset.filter(schedule__teacher=teacher)
-            except Teacher.DoesNotExist:
-                queryset = queryset.none()
-        elif profile.role == 'STUDENT':
-            try:
-                student = Student.objects.get(user=user)
-                queryset = queryset.filter(student=student)
-            except Student.DoesNotExist:
-                queryset = queryset.none()
-        elif profile.role == 'PARENT':
-            children_ids = profile.students.values_list('id', flat=True)
-            queryset = queryset.filter(student_id__in=children_ids)
+        queryset = role_filtered_attendance(queryset, principal)
         # ADMIN/MANAGER - бардык маалыматтар
         
         # Датага карата фильтр
@@ -694,83 +861,107 @@ class ReportViewSet(viewsets.ViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Маалыматтарды форматтоо
-        attendance_data = []
-        for att in queryset.order_by('-date', 'student__user__last_name'):
-            attendance_data.append({
-                'id': att.id,
-                'date': att.date.strftime('%Y-%m-%d'),
-                'student_name': att.student.user.get_full_name() or att.student.user.username,
-                'student_id': att.student.id,
-                'group': att.student.group.name if att.student.group else '-',
-                'subject': att.subject.subject_name if att.subject else '-',
-                'teacher': att.schedule.teacher.name if att.schedule and att.schedule.teacher else '-',
-                'status': att.status,
-                'status_display': self._get_status_display(att.status),
-                'marked_at': att.marked_at.strftime('%H:%M') if att.marked_at else '-',
-                'marked_by': att.created_by.get_full_name() if att.created_by else '-',
-            })
+        filters_applied = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'group': group_id,
+            'student': student_id,
+            'subject': subject_id,
+            'teacher': teacher_id,
+            'status': status_filter,
+        }
         
-        # Статистика
-        total = queryset.count()
-        present_count = queryset.filter(status='Present').count()
-        absent_count = queryset.filter(status='Absent').count()
-        late_count = queryset.filter(status='Late').count()
+        # Агым түрүндө толук экспорт: ?output=ndjson|csv (барактоосуз, саптар iterator() менен)
+        output = request.query_params.get('output')
+        if output == 'ndjson':
+            return StreamingHttpResponse(
+                stream_attendance_ndjson(queryset), content_type='application/x-ndjson; charset=utf-8'
+            )
+        if output == 'csv':
+            response = StreamingHttpResponse(
+                stream_attendance_csv(queryset), content_type='text/csv; charset=utf-8'
+            )
+            response['Content-Disposition'] = 'attachment; filename="attendance_report.csv"'
+            return response
+        if output:
+            return Response(
+                {'error': 'output: ndjson, csv'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
+        # Keyset барактоо: ?cursor=<next_cursor>&page_size=N
+        try:
+            page_size = int(request.query_params.get('page_size', ATTENDANCE_REPORT_PAGE_SIZE))
+            attendance_data, next_cursor = attendance_report_page(
+                queryset,
+                cursor=request.query_params.get('cursor'),
+                page_size=max(1, min(page_size, ATTENDANCE_REPORT_MAX_PAGE_SIZE)),
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Статистика - бир aggregate суроо
+        counts = get_status_counts(queryset)
+        total = counts['total']
         statistics = {
             'total': total,
-            'present': present_count,
-            'absent': absent_count,
-            'late': late_count,
-            'present_percentage': round((present_count / total * 100) if total > 0 else 0, 2),
-            'absent_percentage': round((absent_count / total * 100) if total > 0 else 0, 2),
-            'late_percentage': round((late_count / total * 100) if total > 0 else 0, 2),
+            'present': counts['present'],
+            'absent': counts['absent'],
+            'late': counts['late'],
+            'present_percentage': round((counts['present'] / total * 100) if total > 0 else 0, 2),
+            'absent_percentage': round((counts['absent'] / total * 100) if total > 0 else 0, 2),
+            'late_percentage': round((counts['late'] / total * 100) if total > 0 else 0, 2),
         }
         
         return Response({
             'attendance': attendance_data,
             'statistics': statistics,
-            'filters_applied': {
-                'start_date': start_date,
-                'end_date': end_date,
-                'group': group_id,
-                'student': student_id,
-                'subject': subject_id,
-                'teacher': teacher_id,
-                'status': status_filter,
-            }
+            'next_cursor': next_cursor,
+            'filters_applied': filters_applied,
         })
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Жалпы статистика - диаграммалар үчүн"""
-        user = request.user
-        profile = user.userprofile
+        principal = get_principal(request)
         
         # Фильтрлер
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         group_id = request.query_params.get('group')
+        granularity = request.query_params.get('granularity', 'day')  # day, week, month
+        
+        if granularity not in GRANULARITIES:
+            return Response(
+                {'error': f"granularity: {', '.join(GRANULARITIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Убакыт катарынын мезгили (демейки: акыркы 7 күн)
+        try:
+            parsed_start = date.fromisoformat(start_date) if start_date else None
+            parsed_end = date.fromisoformat(end_date) if end_date else None
+        except ValueError:
+            return Response(
+                {'error': 'Дата форматы: YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if parsed_start and parsed_end:
+            current_date, end = parsed_start, parsed_end
+        else:
+            end = date.today()
+            current_date = end - timedelta(days=6)
+        if bucket_count(current_date, end, granularity) > MAX_BUCKETS[granularity]:
+            return Response(
+                {'error': f"Мезгил өтө узун: {granularity} боюнча {MAX_BUCKETS[granularity]} бөлүктөн ашпайт"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Базалык queryset
         queryset = Attendance.objects.all()
         
         # Ролго жараша фильтр
-        if profile.role == 'TEACHER':
-            try:
-                teacher = Teacher.objects.get(user=user)
-                queryset = queryset.filter(schedule__teacher=teacher)
-            except Teacher.DoesNotExist:
-                queryset = queryset.none()
-        elif profile.role == 'STUDENT':
-            try:
-                student = Student.objects.get(user=user)
-                queryset = queryset.filter(student=student)
-            except Student.DoesNotExist:
-                queryset = queryset.none()
-        elif profile.role == 'PARENT':
-            children_ids = profile.students.values_list('id', flat=True)
-            queryset = queryset.filter(student_id__in=children_ids)
+        queryset = role_filtered_attendance(queryset, principal)
         
         # Датага карата фильтр
         if start_date:
@@ -780,42 +971,45 @@ class ReportViewSet(viewsets.ViewSet):
         if group_id:
             queryset = queryset.filter(student__group_id=group_id)
         
+        # Admin/Manager үчүн ролдук фильтр жок - күндүк жыйынтык таблицасы окулат
+        if principal.is_admin:
+            source = rollup_queryset(start_date, end_date, group_id)
+            group_field = 'group_id'
+        else:
+            source = queryset
+            group_field = 'student__group_id'
+        
         # Статус боюнча саноо
+        status_counts = get_status_counts(source)
         stats_by_status = {
-            'present': queryset.filter(status='Present').count(),
-            'absent': queryset.filter(status='Absent').count(),
-            'late': queryset.filter(status='Late').count(),
+            'present': status_counts['present'],
+            'absent': status_counts['absent'],
+            'late': status_counts['late'],
         }
         
-        # Күн боюнча статистика (акыркы 7 күн)
+        # Мезгил боюнча статистика - бир GROUP BY суроосу
+        display_format = '%m.%Y' if granularity == 'month' else '%d.%m'
         daily_stats = []
-        if start_date and end_date:
-            current_date = date.fromisoformat(start_date)
-            end = date.fromisoformat(end_date)
-        else:
-            end = date.today()
-            current_date = end - timedelta(days=6)
-        
-        while current_date <= end:
-            day_data = queryset.filter(date=current_date)
+        for bucket in get_status_time_series(source, current_date, end, granularity):
             daily_stats.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'date_display': current_date.strftime('%d.%m'),
-                'present': day_data.filter(status='Present').count(),
-                'absent': day_data.filter(status='Absent').count(),
-                'late': day_data.filter(status='Late').count(),
-                'total': day_data.count(),
+                'date': bucket['start'].strftime('%Y-%m-%d'),
+                'date_end': bucket['end'].strftime('%Y-%m-%d'),
+                'date_display': bucket['start'].strftime(display_format),
+                'present': bucket['present'],
+                'absent': bucket['absent'],
+                'late': bucket['late'],
+                'total': bucket['total'],
             })
-            current_date += timedelta(days=1)
         
         # Группа боюнча статистика (Admin/Manager үчүн)
         group_stats = []
-        if profile.role in ['ADMIN', 'MANAGER']:
+        if principal.is_admin:
+            per_group = get_group_status_counts(source, group_field)
             groups = Group.objects.all()
             for group in groups:
-                group_attendance = queryset.filter(student__group=group)
-                total = group_attendance.count()
-                present = group_attendance.filter(status='Present').count()
+                group_counts = per_group.get(group.id, EMPTY_COUNTS)
+                total = group_counts['total']
+                present = group_counts['present']
                 group_stats.append({
                     'group_id': group.id,
                     'group_name': group.name,
@@ -826,7 +1020,7 @@ class ReportViewSet(viewsets.ViewSet):
         
         # Эң көп келбеген студенттер (Admin/Manager/Teacher үчүн)
         top_absent_students = []
-        if profile.role in ['ADMIN', 'MANAGER', 'TEACHER']:
+        if principal.is_admin or principal.role == 'TEACHER':
             absent_by_student = queryset.filter(status='Absent').values(
                 'student__id', 'student__user__first_name', 'student__user__last_name',
                 'student__group__name'
@@ -843,15 +1037,7 @@ class ReportViewSet(viewsets.ViewSet):
         return Response({
             'stats_by_status': stats_by_status,
             'daily_stats': daily_stats,
+            'granularity': granularity,
             'group_stats': group_stats,
             'top_absent_students': top_absent_students,
         })
-    
-    def _get_status_display(self, status):
-        """Статусту көрсөтүү"""
-        status_map = {
-            'Present': '✅ Келди',
-            'Absent': '❌ Келбеди',
-            'Late': '⏰ Кечикти',
-        }
-        return status_map.get(status, status)
@@ -0,0 +1,283 @@
+"""
+Катышууну топтоп белгилөө
+Бардык жазуулар эстутумда текшерилет, студенттер жана бар катышуулар бир суроо менен
+алынат, жазуу bulk_create/UPDATE менен бир транзакцияда жүрөт
+"""
+from collections import Counter
+from datetime import date as date_cls
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Attendance, Student, Subject
+from . import absence_notifications, schedule_cache, sync
+from .rollup import apply_rollup_deltas, attendance_key, rollup_key
+
+VALID_STATUSES = {choice for choice, _ in Attendance.STATUS_CHOICES}
+
+# Бир UPDATE суроосундагы жолдордун максималдуу саны (backend'дин параметр чеги андан аз болушу мүмкүн)
+UPDATE_BATCH_SIZE = 500
+
+
+def _parse_date(value):
+    """'YYYY-MM-DD' же date объектисин date'ке которуу"""
+    if isinstance(value, date_cls):
+        return value
+    return date_cls.fromisoformat(str(value))
+
+
+def _parse_id(value):
+    """ID'ни int'ке которуу (бош болсо None)"""
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def _validate(records):
+    """
+    Жазууларды эстутумда текшерүү
+    Натыйжа: (туура жазуулар, каталар) - ар бир туура жазуу нормалдаштырылган dict
+    """
+    valid = []
+    errors = []
+    for record in records:
+        try:
+            student_id = _parse_id(record.get('student_id'))
+            subject_id = _parse_id(record.get('subject_id'))
+            time_slot_id = _parse_id(record.get('time_slot_id'))
+            schedule_id = _parse_id(record.get('schedule_id'))
+        except (TypeError, ValueError):
+            errors.append(f"Ката: туура эмес ID ({record})")
+            continue
+
+        if student_id is None:
+            errors.append(f"Студент ID {record.get('student_id')} табылган жок")
+            continue
+
+        try:
+            day = _parse_date(record.get('date'))
+        except (TypeError, ValueError):
+            errors.append(f"Ката: туура эмес дата '{record.get('date')}' (студент ID {student_id})")
+            continue
+
+        status = record.get('status', 'Present')
+        if status not in VALID_STATUSES:
+            errors.append(f"Ката: туура эмес статус '{status}' (студент ID {student_id})")
+            continue
+
+        valid.append({
+            'student_id': student_id,
+            'subject_id': subject_id,
+            'time_slot_id': time_slot_id,
+            'schedule_id': schedule_id,
+            'date': day,
+            'status': status,
+        })
+    return valid, errors
+
+
+def _update_rows(rows):
+    """
+    Жаңыланган жолдорду сактоо - bulk_update: бир партияга бир UPDATE ... CASE WHEN
+    Суроолордун саны статустардан/расписаниелерден көз каранды эмес, партиялардын саны гана
+    """
+    Attendance.objects.bulk_update(
+        rows, ['status', 'schedule', 'created_by', 'marked_at'], batch_size=UPDATE_BATCH_SIZE
+    )
+
+
+def stored_key(row):
+    """Базадан окулган жолдун жыйынтык ачкычы (stored_group_id аннотациясы менен, группасыз болсо да суроосуз)"""
+    return rollup_key(row.date, row.stored_group_id, row.subject_id, row.status)
+
+
+def create_attendances(attendances):
+    """
+    Жаңы Attendance жолдорун бир bulk insert менен сактоо
+    bulk_create сигналдарды чакырбайт: жыйынтык ошол эле транзакцияда жаңыланат,
+    sync журналы жана катышпагандар тууралуу билдирмелер commit'тен кийин бир топ менен жазылат.
+    Студенттер жана сабактар объектилерде кэштелген болушу керек.
+    """
+    if not attendances:
+        return attendances
+    deltas = Counter(
+        attendance_key(attendance, attendance.student.group_id if attendance.student else None)
+        for attendance in attendances
+    )
+    with transaction.atomic():
+        Attendance.objects.bulk_create(attendances, batch_size=1000)
+        apply_rollup_deltas(deltas)
+        sync.record_changes(attendances)
+        schedule_cache.invalidate_attendance(key[1] for key in deltas)
+        absence_notifications.collect(attendances)
+    return attendances
+
+
+def _write(records, user):
+    """Текшерилген жазууларды бир транзакцияда сактоо"""
+    errors = []
+
+    # Студенттер жана сабактар - бир суроодон
+    students = Student.objects.only('id', 'name', 'group_id').in_bulk(
+        {r['student_id'] for r in records}
+    )
+    subject_ids = {r['subject_id'] for r in records if r['subject_id'] is not None}
+    subjects = Subject.objects.select_related('teacher').in_bulk(subject_ids) if subject_ids else {}
+
+    # Бар катышуулар - бир суроо (student, date) индекси боюнча
+    # stored_group_id - жыйынтыктагы ачкычтын группасы базадагы жолдон (stored_key)
+    existing_rows = Attendance.objects.filter(
+        student_id__in=students.keys(),
+        date__in={r['date'] for r in records},
+    ).annotate(stored_group_id=F('student__group_id'))
+    by_slot = {}
+    by_lesson = {}
+    for row in existing_rows:
+        by_slot[(row.student_id, row.subject_id, row.date, row.time_slot_id)] = row
+        if row.subject_id is not None:
+            by_lesson[(row.student_id, row.subject_id, row.date)] = row
+
+    now = timezone.now()
+    to_create = []
+    to_update = {}
+    deltas = Counter()
+    created_count = 0
+    updated_count = 0
+
+    for record in records:
+        student = students.get(record['student_id'])
+        if student is None:
+            errors.append(f"Студент ID {record['student_id']} табылган жок")
+            continue
+        subject = None
+        if record['subject_id'] is not None:
+            subject = subjects.get(record['subject_id'])
+            if subject is None:
+                errors.append(f"Ката: сабак ID {record['subject_id']} табылган жок")
+                continue
+
+        slot_key = (student.id, record['subject_id'], record['date'], record['time_slot_id'])
+        existing = by_slot.get(slot_key)
+
+        if existing is not None:
+            # Эгерде бар болсо, жаңылайбыз (ушул сурамда түзүлө элек жол эстутумда гана өзгөрөт)
+            if existing.pk is not None:
+                deltas[stored_key(existing)] -= 1
+            existing.status = record['status']
+            existing.created_by = user
+            if record['schedule_id']:
+                existing.schedule_id = record['schedule_id']
+            existing.marked_at = now
+            if existing.pk is not None:
+                deltas[stored_key(existing)] += 1
+                to_update[existing.pk] = existing
+            updated_count += 1
+            continue
+
+        if subject is not None and (student.id, subject.id, record['date']) in by_lesson:
+            # unique_together (student, subject, date) - башка убакыт слотунда белгиленген
+            errors.append(
+                f"Ката: студент ID {student.id} үчүн {record['date']} күнү бул сабак "
+                f"башка убакытта белгиленген"
+            )
+            continue
+
+        # Жаңыны түзөбүз
+        attendance = Attendance(
+            student=student,
+            subject=subject,
+            date=record['date'],
+            time_slot_id=record['time_slot_id'],
+            schedule_id=record['schedule_id'],
+            status=record['status'],
+            created_by=user,
+            marked_at=now,
+            student_name=student.name,
+            subject_name=subject.subject_name if subject else '',
+        )
+        to_create.append(attendance)
+        by_slot[slot_key] = attendance
+        if subject is not None:
+            by_lesson[(student.id, subject.id, record['date'])] = attendance
+        created_count += 1
+
+    with transaction.atomic():
+        create_attendances(to_create)
+        _update_rows(list(to_update.values()))
+        # UPDATE сигналдарды чакырбайт - жыйынтык, кэш жана sync журналы түздөн-түз
+        apply_rollup_deltas(deltas)
+        schedule_cache.invalidate_attendance(key[1] for key in deltas)
+        sync.record_changes(to_update.values())
+
+    return created_count, updated_count, errors
+
+
+def bulk_mark_attendance(records, user):
+    """
+    Катышууларды топтоп түзүү/жаңылоо
+    Натыйжа: {'created': n, 'updated': n, 'errors': [...]}
+    """
+    valid, errors = _validate(records)
+    created = updated = 0
+    if valid:
+        try:
+            created, updated, write_errors = _write(valid, user)
+        except IntegrityError:
+            # Параллелдүү сурам ошол эле жазууларды түзүп койгон - кайра окуп бир жолу кайталайбыз
+            created, updated, write_errors = _write(valid, user)
+        errors.extend(write_errors)
+    return {'created': created, 'updated': updated, 'errors': errors}
+
+
+def mark_lesson_attendance(schedule, statuses, user, day=None):
+    """
+    Бир сабактын катышуусун белгилөө (мугалим сабактын башында)
+    statuses: {student_id: status}. Алдын ала белгиленген студенттер өзгөртүлбөйт.
+    Группанын тизмеси жана бүгүнкү бар жолдор бир суроодон алынат
+    Натыйжа: (түзүлгөн Attendance'тар, алдын ала белгиленген студенттердин аттары)
+    """
+    day = day or date_cls.today()
+    wanted = {}
+    for student_id, status in statuses.items():
+        try:
+            wanted[int(student_id)] = status
+        except (TypeError, ValueError):
+            continue
+
+    for attempt in range(2):
+        roster = Student.objects.filter(group_id=schedule.group_id).only(
+            'id', 'name', 'group_id'
+        ).in_bulk(list(wanted))
+        marked = set(Attendance.objects.filter(
+            student_id__in=list(roster), subject_id=schedule.subject_id, date=day
+        ).values_list('student_id', flat=True))
+
+        now = timezone.now()
+        to_create = []
+        skipped = []
+        for student_id, status in wanted.items():
+            student = roster.get(student_id)
+            if student is None or status not in VALID_STATUSES:
+                continue
+            if student_id in marked:
+                skipped.append(student.name)
+                continue
+            to_create.append(Attendance(
+                student=student,
+                subject=schedule.subject,
+                schedule=schedule,
+                date=day,
+                status=status,
+                created_by=user,
+                marked_at=now,
+                student_name=student.name,
+                subject_name=schedule.subject.subject_name if schedule.subject else '',
+            ))
+
+        try:
+            return create_attendances(to_create), skipped
+        except IntegrityError:
+            # Башка мугалим/админ ушул эле сабакты бир убакта белгилеген - кайра окуйбуз
+            if attempt:
+                raise
@@ -0,0 +1,142 @@
+"""
+JWT аутентификациясы User'ди жүктөбөй
+Кирүүдө access токенге колдонуучунун ролу жана жазуулары (core.principal) салынат.
+StatelessJWTAuthentication ар бир API сурамында User'ди жүктөбөйт: request.user жана
+анын principal'ы токендин маалыматынан түзүлөт.
+- Токенде жок User талаалары (email, is_staff ж.б.) керек болгондо бир суроо менен жүктөлөт
+- Ролу, группасы, сабактары, балдары өзгөргөн же өчүрүлгөн колдонуучунун ушул учурга чейин
+  берилген токендери четке кагылат (revoke, core.signals) - кардар кайра кирип жаңы токен алат
+- Чакыртып алуу маалымат базасында (TokenRevocation, өзгөртүү менен бир транзакцияда).
+  Ар бир сурамда бир кичи суроо: колдонуучу активдүүбү жана качан чакыртылган.
+  Кэш бардык процесстерге жалпы болсо (settings.SHARED_CACHE) жооп кэште да сакталат
+- Маалыматы жок эски токендер мурдагыдай User'ди маалымат базасынан жүктөйт
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from . import principal
+from .models import TokenClaimsUser, TokenRevocation
+
+TOKEN_STATE_KEY = 'jwt:state:{user_id}'
+
+# Жалпы кэштеги абалдын мөөнөтү (секунд) - revoke() commit'тен кийин аны өчүрөт
+TOKEN_STATE_TIMEOUT = 60
+
+# Токендеги User талаалары - калгандары TokenClaimsUser'де кийинкиге калтырылат
+USER_CLAIMS = ('username', 'joined')
+
+
+# ============= ЧАКЫРТЫП АЛУУ =============
+
+def _forget_states(user_ids):
+    cache.delete_many([TOKEN_STATE_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def revoke(user_ids):
+    """Колдонуучулардын ушул убакытка чейин берилген access токендери жараксыз (учурдагы транзакцияда)"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    now = timezone.now()
+    TokenRevocation.objects.bulk_create(
+        [TokenRevocation(user_id=user_id, revoked_at=now) for user_id in user_ids],
+        update_conflicts=True, unique_fields=['user_id'], update_fields=['revoked_at'],
+    )
+    if settings.SHARED_CACHE:
+        transaction.on_commit(lambda: _forget_states(user_ids))
+
+
+def forget(user_ids):
+    """Өчүрүлгөн колдонуучулардын жазуулары - токендери колдонуучу жок болгондуктан четке кагылат"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    TokenRevocation.objects.filter(user_id__in=user_ids).delete()
+    if settings.SHARED_CACHE:
+        transaction.on_commit(lambda: _forget_states(user_ids))
+
+
+def token_state(user_id):
+    """
+    (is_active, чакыртып алуу убактысы секунд менен же None) - бир суроо
+    Колдонуучу жок болсо None
+    """
+    key = TOKEN_STATE_KEY.format(user_id=user_id)
+    if settings.SHARED_CACHE:
+        state = cache.get(key)
+        if state is not None:
+            return state
+    row = User.objects.filter(pk=user_id).annotate(
+        revoked_at=Subquery(TokenRevocation.objects.filter(user_id=OuterRef('pk')).values('revoked_at')),
+    ).values_list('is_active', 'revoked_at').first()
+    if row is None:
+        return None
+    is_active, revoked_at = row
+    state = (is_active, int(revoked_at.timestamp()) if revoked_at else None)
+    if settings.SHARED_CACHE:
+        cache.set(key, state, TOKEN_STATE_TIMEOUT)
+    return state
+
+
+def is_revoked(token, revoked_at):
+    # Чакыртып алуу секундунда берилгендер да четке кагылат - токенде iat секунд менен
+    return revoked_at is not None and token.get('iat', 0) <= revoked_at
+
+
+# ============= ТОКЕНДИН МААЛЫМАТЫ =============
+
+def add_claims(token, user):
+    """Токенге колдонуучунун ролу жана жазуулары (маалымат базасынан же principal кэшинен)"""
+    for name, value in principal.for_user(user).claims().items():
+        token[name] = value
+    token['username'] = user.get_username()
+    token['joined'] = user.date_joined.isoformat()
+    return token
+
+
+def has_claims(token):
+    return all(name in token for name in ('role', *USER_CLAIMS))
+
+
+def claims_user(token):
+    """
+    Токендин маалыматынан User (маалымат базасына суроосуз) жана анын principal'ы
+    is_active - get_user() token_state() менен текшергенден кийин гана
+    """
+    user_id = token[api_settings.USER_ID_CLAIM]
+    known = {
+        'id': user_id,
+        'username': token['username'],
+        'is_active': True,
+        'date_joined': datetime.fromisoformat(token['joined']),
+    }
+    fields = [field.attname for field in TokenClaimsUser._meta.concrete_fields if field.attname in known]
+    user = TokenClaimsUser.from_db(DEFAULT_DB_ALIAS, fields, [known[name] for name in fields])
+    user._principal = principal.Principal.from_claims(user_id, token)
+    return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication - токенде маалымат болсо, User маалымат базасынан жүктөлбөйт"""
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        if not has_claims(validated_token):
+            return super().get_user(validated_token)
+        state = token_state(validated_token[api_settings.USER_ID_CLAIM])
+        if state is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        is_active, revoked_at = state
+        if not is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if is_revoked(validated_token, revoked_at):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return claims_user(validated_token)
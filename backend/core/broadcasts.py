@@ -0,0 +1,187 @@
+"""
+Жалпы билдирмелер (fan-out-on-read)
+Көпчүлүккө (бардык студенттер, ата-энелер, группа, курс) жөнөтүлгөн билдирме бир
+BroadcastNotification сабы катары сакталат - жөнөтүү алуучулардын санына көз каранды эмес.
+Колдонуучу көрө турган жалпы билдирмелер окууда аудитория эрежелеринен аныкталат
+(sync.user_scope), окулду/өчүрүлдү белгилери - BroadcastReceipt.
+API жана билдирмелер барагы жеке жана жалпы билдирмелерди бир тизмеде берет:
+жалпы билдирменин id'си 'b' префикси менен ('b12') - mark_read/DELETE ошол дарек менен иштейт.
+Окулбагандардын саны core.unread_counter эсептегичинде (жеке + жалпы): жөнөтүүдө жана
+өчүрүүдө аудиториянын эсептегичтери бир UPDATE менен, окулду/өчүрүлдү белгисинде - колдонуучунуку.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Value
+
+from . import sync, unread_counter
+from .models import BroadcastNotification, BroadcastReceipt, Notification
+
+ID_PREFIX = 'b'
+
+# recipient_type (send_bulk_notification формасы) -> аудиториянын ролу
+RECIPIENT_ROLES = {
+    'all_students': 'STUDENT',
+    'all_parents': 'PARENT',
+    'specific_group': 'STUDENT',
+}
+
+
+# ============= АУДИТОРИЯ =============
+
+def audience_filter(scope):
+    """Колдонуучунун чөйрөсүнө (sync.user_scope) туура келген жалпы билдирмелер"""
+    return (
+        Q(role__in=['', scope['role'] or ''])
+        & (Q(group__isnull=True) | Q(group_id__in=scope['group_ids']))
+        & (Q(course__isnull=True) | Q(course_id__in=scope['course_ids']))
+        & Q(created_at__gte=scope['joined'])
+    )
+
+
+def visible(scope):
+    """Колдонуучу көрө турган (өчүрбөгөн) жалпы билдирмелер, is_read аннотациясы менен"""
+    receipts = BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user_id=scope['user_id'])
+    return (
+        BroadcastNotification.objects.filter(audience_filter(scope))
+        .exclude(Exists(receipts.filter(dismissed=True)))
+        .annotate(is_read=Exists(receipts))
+    )
+
+
+def audience_users(broadcast):
+    """
+    Жалпы билдирмени көрө турган колдонуучулар - audience_filter() эрежелери колдонуучу тараптан
+    (группа/курс: студенттин өзүнүкү же ата-эненин балдарыныкы, sync.user_scope сыяктуу)
+    """
+    users = User.objects.filter(date_joined__lte=broadcast.created_at)
+    if broadcast.role:
+        users = users.filter(userprofile__role=broadcast.role)
+    for field in ('group_id', 'course_id'):
+        value = getattr(broadcast, field)
+        if value is not None:
+            users = users.filter(
+                Q(userprofile__role='STUDENT', **{f'student__{field}': value})
+                | Q(userprofile__role='PARENT', **{f'userprofile__parent_profiles__{field}': value})
+            )
+    return users
+
+
+def recipients(broadcast):
+    """Азыркы учурда аудиторияга кирген активдүү колдонуучулар (жөнөтүүчүгө маалымат үчүн)"""
+    return audience_users(broadcast).filter(is_active=True).distinct()
+
+
+def broadcast_sent(broadcast):
+    """Жаңы жалпы билдирме - аудиториянын эсептегичтерине +1 (бир UPDATE)"""
+    unread_counter.adjust_users(audience_users(broadcast).values('pk'), 1)
+
+
+def broadcast_deleted(broadcast):
+    """Өчүрүлүүчү жалпы билдирме - аны окубаган/өчүрбөгөн аудиториянын эсептегичтеринен -1"""
+    unread = audience_users(broadcast).exclude(broadcast_receipts__broadcast=broadcast)
+    unread_counter.adjust_users(unread.values('pk'), -1)
+
+
+def unread_count(scope):
+    """Окулбаган жалпы билдирмелер - так эсеп (эсептегич түзүлгөндө жана теңөөдө гана)"""
+    return visible(scope).filter(is_read=False).count()
+
+
+def unread_counts(user_ids):
+    """{user_id: окулбаган жалпы билдирмелер} - ар бир колдонуучуга бир суроо (эсептегичти теңөө үчүн)"""
+    return {user.pk: unread_count(sync.user_scope(user)) for user in User.objects.filter(pk__in=user_ids)}
+
+
+def unread_total(scope):
+    """Окулбагандардын жалпы саны (жеке + жалпы) - эсептегичтин бир сабы"""
+    return unread_counter.get_count(scope['user_id'])
+
+
+# ============= ЖӨНӨТҮҮ ЖАНА БЕЛГИЛЕР =============
+
+def send(sender, title, message, role='', group=None, course=None, notification_type='GENERAL'):
+    """Бир сап - алуучулардын саны канча болсо да (sync журналы жана агымдар сигналдан)"""
+    return BroadcastNotification.objects.create(
+        sender=sender, title=title, message=message, notification_type=notification_type,
+        role=role, group=group, course=course,
+    )
+
+
+def _record(user_id, broadcasts, action='upsert'):
+    sync.record_entries([sync.change_entry(broadcast, action, {'user_id': user_id}) for broadcast in broadcasts])
+
+
+def mark_read(user_id, broadcasts):
+    """Окулду белгилери (бар болсо - өзгөрүүсүз); жаңы белгиленгендердин саны"""
+    broadcasts = [broadcast for broadcast in broadcasts if not getattr(broadcast, 'is_read', False)]
+    if not broadcasts:
+        return 0
+    receipts = BroadcastReceipt.objects.filter(user_id=user_id, broadcast__in=broadcasts)
+    with transaction.atomic():
+        # ignore_conflicts менен bulk_create кошулбаган саптарды да кайтарат - кошулганы санап алынат
+        before = receipts.count()
+        BroadcastReceipt.objects.bulk_create(
+            [BroadcastReceipt(broadcast=broadcast, user_id=user_id) for broadcast in broadcasts],
+            ignore_conflicts=True,
+        )
+        created = receipts.count() - before
+        unread_counter.adjust({user_id: -created})
+        _record(user_id, broadcasts)
+    for broadcast in broadcasts:
+        broadcast.is_read = True
+    return created
+
+
+def mark_all_read(scope):
+    return mark_read(scope['user_id'], list(visible(scope).filter(is_read=False).only('id')))
+
+
+def dismiss(user_id, broadcast):
+    """Колдонуучу жалпы билдирмени өзүнөн өчүрдү (башкаларда калат)"""
+    with transaction.atomic():
+        _, created = BroadcastReceipt.objects.update_or_create(
+            broadcast=broadcast, user_id=user_id, defaults={'dismissed': True},
+        )
+        if created:
+            # Окулбаган эле - эсептегичтен чыгат (окулгандары эсептегичте жок)
+            unread_counter.adjust({user_id: -1})
+        _record(user_id, [broadcast], 'delete')
+
+
+def parse_id(value):
+    """'b12' -> 12, жеке билдирменин id'си -> None"""
+    value = str(value)
+    if not value.startswith(ID_PREFIX):
+        return None
+    try:
+        return int(value[len(ID_PREFIX):])
+    except ValueError:
+        return None
+
+
+# ============= БИРИККЕН ТИЗМЕ =============
+
+def feed(user, scope):
+    """
+    Жеке жана жалпы билдирмелер бир тизмеде, жаңылары биринчи - (created_at, id, kind) саптары
+    Бир UNION суроосу: барактоо (COUNT, LIMIT) маалымат базасында калат
+    """
+    direct = Notification.objects.filter(recipient=user).annotate(kind=Value('direct'))
+    shared = visible(scope).annotate(kind=Value('broadcast'))
+    return (
+        direct.order_by().values_list('created_at', 'id', 'kind')
+        .union(shared.order_by().values_list('created_at', 'id', 'kind'), all=True)
+        .order_by('-created_at', '-id')
+    )
+
+
+def load_feed(rows, scope, related_fields=()):
+    """feed() саптарынан объекттер ошол эле иретте: Notification же BroadcastNotification"""
+    ids = {'direct': [], 'broadcast': []}
+    for _, pk, kind in rows:
+        ids[kind].append(pk)
+    objects = {
+        'direct': Notification.objects.select_related(*related_fields).in_bulk(ids['direct']),
+        'broadcast': visible(scope).select_related('sender').in_bulk(ids['broadcast']),
+    }
+    return [objects[kind][pk] for _, pk, kind in rows if pk in objects[kind]]
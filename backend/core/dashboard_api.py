@@ -2,22 +2,24 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Count, Q
-from datetime import date, timedelta
-from .models import Student, Teacher, Group, Subject, Schedule, Attendance, Course, UserProfile
+from datetime import date
+import logging
+from .models import Student, Teacher, Group, Subject, Schedule, Attendance, UserProfile
+from .principal import get_principal
+from .rollup import rollup_queryset
+from .statistics import EMPTY_COUNTS, get_status_counts, get_group_status_counts
+
+logger = logging.getLogger(__name__)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
     """Dashboard статистикасы"""
-    user = request.user
-    
-    try:
-        profile = user.userprofile
-        role = profile.role
-    except:
+    principal = get_principal(request)
+    if not principal.has_profile:
         return Response({'error': 'Profile not found'}, status=400)
+    role = principal.role
     
     stats = {}
     today = date.today()
@@ -29,25 +31,17 @@ def dashboard_stats(request):
             'total_teachers': Teacher.objects.count(),
             'total_groups': Group.objects.count(),
             'total_subjects': Subject.objects.count(),
-            
-            # Бүгүнкү статистика
-            'today_total': Attendance.objects.filter(
-                date=today
-            ).count(),
-            'today_present': Attendance.objects.filter(
-                date=today,
-                status='Present'
-            ).count(),
-            'today_absent': Attendance.objects.filter(
-                date=today,
-                status='Absent'
-            ).count(),
-            'today_late': Attendance.objects.filter(
-                date=today,
-                status='Late'
-            ).count(),
         }
         
+        # Бүгүнкү статистика - күндүк жыйынтык таблицасынан
+        today_counts = get_status_counts(rollup_queryset(today, today))
+        stats.update({
+            'today_total': today_counts['total'],
+            'today_present': today_counts['present'],
+            'today_absent': today_counts['absent'],
+            'today_late': today_counts['late'],
+        })
+        
         # Пайыздарды эсептөө
         if stats['today_total'] > 0:
             stats['today_present_rate'] = round(
@@ -65,23 +59,16 @@ def dashboard_stats(request):
             stats['today_late_rate'] = 0
         
         # Группалар боюнча статистика
-        groups = Group.objects.all()
+        groups = Group.objects.select_related('course')
         groups_stats = []
         
+        per_group = get_group_status_counts(rollup_queryset(), 'group_id')
+        
         for group in groups:
-            total_records = Attendance.objects.filter(
-                student__group=group
-            ).count()
-            
-            present_count = Attendance.objects.filter(
-                student__group=group,
-                status='Present'
-            ).count()
-            
-            absent_count = Attendance.objects.filter(
-                student__group=group,
-                status='Absent'
-            ).count()
+            group_counts = per_group.get(group.id, EMPTY_COUNTS)
+            total_records = group_counts['total']
+            present_count = group_counts['present']
+            absent_count = group_counts['absent']
             
             attendance_rate = 0
             if total_records > 0:
@@ -104,22 +91,21 @@ def dashboard_stats(request):
     
     # TEACHER статистикасы
     elif role == 'TEACHER':
-        try:
-            teacher = Teacher.objects.get(user=user)
+        if principal.teacher_id is not None:
+            teacher_id = principal.teacher_id
             
             # Бүгүнкү күндүн атын алабыз (Monday, Tuesday, ...)
-            from datetime import datetime
             weekday_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
             today_name = weekday_names[today.weekday()]
             
             # Бүгүнкү сабактар (бүгүнкү күнгө дал келген расписание)
             today_classes = Schedule.objects.filter(
-                teacher=teacher,
+                teacher_id=teacher_id,
                 day=today_name
             )
             
             # Мугалимдин группалары жана студенттери
-            teacher_schedules = Schedule.objects.filter(teacher=teacher)
+            teacher_schedules = Schedule.objects.filter(teacher_id=teacher_id)
             teacher_groups = Group.objects.filter(
                 id__in=teacher_schedules.values_list('group_id', flat=True)
             ).distinct()
@@ -130,7 +116,7 @@ def dashboard_stats(request):
                 'my_students_count': my_students.count(),
                 'total_groups': teacher_groups.count()
             }
-        except Teacher.DoesNotExist:
+        else:
             stats = {
                 'today_classes_count': 0,
                 'my_students_count': 0,
@@ -139,11 +125,9 @@ def dashboard_stats(request):
     
     # STUDENT статистикасы
     elif role == 'STUDENT':
-        try:
-            student = Student.objects.get(user=user)
-            
+        if principal.student_id is not None:
             # Жалпы катышуу
-            total_attendance = Attendance.objects.filter(student=student)
+            total_attendance = Attendance.objects.filter(student_id=principal.student_id)
             present_days = total_attendance.filter(status='Present').count()
             absent_days = total_attendance.filter(status='Absent').count()
             total_days = total_attendance.count()
@@ -158,7 +142,7 @@ def dashboard_stats(request):
                 'absent_days': absent_days,
                 'total_days': total_days
             }
-        except Student.DoesNotExist:
+        else:
             stats = {
                 'attendance_percentage': 0,
                 'present_days': 0,
@@ -168,8 +152,9 @@ def dashboard_stats(request):
     
     # PARENT статистикасы
     elif role == 'PARENT':
-        # parent_profiles - бул Student.parents ManyToMany байланышынын related_name'и
-        children = profile.parent_profiles.all()
+        children = Student.objects.filter(id__in=principal.children_ids).select_related(
+            'group__course', 'course',
+        ).order_by('id')
         my_children = []
         
         for child in children:
@@ -253,8 +238,7 @@ def profile_update(request):
                     } if student.group.course else None
                 } if student.group else None
             except Exception as e:
-                print(f"Student маалыматын алууда ката: {e}")
-                pass
+                logger.warning("Student маалыматын алууда ката: %s", e)
         elif profile.role == 'TEACHER':
             try:
                 # Teacher user менен OneToOne байланышта
@@ -265,8 +249,7 @@ def profile_update(request):
                     for s in teacher.subject_set.all()
                 ]
             except Exception as e:
-                print(f"Teacher маалыматын алууда ката: {e}")
-                pass
+                logger.warning("Teacher маалыматын алууда ката: %s", e)
         
         return Response(data)
     
@@ -329,8 +312,7 @@ def profile_update(request):
                     } if student.group.course else None
                 } if student.group else None
             except Exception as e:
-                print(f"Student маалыматын алууда ката (PATCH): {e}")
-                pass
+                logger.warning("Student маалыматын алууда ката (PATCH): %s", e)
         elif profile.role == 'TEACHER':
             try:
                 teacher = user.teacher
@@ -339,8 +321,7 @@ def profile_update(request):
                     for s in teacher.subject_set.all()
                 ]
             except Exception as e:
-                print(f"Teacher маалыматын алууда ката (PATCH): {e}")
-                pass
+                logger.warning("Teacher маалыматын алууда ката (PATCH): %s", e)
         
         return Response(updated_data)
 
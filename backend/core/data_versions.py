@@ -0,0 +1,94 @@
+"""
+Маалымдама маалыматтын версиялары жана шарттуу GET (ETag / Last-Modified)
+Курстар, группалар, сабактар, мугалимдер жана убакыт слоттору семестрде бир нече гана
+жолу өзгөрөт. Ар бир түрдүн версиясы DataVersion таблицасында сакталат жана
+сигналдар аны сактоо/өчүрүүдө көбөйтөт. ETag - версиялардан, ошондуктан
+If-None-Match дал келсе 304 жооп бир гана суроо (версияларды окуу) менен берилет.
+"""
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import DataVersion
+
+# Маалымдама API'лери жана алардын жооптору көз каранды болгон маалымат түрлөрү
+COURSES = ('course',)
+GROUPS = ('group', 'course', 'student')
+SUBJECTS = ('subject', 'teacher', 'user', 'course')
+TEACHERS = ('teacher', 'user')
+TIMESLOTS = ('timeslot',)
+REFERENCE = ('course', 'group', 'student', 'subject', 'teacher', 'user', 'timeslot')
+
+
+def bump(name):
+    """Маалымат түрүнүн версиясын көбөйтүү (учурдагы транзакциянын ичинде)"""
+    updated = DataVersion.objects.filter(name=name).update(
+        version=F('version') + 1, updated_at=timezone.now(),
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        # Параллелдүү сурам биринчи жолду түзүп койгон
+        DataVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def bump_many(names):
+    """Бир нече версияны бир UPDATE менен көбөйтүү (жок жолдор бирден түзүлөт - биринчи жолу гана)"""
+    names = set(names)
+    if not names:
+        return
+    updated = DataVersion.objects.filter(name__in=names).update(
+        version=F('version') + 1, updated_at=timezone.now(),
+    )
+    if updated == len(names):
+        return
+    existing = set(DataVersion.objects.filter(name__in=names).values_list('name', flat=True))
+    for name in names - existing:
+        bump(name)
+
+
+def get_versions(names):
+    """Версиялар бир суроо менен: ({аты: версия}, акыркы өзгөрүү убактысы же None)"""
+    rows = DataVersion.objects.filter(name__in=names).values_list('name', 'version', 'updated_at')
+    versions = dict.fromkeys(names, 0)
+    last_modified = None
+    for name, version, updated_at in rows:
+        versions[name] = version
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    return versions, last_modified
+
+
+def make_etag(versions, *parts):
+    """Версиялардан жана сурамдын бөлүктөрүнөн (дарек, формат) ETag"""
+    raw = '|'.join([*(str(part) for part in parts), *(f'{name}:{versions[name]}' for name in sorted(versions))])
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+
+def conditional_response(request, names, build):
+    """
+    Шарттуу GET: дал келсе 304, болбосо build() жообу
+    ETag'ке дарек (query string менен) жана жооптун форматы (JSON/browsable) кирет
+    """
+    versions, last_modified = get_versions(names)
+    renderer = getattr(request, 'accepted_renderer', None)
+    etag = make_etag(versions, request.get_full_path(), renderer.format if renderer else '')
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        # Кардар сактап алат, бирок ар дайым текшертет
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
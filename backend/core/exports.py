@@ -0,0 +1,193 @@
+"""
+Катышуу отчетторун Excel/PDF'ке экспорттоо
+Write-only workbook: саптар базадан iterator(chunk_size) менен агылып келет жана
+эстутумда бүт таблица кармалбайт. Жазуучулар каалаган file объектисине жазышат.
+progress(done, total) - фондук жумуштар үчүн даярдыкты билдирүү (милдеттүү эмес)
+"""
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+
+from .models import Attendance
+from .statistics import get_status_counts
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Базадан бир жолу окулуучу саптардын саны
+EXPORT_CHUNK_SIZE = 2000
+
+STATUS_LABELS = dict(Attendance.STATUS_CHOICES)
+
+
+def _stream_rows(worksheet, queryset, fields, build_row, chunk_size, progress=None):
+    total = queryset.count() if progress else 0
+    for done, values in enumerate(queryset.values_list(*fields).iterator(chunk_size=chunk_size), 1):
+        worksheet.append(build_row(*values))
+        if progress and done % chunk_size == 0:
+            progress(done, total)
+
+
+def write_simple_excel(fileobj, attendances, chunk_size=EXPORT_CHUNK_SIZE):
+    """Жөнөкөй отчет: студент, сабак, статус, дата"""
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(['Студент', 'Сабак', 'Статус', 'Дата'])
+
+    def build_row(student_name, subject_name, status, day):
+        return [student_name, subject_name or 'Н/Д', status, str(day)]
+
+    _stream_rows(
+        worksheet, attendances,
+        ('student__name', 'subject__subject_name', 'status', 'date'),
+        build_row, chunk_size,
+    )
+    workbook.save(fileobj)
+
+
+def write_detailed_excel(fileobj, attendances, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """Детальный отчет: жазуулар барагы жана бир aggregate суроо менен эсептелген статистика"""
+    workbook = Workbook(write_only=True)
+
+    # Main data sheet
+    worksheet = workbook.create_sheet("Катышуу Жазуулары")
+    worksheet.append(['Студент', 'Группа', 'Сабак', 'Дата', 'Статус', 'Жаратылган күнү', 'Жараткан'])
+
+    def build_row(student_name, group_name, subject_name, day, status, creator):
+        day_text = day.strftime('%d.%m.%Y')
+        return [
+            student_name,
+            group_name or 'Н/Д',
+            subject_name or 'Н/Д',
+            day_text,
+            STATUS_LABELS.get(status, status),
+            day_text,
+            creator or 'Система',
+        ]
+
+    _stream_rows(
+        worksheet, attendances,
+        ('student__name', 'student__group__name', 'subject__subject_name',
+         'date', 'status', 'created_by__username'),
+        build_row, chunk_size, progress,
+    )
+
+    # Statistics sheet
+    counts = get_status_counts(attendances)
+    stats_sheet = workbook.create_sheet("Статистика")
+    for row in [
+        ['Көрсөткүч', 'Мааниси'],
+        ['Жалпы жазуулар', counts['total']],
+        ['Катышкандар', counts['present']],
+        ['Катышпагандар', counts['absent']],
+        ['Кечиккендер', counts['late']],
+        ['Уруксат менен жоктор', counts['excused']],
+    ]:
+        stats_sheet.append(row)
+
+    workbook.save(fileobj)
+
+
+def write_table_excel(fileobj, sheets):
+    """
+    Даяр таблицалардан workbook (кеңири отчеттор үчүн)
+    sheets: [(барактын аты, баш саптар, саптар), ...]
+    """
+    workbook = Workbook(write_only=True)
+    for title, headers, rows in sheets:
+        worksheet = workbook.create_sheet(title)
+        worksheet.append(headers)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(fileobj)
+
+
+def write_detailed_pdf(fileobj, attendances, stats):
+    """Детальный PDF отчет с статистикой (биринчи 50 жазуу)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    doc = SimpleDocTemplate(fileobj, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Title
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=1  # Center
+    )
+    elements.append(Paragraph("Катышуу Системасы - Детальный Отчет", title_style))
+    elements.append(Spacer(1, 20))
+
+    # Statistics Summary
+    summary_data = [
+        ['Жалпы жазуулар:', stats['total_records']],
+        ['Катышкандар:', stats['present_count']],
+        ['Катышпагандар:', stats['absent_count']],
+        ['Кечиккендер:', stats['late_count']],
+        ['Уруксат менен жоктор:', stats['excused_count']],
+        ['Катышуу пайызы:', f"{stats['attendance_percentage']}%"],
+    ]
+
+    summary_table = Table(summary_data)
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 30))
+
+    # Attendance Records Table - бир суроо, биринчи 50 сап
+    rows = list(attendances.values_list('student__name', 'subject__subject_name', 'date', 'status')[:50])
+    if rows:
+        elements.append(Paragraph("Катышуу Жазуулары", styles['Heading2']))
+        elements.append(Spacer(1, 10))
+
+        data = [['Студент', 'Сабак', 'Дата', 'Статус']]
+        for student_name, subject_name, day, status in rows:
+            data.append([
+                student_name,
+                subject_name or 'Н/Д',
+                day.strftime('%d.%m.%Y'),
+                STATUS_LABELS.get(status, status),
+            ])
+
+        table = Table(data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        elements.append(table)
+
+    doc.build(elements)
+
+
+def excel_file_response(write, attendances, filename):
+    """
+    Workbook'ту убактылуу файлга жазып FileResponse менен бөлүктөп жөнөтүү
+    (xlsx - zip архиви, ошондуктан толук файл керек; файл жооп жабылганда өчөт)
+    """
+    tmp = tempfile.TemporaryFile()
+    try:
+        write(tmp, attendances)
+        tmp.seek(0)
+    except Exception:
+        tmp.close()
+        raise
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=EXCEL_CONTENT_TYPE)
@@ -0,0 +1,135 @@
+"""
+Сурамдардын метрикалары жана структураланган логдор
+- RequestMetrics: процесстин ичиндеги counter/histogram'дар (Prometheus текст форматында)
+- JsonFormatter: лог жазууларын бир саптуу JSON кылып чыгаруу
+- metrics_view: /metrics/ endpoint'и
+
+Логгерлер:
+- core.requests: ар бир сурамдын жыйынтыгы (INFO)
+- core.*: модулдардын debug каналы. CORE_DEBUG=1 болгондо гана DEBUG деңгээли күйөт,
+  диагностикалык суроолор (count() ж.б.) logger.isEnabledFor(logging.DEBUG) менен корголот
+"""
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Сурамдын узактыгынын histogram чектери (секунд)
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# LogRecord'дун стандарттык атрибуттары - extra талааларды бөлүп алуу үчүн
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Лог жазуусун JSON сапка айландыруу (extra талаалары менен)"""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RequestMetrics:
+    """
+    View боюнча сурамдардын жыйынтыктары
+    Ар бир gunicorn worker'дин өзүнүн көрсөткүчтөрү болот (Prometheus ар бирин өзүнчө чогултат)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: {
+            'requests': 0, 'db_queries': 0, 'db_seconds': 0.0,
+            'view_seconds': 0.0, 'response_bytes': 0,
+        })
+        self._buckets = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+
+    def observe(self, view, method, status, queries, db_seconds, view_seconds, response_bytes):
+        labels = (view, method, str(status))
+        with self._lock:
+            totals = self._totals[labels]
+            totals['requests'] += 1
+            totals['db_queries'] += queries
+            totals['db_seconds'] += db_seconds
+            totals['view_seconds'] += view_seconds
+            totals['response_bytes'] += response_bytes or 0
+
+            buckets = self._buckets[(view, method)]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if view_seconds <= bound:
+                    buckets[i] += 1
+            buckets[-1] += 1
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._buckets.clear()
+
+    def render(self):
+        """Prometheus text exposition форматы"""
+        with self._lock:
+            totals = {labels: dict(values) for labels, values in self._totals.items()}
+            buckets = {labels: list(values) for labels, values in self._buckets.items()}
+
+        lines = []
+        series = [
+            ('attendance_http_requests_total', 'counter', 'requests', 'Сурамдардын саны'),
+            ('attendance_db_queries_total', 'counter', 'db_queries', 'SQL суроолордун саны'),
+            ('attendance_db_seconds_total', 'counter', 'db_seconds', 'SQL суроолордун убактысы'),
+            ('attendance_view_seconds_total', 'counter', 'view_seconds', 'View иштөө убактысы'),
+            ('attendance_response_bytes_total', 'counter', 'response_bytes', 'Жооптордун көлөмү'),
+        ]
+        for name, kind, field, help_text in series:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (view, method, status), values in sorted(totals.items()):
+                lines.append(
+                    f'{name}{{view="{_escape(view)}",method="{method}",status="{status}"}} {values[field]}'
+                )
+
+        name = 'attendance_view_duration_seconds'
+        lines.append(f'# HELP {name} View иштөө убактысынын бөлүштүрүлүшү')
+        lines.append(f'# TYPE {name} histogram')
+        for (view, method), counts in sorted(buckets.items()):
+            labels = f'view="{_escape(view)}",method="{method}"'
+            for bound, count in zip(DURATION_BUCKETS, counts):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+            lines.append(f'{name}_count{{{labels}}} {counts[-1]}')
+            sum_seconds = sum(
+                values['view_seconds'] for (v, m, _), values in totals.items() if (v, m) == (view, method)
+            )
+            lines.append(f'{name}_sum{{{labels}}} {sum_seconds}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+# Процесстин жалпы реестри
+request_metrics = RequestMetrics()
+
+
+def metrics_view(request):
+    """
+    Prometheus үчүн метрикалар
+    Кирүү: staff колдонуучу же 'Authorization: Bearer <METRICS_TOKEN>'
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = bool(token) and request.META.get('HTTP_AUTHORIZATION') == f'Bearer {token}'
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden('Метрикаларды көрүү укугу жок')
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,74 +1,112 @@
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.permissions import AllowAny
-from rest_framework.response import Response
-from rest_framework import status
-from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+
+from . import authentication, principal
+from .models import Group, Subject, UserProfile
+
+
+def login_user_data(user):
+    """
+    Кирүү жообундагы user маалыматы
+    Ролу жана жазуулары principal'дан (токендин маалыматы менен бирге), калганы бирден суроо:
+    профиль, группа курсу менен, мугалимдин предметтери
+    """
+    data = {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'full_name': user.get_full_name() or user.username,
+    }
+    current = principal.for_user(user)
+
+    # UserProfile маалыматы бар болсо
+    if not current.has_profile:
+        return data
+    profile = UserProfile.objects.get(pk=current.profile_id)
+    data.update({
+        'role': profile.role,
+        'phone_number': profile.phone_number,
+        'profile_photo': profile.profile_photo.url if profile.profile_photo else None,
+        'address': profile.address,
+        'emergency_contact_name': profile.emergency_contact_name,
+        'emergency_contact_phone': profile.emergency_contact_phone,
+    })
+
+    # Student болсо, группа маалыматын кошуу
+    if current.student_id is not None:
+        data['student_id'] = current.student_id
+        group = (
+            Group.objects.select_related('course').filter(pk=current.student_group_id).first()
+            if current.student_group_id is not None else None
+        )
+        if group:
+            data['group'] = {
+                'id': group.id,
+                'name': group.name,
+                'course': {
+                    'id': group.course.id,
+                    'name': group.course.name
+                } if group.course else None
+            }
+
+    # Teacher болсо, предметтерди кошуу
+    if current.teacher_id is not None:
+        data['teacher_id'] = current.teacher_id
+        data['subjects'] = [
+            {'id': subject_id, 'name': subject_name}
+            for subject_id, subject_name in Subject.objects.filter(teacher_id=current.teacher_id).values_list(
+                'id', 'subject_name',
+            )
+        ]
+
+    return data
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
-    """JWT token менен user маалыматын кайтаруу"""
-    
+    """
+    JWT token менен user маалыматын кайтаруу
+    Сырсөз бир жолу текшерилет (TokenObtainSerializer.validate ичиндеги authenticate)
+    """
+
+    default_error_messages = {
+        'no_active_account': 'Invalid credentials',
+    }
+
+    @classmethod
+    def get_token(cls, user):
+        # Ролу, student_id/teacher_id, группасы - StatelessJWTAuthentication User'ди жүктөбөйт
+        return authentication.add_claims(super().get_token(user), user)
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data['user'] = login_user_data(self.user)
+        return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Жаңы access токендин маалыматы refresh токенден көчүрүлбөйт - маалымат базасынан кайра
+    Өчүрүлгөн же активдүү эмес колдонуучуга жаңы токен берилбейт
+    """
+
     def validate(self, attrs):
-        # Username жана password алуу
-        username = attrs.get('username')
-        password = attrs.get('password')
-        
-        # User'ди аутентификациялоо
-        user = authenticate(username=username, password=password)
-        
-        if user is None:
-            from rest_framework_simplejwt.exceptions import AuthenticationFailed
-            raise AuthenticationFailed('Invalid credentials')
-        
-        # Token генерациялоо
         data = super().validate(attrs)
-        
-        # User маалыматын кошуу
-        data['user'] = {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'full_name': user.get_full_name() or user.username,
-        }
-        
-        # UserProfile маалыматы бар болсо
-        if hasattr(user, 'userprofile'):
-            profile = user.userprofile
-            data['user'].update({
-                'role': profile.role,
-                'phone_number': profile.phone_number,
-                'profile_photo': profile.profile_photo.url if profile.profile_photo else None,
-                'address': profile.address,
-                'emergency_contact_name': profile.emergency_contact_name,
-                'emergency_contact_phone': profile.emergency_contact_phone,
-            })
-            
-            # Student болсо, группа маалыматын кошуу
-            if hasattr(user, 'student') and user.student:
-                student = user.student
-                data['user']['student_id'] = student.id
-                if student.group:
-                    data['user']['group'] = {
-                        'id': student.group.id,
-                        'name': student.group.name,
-                        'course': {
-                            'id': student.group.course.id,
-                            'name': student.group.course.name
-                        } if student.group.course else None
-                    }
-            
-            # Teacher болсо, предметтерди кошуу
-            if hasattr(user, 'teacher') and user.teacher:
-                teacher = user.teacher
-                data['user']['teacher_id'] = teacher.id
-                data['user']['subjects'] = [
-                    {'id': subject.id, 'name': subject.subject_name}
-                    for subject in teacher.subject_set.all()
-                ]
-        
+        access = self.token_class.access_token_class(data['access'])
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]}
+        ).first()
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed('User not found or inactive', code='user_inactive')
+        authentication.add_claims(access, user)
+        # iat refresh токенден көчүрүлөт - чакыртып алуудан кийин берилген токен жарактуу болушу үчүн
+        access.set_iat()
+        data['access'] = str(access)
         return data
 
 
@@ -76,3 +114,9 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom JWT login endpoint"""
     permission_classes = [AllowAny]
     serializer_class = CustomTokenObtainPairSerializer
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    """JWT refresh - токендин маалыматы жаңыланат"""
+    permission_classes = [AllowAny]
+    serializer_class = CustomTokenRefreshSerializer
@@ -0,0 +1,279 @@
+"""
+Attendance суроолорунун benchmark'ы
+- Убактылуу test базасын түзөт (чыныгы маалыматтарга тийбейт)
+- Бир семестрлик маалымат толтурат (группалар × студенттер × сабактар × күндөр)
+- Негизги view'лердин суроолору үчүн EXPLAIN жана убакытты индекстер менен/индекстерсиз көрсөтөт
+- AttendanceViewSet.bulk жолун --bulk жазуу менен өлчөйт (жарымы жаңы, жарымы жаңылоо)
+
+Колдонуу: python manage.py benchmark_attendance --groups 20 --students 25 --weeks 18 --explain
+"""
+
+import random
+import statistics as stats
+import time
+from datetime import date, time as dtime, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (
+    Attendance, Course, Group, Notification, Schedule, Student, Subject,
+    Teacher, TimeSlot, UnreadNotificationCounter
+)
+from core.attendance_bulk import bulk_mark_attendance
+from core.rollup import rebuild_rollup
+
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+STATUSES = ['Present'] * 7 + ['Absent', 'Late', 'Excused']
+
+# Benchmark учурунда өчүрүлүп-салыштырылуучу моделдер (Meta.indexes)
+INDEXED_MODELS = [Attendance, Schedule, Notification]
+
+
+class Command(BaseCommand):
+    help = 'Seed a semester of attendance into a throwaway test database and benchmark hot queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=10, help='Группалардын саны')
+        parser.add_argument('--students', type=int, default=25, help='Ар бир группадагы студенттер')
+        parser.add_argument('--weeks', type=int, default=18, help='Семестрдин узундугу (жума)')
+        parser.add_argument('--lessons', type=int, default=4, help='Күнүнө сабактардын саны')
+        parser.add_argument('--repeat', type=int, default=5, help='Ар бир суроонун кайталанышы')
+        parser.add_argument('--explain', action='store_true', help='EXPLAIN пландарын чыгаруу')
+        parser.add_argument('--no-compare', action='store_true', help='Индекссиз салыштырууну өткөрүп жиберүү')
+        parser.add_argument('--bulk', type=int, default=10000, help='Bulk белгилөөдөгү жазуулардын саны (0 - өткөрүп жиберүү)')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"🧪 Test база: {connection.settings_dict['NAME']}")
+            started = time.perf_counter()
+            context = self.seed(options)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {Attendance.objects.count()} attendance жолу толтурулду "
+                f"({time.perf_counter() - started:.1f} сек)"
+            ))
+
+            if options['bulk']:
+                self.bench_bulk(context, options['bulk'], options['weeks'])
+
+            scenarios = self.scenarios(context)
+            with_indexes = self.run(scenarios, options, label='индекстер менен')
+
+            if options['no_compare']:
+                self.report(with_indexes)
+                return
+
+            self.drop_indexes()
+            without_indexes = self.run(scenarios, options, label='индекстерсиз')
+            self.report(with_indexes, without_indexes)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    # ============= МААЛЫМАТ ТОЛТУРУУ =============
+
+    def seed(self, options):
+        rng = random.Random(42)
+        lessons = options['lessons']
+
+        course = Course.objects.create(name='Bench курс', year=1, faculty='Bench')
+        slots = TimeSlot.objects.bulk_create([
+            TimeSlot(name=f'{i + 1}-пара', start_time=dtime(8 + i * 2, 0), end_time=dtime(9 + i * 2, 20), order=i + 1)
+            for i in range(lessons)
+        ])
+
+        teacher_users = [
+            User.objects.create_user(username=f'bench_teacher_{i}', password='bench')
+            for i in range(max(lessons, 4))
+        ]
+        teachers = Teacher.objects.bulk_create([
+            Teacher(name=f'Bench мугалим {i}', user=user)
+            for i, user in enumerate(teacher_users)
+        ])
+        subjects = Subject.objects.bulk_create([
+            Subject(subject_name=f'Bench сабак {i}', teacher=teachers[i % len(teachers)], course=course)
+            for i in range(len(DAYS) * lessons)
+        ])
+
+        groups = Group.objects.bulk_create([
+            Group(name=f'Bench-{i}', course=course, capacity=options['students'])
+            for i in range(options['groups'])
+        ])
+        students = Student.objects.bulk_create([
+            Student(name=f'Студент {g.id}-{i}', course=course, group=g)
+            for g in groups for i in range(options['students'])
+        ])
+
+        schedules = Schedule.objects.bulk_create([
+            Schedule(
+                subject=subjects[d * lessons + l], group=g, teacher=subjects[d * lessons + l].teacher,
+                time_slot=slots[l], day=day, room=f'{100 + l}'
+            )
+            for g in groups for d, day in enumerate(DAYS) for l in range(lessons)
+        ])
+        schedule_map = {(s.group_id, s.day, s.time_slot_id): s for s in schedules}
+
+        students_by_group = {}
+        for student in students:
+            students_by_group.setdefault(student.group_id, []).append(student)
+
+        semester_end = date.today()
+        semester_start = semester_end - timedelta(weeks=options['weeks'])
+        creator = teacher_users[0]
+
+        batch = []
+        day = semester_start
+        while day <= semester_end:
+            if day.weekday() < len(DAYS):
+                day_name = DAYS[day.weekday()]
+                for group in groups:
+                    for slot in slots:
+                        schedule = schedule_map[(group.id, day_name, slot.id)]
+                        for student in students_by_group[group.id]:
+                            batch.append(Attendance(
+                                student=student, subject_id=schedule.subject_id, schedule=schedule,
+                                time_slot=slot, date=day, status=rng.choice(STATUSES),
+                                created_by=creator, student_name=student.name,
+                            ))
+                if len(batch) >= 5000:
+                    Attendance.objects.bulk_create(batch, batch_size=1000)
+                    batch = []
+            day += timedelta(days=1)
+        if batch:
+            Attendance.objects.bulk_create(batch, batch_size=1000)
+
+        Notification.objects.bulk_create([
+            Notification(
+                recipient=user, notification_type='ABSENCE', title='Bench',
+                message='Bench билдирме', is_read=rng.random() < 0.7
+            )
+            for user in teacher_users for _ in range(500)
+        ], batch_size=1000)
+
+        # bulk_create сигналдарды чакырбайт - жыйынтыкты кайра эсептейбиз
+        rebuild_rollup()
+
+        # Семестрдин акыркы окуу күнү (жекшемби эмес)
+        probe_day = semester_end
+        while probe_day.weekday() >= len(DAYS):
+            probe_day -= timedelta(days=1)
+        probe_group = groups[len(groups) // 2]
+        probe_schedule = schedule_map[(probe_group.id, DAYS[probe_day.weekday()], slots[0].id)]
+
+        return {
+            'today': probe_day,
+            'week_start': probe_day - timedelta(days=probe_day.weekday()),
+            'semester_start': semester_start,
+            'group': probe_group,
+            'schedule': probe_schedule,
+            'student': students_by_group[probe_group.id][0],
+            'teacher': probe_schedule.teacher,
+            'user': teacher_users[0],
+        }
+
+    # ============= СЦЕНАРИЙЛЕР =============
+
+    def scenarios(self, ctx):
+        """(аталыш, queryset түзүүчү функция) - ар бири негизги view'дун суроосу"""
+        teacher_subjects = Subject.objects.filter(teacher=ctx['teacher'])
+        return [
+            # core/views.py: dashboard / report (статистика)
+            ('views.dashboard: бүгүнкү статустар', lambda: Attendance.objects.filter(
+                date=ctx['today']).order_by().values('status').annotate(total=Count('id'))),
+            ('views.report: мөөнөт боюнча тизме', lambda: Attendance.objects.filter(
+                date__range=[ctx['week_start'], ctx['today']], status='Absent').order_by('-date')[:50]),
+            ('views.report: группа боюнча', lambda: Attendance.objects.filter(
+                student__group=ctx['group'], date__gte=ctx['semester_start'])),
+            # core/api_views.py
+            ('api.AttendanceViewSet: студенттин тарыхы', lambda: Attendance.objects.filter(
+                student=ctx['student'], date__gte=ctx['semester_start']).order_by('-date')[:20]),
+            ('api.ReportViewSet.statistics: күндөр', lambda: Attendance.objects.filter(
+                date__range=[ctx['week_start'], ctx['today']]).order_by().values('date').annotate(total=Count('id'))),
+            ('api.NotificationViewSet: тизме', lambda: Notification.objects.filter(
+                recipient=ctx['user']).order_by('-created_at')[:20]),
+            ('context_processors: окулбагандар', lambda: UnreadNotificationCounter.objects.filter(
+                user=ctx['user'])),
+            # core/schedule_views.py
+            ('schedule_views.get_schedule_data', lambda: Schedule.objects.filter(
+                group=ctx['group'], is_active=True).order_by('day', 'time_slot__order')),
+            ('schedule_views.get_lesson_students', lambda: Attendance.objects.filter(
+                schedule=ctx['schedule'], date=ctx['today'])),
+            ('schedule_views.save_attendance: бар белгилөө', lambda: Attendance.objects.filter(
+                student=ctx['student'], subject=ctx['schedule'].subject, date=ctx['today'])),
+            ('schedule_views.teacher_attendance_history', lambda: Attendance.objects.filter(
+                subject__in=teacher_subjects, date__gte=ctx['week_start']).order_by('-date')[:50]),
+        ]
+
+    def bench_bulk(self, ctx, size, weeks):
+        """
+        bulk_mark_attendance'ты size жазуу менен өлчөө
+        Жарымы бар жолдорду жаңылайт, жарымы семестрден кийинки күндөргө жаңы жолдор
+        """
+        rows = list(Attendance.objects.order_by('-date', 'id').values(
+            'student_id', 'subject_id', 'time_slot_id', 'schedule_id', 'date', 'status'
+        )[:size - size // 2])
+        shift = timedelta(weeks=weeks + 1)
+        flip = {'Present': 'Absent', 'Absent': 'Present', 'Late': 'Present', 'Excused': 'Present'}
+        records = [
+            {**row, 'date': row['date'].isoformat(), 'status': flip[row['status']]}
+            for row in rows
+        ] + [
+            {**row, 'date': (row['date'] + shift).isoformat()}
+            for row in rows[:size // 2]
+        ]
+
+        self.stdout.write("\n" + "=" * 70)
+        self.stdout.write(f"📦 Bulk белгилөө: {len(records)} жазуу")
+        self.stdout.write("=" * 70)
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = bulk_mark_attendance(records, ctx['user'])
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f"created={result['created']} updated={result['updated']} errors={len(result['errors'])}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {elapsed:.0f} мс, {len(queries)} SQL суроо "
+            f"({elapsed / max(len(records), 1):.3f} мс/жазуу)"
+        ))
+
+    def run(self, scenarios, options, label):
+        self.stdout.write("\n" + "=" * 70)
+        self.stdout.write(f"⏱️  Өлчөө: {label}")
+        self.stdout.write("=" * 70)
+        results = {}
+        for name, build in scenarios:
+            if options['explain']:
+                self.stdout.write(f"\n--- {name}")
+                self.stdout.write(build().explain())
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = stats.median(timings)
+        return results
+
+    def drop_indexes(self):
+        """Meta.indexes'те жарыяланган индекстерди test базасынан алып салуу"""
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def report(self, with_indexes, without_indexes=None):
+        self.stdout.write("\n" + "=" * 70)
+        self.stdout.write("📊 Натыйжалар (медиана, мс)")
+        self.stdout.write("=" * 70)
+        for name, after in with_indexes.items():
+            if without_indexes is None:
+                self.stdout.write(f"{name:<50} {after:>9.2f}")
+                continue
+            before = without_indexes[name]
+            speedup = before / after if after else 0
+            self.stdout.write(f"{name:<50} {before:>9.2f} → {after:>9.2f}  (×{speedup:.1f})")
@@ -0,0 +1,42 @@
+"""
+Көп жолу келбеген студенттердин ата-энелерине жана мугалимдерине эскертүү
+Колдонуу: python manage.py check_excessive_absences [--days 10] [--threshold 3] [--dry-run]
+(cron менен күнүнө бир жолу) - ар бир студент чекке жеткенде бир гана жолу эскертилет
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.absence_alerts import alert_days, alert_threshold, check_excessive_absences
+from core.middleware import QueryCounter
+
+
+class Command(BaseCommand):
+    help = 'Notify parents and teachers about students with excessive recent absences'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Терезенин узундугу, күн (демейки - ABSENCE_ALERT_DAYS)')
+        parser.add_argument('--threshold', type=int, default=None,
+                            help='Келбегендердин чеги (демейки - ABSENCE_ALERT_THRESHOLD)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Эч нерсе жазбай, эмне жөнөтүлөрүн гана көрсөтүү')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else alert_days()
+        threshold = options['threshold'] if options['threshold'] is not None else alert_threshold()
+        self.stdout.write(f"🔎 Акыркы {days} күндө {threshold}+ жолу келбеген студенттер текшерилүүдө...")
+
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            report = check_excessive_absences(days=days, threshold=threshold, dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        prefix = '🧪 (dry-run) ' if options['dry_run'] else '✅ '
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report['flagged']} студент чектен ашкан: {report['alerted']} жаңы эскертүү, "
+            f"{report['cleared']} тазаланды, {report['notifications']} билдирме"
+        ))
+        self.stdout.write(f"⏱️ {elapsed:.2f} сек, {queries.count} SQL суроо ({queries.seconds * 1000:.1f} мс)")
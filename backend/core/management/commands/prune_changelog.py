@@ -0,0 +1,27 @@
+"""
+Sync өзгөрүүлөр журналынын (ChangeLog) эски жазууларын тазалоо
+Колдонуу: python manage.py prune_changelog   (cron менен күнүнө бир жолу)
+Мындан эски токени бар мобилдик кардарлар кийинки sync'те толук snapshot алышат
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.sync import prune_changelog, retention_days
+
+
+class Command(BaseCommand):
+    help = 'Delete sync change-log entries older than CHANGELOG_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Ушундан эски жазуулар өчүрүлөт (демейки - CHANGELOG_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else retention_days()
+        self.stdout.write(f"🧹 {days} күндөн эски sync журналы тазаланууда...")
+        deleted = prune_changelog(days)
+        self.stdout.write(self.style.SUCCESS(f"✅ {deleted} жазуу өчүрүлдү"))
@@ -0,0 +1,25 @@
+"""
+Күндүк катышуу жыйынтыгын (DailyAttendanceRollup) нөлдөн кайра эсептөө
+Колдонуу: python manage.py rebuild_attendance_rollup
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily attendance rollup table from raw Attendance rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Бир bulk_create менен жазылуучу жолдордун саны',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("📊 Катышуу жыйынтыгы кайра эсептелүүдө...")
+        created = rebuild_rollup(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {created} жыйынтык жолу түзүлдү"))
@@ -0,0 +1,29 @@
+"""
+Окулбаган билдирмелердин эсептегичтерин чыныгы санга теңөө
+Колдонуу: python manage.py reconcile_unread_counters [--batch-size 500]   (cron менен күнүнө бир жолу)
+Сабы жок колдонуучуларга эсептегич түзүлөт, четтегендери оңдолот
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.unread_counter import RECONCILE_BATCH_SIZE, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in per-user unread notification counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECONCILE_BATCH_SIZE,
+            help='Бир транзакциядагы колдонуучулардын саны',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Окулбагандардын эсептегичтери текшерилүүдө...")
+        stats = reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {stats['checked']} колдонуучу текшерилди: "
+            f"{stats['fixed']} оңдолду, {stats['created']} түзүлдү"
+        ))
@@ -0,0 +1,92 @@
+"""
+Фондук отчет жумуштарынын worker'и (ReportJob кезеги)
+Колдонуу: python manage.py run_report_worker
+          python manage.py run_report_worker --once   (кезекти бошотуп чыгуу, cron үчүн)
+Бир нече worker параллелдүү иштей алат - жумуштар шарттуу UPDATE менен ээленет
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.report_jobs import (
+    claim_next_job, purge_old_jobs, requeue_stale_jobs, retention_days, run_job, worker_name,
+)
+
+# Эски жумуштарды тазалоонун аралыгы (секунд)
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Process queued report jobs (PDF/Excel exports and advanced reports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Кезектеги жумуштарды аткарып, кезек бошогондо чыгуу',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Кезек бош болгондо кайра текшерүүгө чейинки тыныгуу (секунд)',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Ушунча жумуштан кийин чыгуу (0 - чексиз)',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=1800,
+            help='Ушунча секунд белги бербеген RUNNING жумуш кайра кезекке коюлат',
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        processed = 0
+        last_purge = 0.0
+        self.stdout.write(f"🚀 Отчет worker'и иштеп баштады ({worker})")
+
+        try:
+            while True:
+                close_old_connections()
+
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    last_purge = time.monotonic()
+                    purged = purge_old_jobs(retention_days())
+                    if purged:
+                        self.stdout.write(f"🧹 {purged} эски жумуш өчүрүлдү")
+
+                requeued, failed = requeue_stale_jobs(options['stale_after'])
+                if requeued or failed:
+                    self.stdout.write(self.style.WARNING(
+                        f"⚠️ Токтоп калган жумуштар: {requeued} кайра кезекте, {failed} ката"
+                    ))
+
+                job = claim_next_job(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                self.stdout.write(f"📄 #{job.pk} {job.get_kind_display()} даярдалууда...")
+                run_job(job)
+                processed += 1
+                if job.status == 'DONE':
+                    self.stdout.write(self.style.SUCCESS(f"✅ #{job.pk} даяр: {job.file.name}"))
+                elif job.status == 'FAILED':
+                    self.stdout.write(self.style.ERROR(f"❌ #{job.pk} ката: {job.message}"))
+                else:
+                    self.stdout.write(self.style.WARNING(f"⚠️ #{job.pk} кайра кезекке коюлган - натыйжа жазылган жок"))
+
+                if options['max_jobs'] and processed >= options['max_jobs']:
+                    break
+        except KeyboardInterrupt:
+            self.stdout.write("⏹ Worker токтотулду")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {processed} жумуш аткарылды"))
@@ -0,0 +1,72 @@
+"""
+Долбоордун middleware'лери
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .instrumentation import request_metrics
+
+request_logger = logging.getLogger('core.requests')
+
+
+class QueryCounter:
+    """connection.execute_wrapper үчүн - SQL суроолордун санын жана убактысын эсептөө"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    """
+    Ар бир сурам үчүн: SQL суроолордун саны жана убактысы, view убактысы, жооптун көлөмү
+    Натыйжалар core.requests логуна (структураланган) жана /metrics/ реестрине жазылат
+    REQUEST_METRICS_ENABLED = False болсо эч нерсе кылбайт
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'REQUEST_METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        view_seconds = time.perf_counter() - started
+
+        # Streaming жооптордун көлөмү алдын ала белгисиз
+        response_bytes = None if response.streaming else len(response.content)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or f'{match.func.__module__}.{match.func.__qualname__}') if match else 'unresolved'
+
+        request_metrics.observe(
+            view, request.method, response.status_code,
+            queries.count, queries.seconds, view_seconds, response_bytes,
+        )
+        request_logger.info(
+            '%s %s %s', request.method, request.path, response.status_code,
+            extra={
+                'view': view,
+                'status': response.status_code,
+                'db_queries': queries.count,
+                'db_ms': round(queries.seconds * 1000, 2),
+                'view_ms': round(view_seconds * 1000, 2),
+                'response_bytes': response_bytes,
+            },
+        )
+        return response
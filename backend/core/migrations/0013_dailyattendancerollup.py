@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def build_rollup(apps, schema_editor):
+    """Бар болгон Attendance маалыматтарынан баштапкы жыйынтыкты түзүү"""
+    Attendance = apps.get_model('core', 'Attendance')
+    DailyAttendanceRollup = apps.get_model('core', 'DailyAttendanceRollup')
+
+    rows = Attendance.objects.order_by().values(
+        'date', 'student__group_id', 'subject_id', 'status'
+    ).annotate(total=Count('id'))
+
+    DailyAttendanceRollup.objects.bulk_create([
+        DailyAttendanceRollup(
+            date=row['date'],
+            group_id=row['student__group_id'],
+            subject_id=row['subject_id'],
+            status=row['status'],
+            count=row['total'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_leaverequest_document_leaverequest_rejection_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('status', models.CharField(choices=[('Present', 'Катышты'), ('Absent', 'Катышкан жок'), ('Late', 'Кечикти'), ('Excused', 'Уруксат менен жок')], max_length=10, verbose_name='Статус')),
+                ('count', models.IntegerField(default=0, verbose_name='Саны')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.group', verbose_name='Группа')),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.subject', verbose_name='Сабак')),
+            ],
+            options={
+                'verbose_name': 'Күндүк катышуу жыйынтыгы',
+                'verbose_name_plural': 'Күндүк катышуу жыйынтыктары',
+                'unique_together': {('date', 'group', 'subject', 'status')},
+            },
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0014_attendance_schedule_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('attendance_excel', 'Катышуу - Excel'), ('attendance_pdf', 'Катышуу - PDF'), ('advanced_report', 'Кеңири отчет - Excel')], max_length=30, verbose_name='Түрү')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Параметрлер')),
+                ('status', models.CharField(choices=[('PENDING', 'Күтүүдө'), ('RUNNING', 'Даярдалууда'), ('DONE', 'Даяр'), ('FAILED', 'Ката')], default='PENDING', max_length=10, verbose_name='Абалы')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Даярдыгы (%)')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='Билдирүү')),
+                ('file', models.FileField(blank=True, upload_to='reports/%Y/%m/', verbose_name='Файл')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Аракеттер')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Түзүлгөн')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Башталган')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Бүткөн')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Буйрутмачы')),
+            ],
+            options={
+                'verbose_name': 'Отчет жумушу',
+                'verbose_name_plural': 'Отчет жумуштары',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='reportjob_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('schedule', 'Расписание'), ('attendance', 'Катышуу'), ('notification', 'Билдирме'), ('leave_request', 'Бошотуу сурамы'), ('scope', 'Көрүнүү чөйрөсү')], max_length=20, verbose_name='Модель')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Объекттин ID')),
+                ('action', models.CharField(choices=[('upsert', 'Түзүлдү/өзгөрдү'), ('delete', 'Өчүрүлдү')], default='upsert', max_length=10, verbose_name='Аракет')),
+                ('group_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Группа')),
+                ('student_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Студент')),
+                ('user_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Колдонуучу')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Убакыт')),
+            ],
+            options={
+                'verbose_name': 'Өзгөрүү',
+                'verbose_name_plural': 'Өзгөрүүлөр журналы',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['group_id', 'id'], name='changelog_group_idx'), models.Index(fields=['student_id', 'id'], name='changelog_student_idx'), models.Index(fields=['user_id', 'id'], name='changelog_user_idx'), models.Index(fields=['created_at'], name='changelog_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    """Маалымдама түрлөрүнүн версиялары - Last-Modified биринчи сурамдан тартып болушу үчүн"""
+    DataVersion = apps.get_model('core', 'DataVersion')
+    for name in ('course', 'group', 'student', 'subject', 'teacher', 'user', 'timeslot'):
+        DataVersion.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True, verbose_name='Аты')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Өзгөргөн')),
+            ],
+            options={
+                'verbose_name': 'Маалымат версиясы',
+                'verbose_name_plural': 'Маалымат версиялары',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
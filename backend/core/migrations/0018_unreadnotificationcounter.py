@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0017_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadNotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_notification_counter', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Колдонуучу')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Окулбагандар')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Өзгөргөн')),
+            ],
+            options={
+                'verbose_name': 'Окулбагандардын саны',
+                'verbose_name_plural': 'Окулбагандардын сандары',
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0018_unreadnotificationcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('ABSENCE', 'Жок болуу боюнча'), ('LEAVE_REQUEST', 'Бошотуу сурамы'), ('LEAVE_APPROVED', 'Бошотуу бекитилди'), ('LEAVE_REJECTED', 'Бошотуу четке кагылды'), ('GENERAL', 'Жалпы')], default='GENERAL', max_length=20, verbose_name='Түрү')),
+                ('title', models.CharField(max_length=200, verbose_name='Аталышы')),
+                ('message', models.TextField(verbose_name='Билдирме')),
+                ('role', models.CharField(blank=True, choices=[('ADMIN', 'Админ'), ('MANAGER', 'Менеджер'), ('TEACHER', 'Мугалим'), ('STUDENT', 'Студент'), ('PARENT', 'Ата-энелер')], default='', max_length=20, verbose_name='Роль')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Түзүлгөн')),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.course', verbose_name='Курс')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.group', verbose_name='Группа')),
+                ('sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sent_broadcasts', to=settings.AUTH_USER_MODEL, verbose_name='Жөнөтүүчү')),
+            ],
+            options={
+                'verbose_name': 'Жалпы билдирме',
+                'verbose_name_plural': 'Жалпы билдирмелер',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='changelog',
+            name='model',
+            field=models.CharField(choices=[('schedule', 'Расписание'), ('attendance', 'Катышуу'), ('notification', 'Билдирме'), ('leave_request', 'Бошотуу сурамы'), ('broadcast', 'Жалпы билдирме'), ('scope', 'Көрүнүү чөйрөсү')], max_length=20, verbose_name='Модель'),
+        ),
+        migrations.CreateModel(
+            name='BroadcastReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dismissed', models.BooleanField(default=False, verbose_name='Өчүрүлдү')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Окулду')),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='core.broadcastnotification', verbose_name='Жалпы билдирме')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_receipts', to=settings.AUTH_USER_MODEL, verbose_name='Колдонуучу')),
+            ],
+            options={
+                'verbose_name': 'Жалпы билдирменин белгиси',
+                'verbose_name_plural': 'Жалпы билдирмелердин белгилери',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='broadcastreceipt',
+            constraint=models.UniqueConstraint(fields=('user', 'broadcast'), name='broadcast_receipt_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['role', 'created_at'], name='broadcast_role_idx'),
+        ),
+    ]
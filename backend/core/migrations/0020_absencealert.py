@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_broadcastnotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('absence_count', models.PositiveIntegerField(verbose_name='Келбеген саны')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Эскертилди')),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='absence_alert', to='core.student', verbose_name='Студент')),
+            ],
+            options={
+                'verbose_name': 'Келбегендик эскертүүсү',
+                'verbose_name_plural': 'Келбегендик эскертүүлөрү',
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+
+
+def merge_duplicate_buckets(apps, schema_editor):
+    """NULL ачкычтуу кайталанган жыйынтык жолдорун бириктирүү (жаңы чектөөгө чейин)"""
+    DailyAttendanceRollup = apps.get_model('core', 'DailyAttendanceRollup')
+
+    buckets = {}
+    for row in DailyAttendanceRollup.objects.order_by('id'):
+        key = (row.date, row.group_id, row.subject_id, row.status)
+        if key not in buckets:
+            buckets[key] = row
+            continue
+        kept = buckets[key]
+        kept.count += row.count
+        kept.save(update_fields=['count'])
+        row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_tokenclaimsuser'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_buckets, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='dailyattendancerollup',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='dailyattendancerollup',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.group', verbose_name='Группа'),
+        ),
+        migrations.AlterField(
+            model_name='dailyattendancerollup',
+            name='subject',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.subject', verbose_name='Сабак'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyattendancerollup',
+            constraint=models.UniqueConstraint(models.F('date'), django.db.models.functions.comparison.Coalesce('group', 0), django.db.models.functions.comparison.Coalesce('subject', 0), models.F('status'), name='attendance_rollup_bucket_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_rollup_set_null_bucket_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='claim_token',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Ээлөө белгиси'),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Акыркы белги'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_reportjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('user_id', models.PositiveBigIntegerField(primary_key=True, serialize=False, verbose_name='Колдонуучу ID')),
+                ('revoked_at', models.DateTimeField(verbose_name='Чакыртып алынды')),
+            ],
+            options={
+                'verbose_name': 'Токендерди чакыртып алуу',
+                'verbose_name_plural': 'Токендерди чакыртып алуулар',
+            },
+        ),
+    ]
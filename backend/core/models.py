@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -180,6 +181,12 @@ class Schedule(models.Model):
         verbose_name = 'Расписание'
         verbose_name_plural = 'Расписаниелер'
         ordering = ['day', 'time_slot__order']
+        indexes = [
+            # get_schedule_data / dashboard: группанын бүгүнкү активдүү сабактары
+            models.Index(fields=['group', 'day', 'is_active', 'time_slot'], name='schedule_group_day_idx'),
+            # Мугалимдин күндүк сабактары жана параллелдүү сабактар
+            models.Index(fields=['teacher', 'day', 'time_slot'], name='schedule_teacher_day_idx'),
+        ]
 
     def __str__(self):
         teacher_name = self.teacher.name if self.teacher else self.subject.teacher.name if self.subject.teacher else "Мугалим жок"
@@ -272,6 +279,16 @@ class Attendance(models.Model):
         
     class Meta:
         unique_together = ['student', 'subject', 'date']
+        indexes = [
+            # Күн боюнча статистика жана бүгүнкү санактар
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+            # Студенттин тарыхы (date__range, -date иреттөө)
+            models.Index(fields=['student', 'date'], name='attendance_student_date_idx'),
+            # Сабактын бүгүнкү белгилөөлөрү (get_lesson_students, dashboard)
+            models.Index(fields=['schedule', 'date'], name='attendance_schedule_date_idx'),
+            # Мугалимдин сабактары боюнча тарых (subject__in + date)
+            models.Index(fields=['subject', 'date'], name='attendance_subject_date_idx'),
+        ]
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
@@ -296,6 +313,279 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Окулбаган билдирмелердин саны
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='notification_unread_idx'),
+            # Колдонуучунун билдирмелер тизмеси (-created_at иреттөө)
+            models.Index(fields=['recipient', '-created_at'], name='notification_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.recipient.username}"
+
+class DailyAttendanceRollup(models.Model):
+    """
+    Күндүк катышуу жыйынтыгы: дата × группа × сабак × статус → сан
+    Attendance жазылганда/өзгөргөндө/өчүрүлгөндө core.rollup аркылуу жаңыланат,
+    толук кайра эсептөө: manage.py rebuild_attendance_rollup
+    Группа/сабак өчүрүлгөндө жолдор NULL ачкычтуу жолго кошулат (core.signals) -
+    Attendance'тагы SET_NULL сыяктуу, чийки жолдор менен жыйынтык бирдей калат
+    """
+    date = models.DateField(verbose_name='Дата')
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Группа')
+    subject = models.ForeignKey(Subject, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Сабак')
+    status = models.CharField(max_length=10, choices=Attendance.STATUS_CHOICES, verbose_name='Статус')
+    count = models.IntegerField(default=0, verbose_name='Саны')
+
+    class Meta:
+        constraints = [
+            # NULL'дар бири-бирине барабар эмес - unique_together NULL ачкычтуу кайталанган жолдорду токтотпойт
+            models.UniqueConstraint(
+                'date', Coalesce('group', 0), Coalesce('subject', 0), 'status',
+                name='attendance_rollup_bucket_unique',
+            ),
+        ]
+        verbose_name = 'Күндүк катышуу жыйынтыгы'
+        verbose_name_plural = 'Күндүк катышуу жыйынтыктары'
+
+    def __str__(self):
+        return f"{self.date} - {self.group_id} - {self.subject_id} - {self.status}: {self.count}"
+
+
+class ReportJob(models.Model):
+    """
+    Фондо даярдалуучу отчет (PDF/Excel экспорт, кеңири отчет)
+    Кезек ушул таблицанын өзү: manage.py run_report_worker PENDING жумуштарды алып иштетет
+    """
+    KIND_CHOICES = (
+        ('attendance_excel', 'Катышуу - Excel'),
+        ('attendance_pdf', 'Катышуу - PDF'),
+        ('advanced_report', 'Кеңири отчет - Excel'),
+    )
+    STATUS_CHOICES = (
+        ('PENDING', 'Күтүүдө'),
+        ('RUNNING', 'Даярдалууда'),
+        ('DONE', 'Даяр'),
+        ('FAILED', 'Ката'),
+    )
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name='Түрү')
+    params = models.JSONField(default=dict, blank=True, verbose_name='Параметрлер')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name='Абалы')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='Даярдыгы (%)')
+    message = models.CharField(max_length=255, blank=True, verbose_name='Билдирүү')
+    file = models.FileField(upload_to='reports/%Y/%m/', blank=True, verbose_name='Файл')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs', verbose_name='Буйрутмачы')
+    worker = models.CharField(max_length=100, blank=True, verbose_name='Worker')
+    # Ар бир ээлөөнүн белгиси: жумуш кайра кезекке коюлса, мурунку worker натыйжаны жаза албайт
+    claim_token = models.CharField(max_length=32, blank=True, verbose_name='Ээлөө белгиси')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Аракеттер')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Түзүлгөн')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Башталган')
+    # Worker тирүү экени - иштеп жатканда мезгил-мезгили менен жаңыланат (core.report_jobs)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Акыркы белги')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Бүткөн')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Worker'дин кезектен жумуш алуусу
+            models.Index(fields=['status', 'created_at'], name='reportjob_queue_idx'),
+        ]
+        verbose_name = 'Отчет жумушу'
+        verbose_name_plural = 'Отчет жумуштары'
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+
+class ChangeLog(models.Model):
+    """
+    Өзгөрүүлөр журналы - мобилдик тиркеменин delta-sync'и үчүн (core.sync)
+    id - өзгөрүү токени: кардар акыркы алган токенден кийинки жазууларды гана сурайт.
+    Көрүнүү чөйрөсү (группа/студент/колдонуучу) жазуу учурунда сакталат - объект
+    өчүрүлгөндөн кийин да анын tombstone'у керектүү кардарларга жетет.
+    """
+    MODEL_CHOICES = (
+        ('schedule', 'Расписание'),
+        ('attendance', 'Катышуу'),
+        ('notification', 'Билдирме'),
+        ('leave_request', 'Бошотуу сурамы'),
+        ('broadcast', 'Жалпы билдирме'),
+        ('scope', 'Көрүнүү чөйрөсү'),
+    )
+    ACTION_CHOICES = (
+        ('upsert', 'Түзүлдү/өзгөрдү'),
+        ('delete', 'Өчүрүлдү'),
+    )
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name='Модель')
+    object_id = models.PositiveIntegerField(verbose_name='Объекттин ID')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default='upsert', verbose_name='Аракет')
+    # Чөйрө - FK эмес: объект/группа өчүрүлсө да журнал сакталат
+    group_id = models.PositiveIntegerField(null=True, blank=True, verbose_name='Группа')
+    student_id = models.PositiveIntegerField(null=True, blank=True, verbose_name='Студент')
+    user_id = models.PositiveIntegerField(null=True, blank=True, verbose_name='Колдонуучу')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Убакыт')
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['group_id', 'id'], name='changelog_group_idx'),
+            models.Index(fields=['student_id', 'id'], name='changelog_student_idx'),
+            models.Index(fields=['user_id', 'id'], name='changelog_user_idx'),
+            models.Index(fields=['created_at'], name='changelog_created_idx'),
+        ]
+        verbose_name = 'Өзгөрүү'
+        verbose_name_plural = 'Өзгөрүүлөр журналы'
 
     def __str__(self):
-        return f"{self.title} - {self.recipient.username}"
\ No newline at end of file
+        return f"#{self.pk} {self.model}:{self.object_id} {self.action}"
+
+
+class DataVersion(models.Model):
+    """
+    Маалымат түрлөрүнүн версиялары - маалымдама API'лердин ETag/Last-Modified'и үчүн (core.data_versions)
+    Модель сакталганда же өчүрүлгөндө сигнал ошол эле транзакцияда версияны бирге көбөйтөт
+    """
+    name = models.CharField(max_length=30, unique=True, verbose_name='Аты')
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Өзгөргөн')
+
+    class Meta:
+        verbose_name = 'Маалымат версиясы'
+        verbose_name_plural = 'Маалымат версиялары'
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+class UnreadNotificationCounter(models.Model):
+    """
+    Колдонуучунун окулбаган билдирмелеринин саны - бир сап окуу менен (core.unread_counter)
+    Билдирме түзүлгөндө, окулганда же өчүрүлгөндө ошол эле транзакцияда жаңыланат,
+    четтөөлөрдү оңдоо: manage.py reconcile_unread_counters
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='unread_notification_counter', verbose_name='Колдонуучу',
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name='Окулбагандар')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Өзгөргөн')
+
+    class Meta:
+        verbose_name = 'Окулбагандардын саны'
+        verbose_name_plural = 'Окулбагандардын сандары'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count}"
+
+
+class BroadcastNotification(models.Model):
+    """
+    Жалпы билдирме - бир жолу сакталат, алуучулар аудитория эрежелеринен окууда аныкталат
+    (core.broadcasts): роль, группа, курс - бош талаа "баары". Колдонуучу катталганга
+    чейинки жалпы билдирмелер ага көрүнбөйт. Окулду/өчүрүлдү белгиси - BroadcastReceipt
+    """
+    sender = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='sent_broadcasts', verbose_name='Жөнөтүүчү',
+    )
+    notification_type = models.CharField(
+        max_length=20, choices=Notification.NOTIFICATION_TYPES, default='GENERAL', verbose_name='Түрү',
+    )
+    title = models.CharField(max_length=200, verbose_name='Аталышы')
+    message = models.TextField(verbose_name='Билдирме')
+    # Аудитория
+    role = models.CharField(
+        max_length=20, choices=UserProfile.ROLE_CHOICES, blank=True, default='', verbose_name='Роль',
+    )
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, null=True, blank=True, verbose_name='Группа')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, verbose_name='Курс')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Түзүлгөн')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['role', 'created_at'], name='broadcast_role_idx'),
+        ]
+        verbose_name = 'Жалпы билдирме'
+        verbose_name_plural = 'Жалпы билдирмелер'
+
+    def __str__(self):
+        return self.title
+
+
+class BroadcastReceipt(models.Model):
+    """Колдонуучу жалпы билдирмени окуду (сап бар болсо) же өзүнөн өчүрдү (dismissed)"""
+    broadcast = models.ForeignKey(
+        BroadcastNotification, on_delete=models.CASCADE, related_name='receipts', verbose_name='Жалпы билдирме',
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='broadcast_receipts', verbose_name='Колдонуучу',
+    )
+    dismissed = models.BooleanField(default=False, verbose_name='Өчүрүлдү')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Окулду')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'broadcast'], name='broadcast_receipt_unique'),
+        ]
+        verbose_name = 'Жалпы билдирменин белгиси'
+        verbose_name_plural = 'Жалпы билдирмелердин белгилери'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.broadcast_id}"
+
+
+class AbsenceAlert(models.Model):
+    """
+    Көп жолу келбегендиктин ачык эскертүүсү (core.absence_alerts) - студент чекке
+    жеткенде бир жолу түзүлөт жана билдирмелер жөнөтүлөт; терезедеги саны чектен
+    төмөн түшкөндө өчүрүлөт, кийинки жолу чекке жетсе кайра эскертилет
+    """
+    student = models.OneToOneField(
+        Student, on_delete=models.CASCADE, related_name='absence_alert', verbose_name='Студент',
+    )
+    absence_count = models.PositiveIntegerField(verbose_name='Келбеген саны')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Эскертилди')
+
+    class Meta:
+        verbose_name = 'Келбегендик эскертүүсү'
+        verbose_name_plural = 'Келбегендик эскертүүлөрү'
+
+    def __str__(self):
+        return f"{self.student_id}: {self.absence_count}"
+
+
+class TokenRevocation(models.Model):
+    """
+    Колдонуучунун revoked_at'ке чейин берилген JWT access токендери жараксыз (core.authentication)
+    user_id ForeignKey эмес: User өчүрүлүп жатканда (cascade) да жазуу ошол эле транзакцияда түзүлөт
+    """
+    user_id = models.PositiveBigIntegerField(primary_key=True, verbose_name='Колдонуучу ID')
+    revoked_at = models.DateTimeField(verbose_name='Чакыртып алынды')
+
+    class Meta:
+        verbose_name = 'Токендерди чакыртып алуу'
+        verbose_name_plural = 'Токендерди чакыртып алуулар'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.revoked_at}"
+
+
+class TokenClaimsUser(User):
+    """
+    JWT маалыматынан маалымат базасыз түзүлгөн колдонуучу (core.authentication)
+    Токенде жок талаалар (email, аты ж.б.) биринчи кайрылууда бир суроо менен чогуу жүктөлөт
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            # Бир талаа суралганда калгандары да ошол суроодо - талаа сайын өзүнчө суроо болбойт
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields)
@@ -0,0 +1,403 @@
+"""
+Билдирмелердин push-агымы (ASGI)
+GET /api/v1/notifications/stream/?ticket=<тикет> - server-sent events:
+    event: unread        data: {"unread_count": n}
+    event: notification  data: {"notification": {...}, "unread_count": n}  (id: билдирменин id'си)
+    Браузер кайра туташканда Last-Event-ID жөнөтөт - ортодо келген билдирмелер кайра берилет
+GET /api/v1/notifications/poll/?ticket=<тикет>&after=<id>&timeout=25 - long-poll (EventSource жок кардарлар)
+    Жооп: {"notifications": [...], "unread_count": n, "last_id": id} - жаңы билдирме же окулбагандардын
+    саны өзгөргөндө дароо, болбосо timeout секунддан кийин кайтат
+Тикет - POST /api/v1/notifications/stream_ticket/ (JWT менен) берген кыска мөөнөттүү кол тамга:
+EventSource Authorization header'ин жөнөтө албайт.
+
+Агым attendance_system/asgi.py'де Django'дон мурун туруучу өзүнчө ASGI тиркеме (middleware'сиз,
+кардар кеткенде дароо токтойт). WSGI (gunicorn sync worker) астында бул жолдор жок - кардар
+мурдагыдай мезгил-мезгили менен сурайт.
+
+Агымдар брокер аркылуу ойготулат (NOTIFICATION_STREAM_BACKEND):
+- InProcessBroker (default) - бир процесстин ичинде, asyncio окуялары
+- ChangeLogBroker - бир нече worker/сервер: ар бир агым sync журналын (ChangeLog) окуйт
+Башка брокер (Redis pub/sub ж.б.) NotificationBroker интерфейсин ишке ашырат.
+Брокер маалымат ташыбайт - "колдонуучунун билдирмелери өзгөрдү" деген сигнал гана,
+агым жаңы билдирмелерди жана санын өзү окуйт (сигнал жоголсо же бириксе да натыйжа туура).
+"""
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Max, Q
+from django.utils.module_loading import import_string
+
+from . import broadcasts, sync
+from .models import ChangeLog, Notification
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/v1/notifications/stream/'
+POLL_PATH = '/api/v1/notifications/poll/'
+
+TICKET_SALT = 'core.notification_stream'
+
+# Туташуу үзүлбөсүн деп (прокси, балансировщик) ушунча секунд тынч болсо комментарий жөнөтүлөт
+KEEPALIVE_SECONDS = 15
+
+# Long-poll'дун эң узак күтүүсү
+MAX_POLL_SECONDS = 30
+
+# Бир окуялар тобундагы билдирмелердин максималдуу саны (кайра туташканда)
+EVENT_BATCH = 50
+
+# Агымдарды ойгото турган sync журналынын моделдери
+STREAM_MODELS = ('notification', 'broadcast')
+
+EVENT_FIELDS = ('id', 'notification_type', 'title', 'message', 'is_read', 'created_at')
+
+
+# ============= БРОКЕРЛЕР =============
+
+class NotificationBroker:
+    """
+    Брокердин интерфейси
+    publish(user_id) - commit'тен кийин каалаган thread'ден чакырылат
+    publish_all() - жалпы билдирме: бардык агымдар
+    subscribe(user_id) - async context manager, subscription'ду берет:
+        await subscription.wait() - колдонуучунун билдирмелери өзгөргөнчө күтөт
+    """
+
+    def publish(self, user_id):
+        raise NotImplementedError
+
+    def publish_all(self):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        raise NotImplementedError
+
+
+class _EventSubscription:
+    """Бир агымдын ойготкучу - бир нече сигнал бир ойгонууга бириксе болот"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # loop жабылган - агым бүттү
+
+    async def wait(self):
+        await self.event.wait()
+        self.event.clear()
+
+
+class InProcessBroker(NotificationBroker):
+    """Бир процесстин ичиндеги pub/sub (бир ASGI worker үчүн)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def publish(self, user_id):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def publish_all(self):
+        with self._lock:
+            subscriptions = [item for items in self._subscriptions.values() for item in items]
+        for subscription in subscriptions:
+            subscription.notify()
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscription = _EventSubscription()
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscriptions = self._subscriptions.get(user_id, set())
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    self._subscriptions.pop(user_id, None)
+
+
+class _ChangeLogSubscription:
+    def __init__(self, user_id, cursor, interval):
+        self.user_id = user_id
+        self.cursor = cursor
+        self.interval = interval
+
+    async def wait(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            last_id = await run_in_db(_last_change_id)(self.user_id, self.cursor)
+            if last_id:
+                self.cursor = last_id
+                return
+
+
+def _last_change_id(user_id, cursor=0):
+    changes = ChangeLog.objects.filter(
+        Q(user_id=user_id) | Q(user_id__isnull=True), model__in=STREAM_MODELS, id__gt=cursor,
+    )
+    return changes.aggregate(last=Max('id'))['last']
+
+
+class ChangeLogBroker(NotificationBroker):
+    """
+    Бир нече worker/сервер үчүн: publish эч нерсе кылбайт, ар бир агым sync журналынан
+    колдонуучунун билдирме жазууларын NOTIFICATION_STREAM_POLL_SECONDS сайын текшерет
+    """
+
+    def publish(self, user_id):
+        pass
+
+    def publish_all(self):
+        pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        cursor = await run_in_db(_last_change_id)(user_id)
+        interval = getattr(settings, 'NOTIFICATION_STREAM_POLL_SECONDS', 2)
+        yield _ChangeLogSubscription(user_id, cursor or 0, interval)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Жөндөөлөрдөгү брокер (процесске бирөө)"""
+    path = getattr(settings, 'NOTIFICATION_STREAM_BACKEND', 'core.notification_stream.InProcessBroker')
+    return import_string(path)()
+
+
+def publish_entries(entries):
+    """
+    Sync журналынын билдирме жазууларынан - алуучулардын агымдарын ойготуу
+    Жалпы билдирме (колдонуучусу жок жазуу) бардык агымдарды ойготот
+    """
+    entries = [entry for entry in entries if entry.model in STREAM_MODELS]
+    if not entries:
+        return
+    broker = get_broker()
+    try:
+        if any(entry.user_id is None for entry in entries):
+            broker.publish_all()
+        else:
+            for user_id in {entry.user_id for entry in entries}:
+                broker.publish(user_id)
+    except Exception as e:
+        # Агым - кошумча жол, билдирме сакталды: кардар кийинки туташууда алат
+        logger.warning("Notification stream publish failed: %s", e)
+
+
+# ============= ТИКЕТТЕР =============
+
+def ticket_seconds():
+    """Тикет канча секунд жарактуу (туташуу ушул убакыттын ичинде ачылышы керек)"""
+    return getattr(settings, 'NOTIFICATION_STREAM_TICKET_SECONDS', 60)
+
+
+def issue_ticket(user):
+    return signing.dumps(user.pk, salt=TICKET_SALT)
+
+
+def read_ticket(ticket):
+    """Тикеттин колдонуучусу (жарактуу жана активдүү болсо) же None"""
+    try:
+        user_id = signing.loads(ticket, salt=TICKET_SALT, max_age=ticket_seconds())
+    except signing.BadSignature:
+        return None
+    return user_id if User.objects.filter(pk=user_id, is_active=True).exists() else None
+
+
+# ============= МААЛЫМАТ =============
+
+def run_in_db(func):
+    """Async агымдан ORM'ге кайрылуу - sync thread'те, эскирген байланыштар жабылып"""
+    def call(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(call)
+
+
+def user_audience(user_id):
+    """Агым ачылганда бир жолу - жалпы билдирмелердин аудиториясы үчүн"""
+    return sync.user_scope(User.objects.get(pk=user_id))
+
+
+def unread_changes(audience, after):
+    """after'ден кийинки окулбаган жеке билдирмелер жана окулбагандардын жалпы саны"""
+    rows = list(
+        Notification.objects.filter(recipient_id=audience['user_id'], is_read=False, id__gt=after)
+        .order_by('id').values(*EVENT_FIELDS)[:EVENT_BATCH]
+    )
+    return rows, broadcasts.unread_total(audience)
+
+
+def stream_start(user_id, last_event_id):
+    """Агымдын башталышы: кайра туташса - Last-Event-ID'ден, болбосо учурдагы акыркы билдирмеден"""
+    if last_event_id is not None:
+        return last_event_id
+    return Notification.objects.filter(recipient_id=user_id).aggregate(last=Max('id'))['last'] or 0
+
+
+# ============= ASGI =============
+
+def _headers(scope):
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+
+def _cors_headers(headers):
+    """django-cors-headers'тин жөндөөлөрү боюнча (бул жолдор Django middleware'инен өтпөйт)"""
+    origin = headers.get('origin')
+    if not origin:
+        return []
+    if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False) or origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', []):
+        return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+    return []
+
+
+def _int_param(value, default=None):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def _sse(event, data, event_id=None):
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, cls=DjangoJSONEncoder))
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def _send_json(send, status, data, extra_headers):
+    body = json.dumps(data, cls=DjangoJSONEncoder).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'cache-control', b'no-store')] + extra_headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _stream(send, receive, audience, last_id, extra_headers):
+    user_id = audience['user_id']
+    broker = get_broker()
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        async with broker.subscribe(user_id) as subscription:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),  # nginx буферлебесин
+                ] + extra_headers,
+            })
+            await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+            sent_count = None
+            while True:
+                rows, unread_count = await run_in_db(unread_changes)(audience, last_id)
+                chunks = []
+                for row in rows:
+                    chunks.append(_sse('notification', {'notification': row, 'unread_count': unread_count}, row['id']))
+                    last_id = row['id']
+                if not rows and unread_count != sent_count:
+                    chunks.append(_sse('unread', {'unread_count': unread_count}))
+                sent_count = unread_count
+                if chunks:
+                    await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': True})
+                if len(rows) == EVENT_BATCH:
+                    continue
+
+                # Өзгөрүү, кардардын кетиши же keepalive убактысы
+                while True:
+                    waiter = asyncio.ensure_future(subscription.wait())
+                    done, _ = await asyncio.wait(
+                        {waiter, disconnected}, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if waiter not in done:
+                        waiter.cancel()
+                    if disconnected in done:
+                        return
+                    if waiter in done:
+                        break
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+    finally:
+        disconnected.cancel()
+
+
+async def _long_poll(send, audience, after, timeout, extra_headers):
+    user_id = audience['user_id']
+    if after is None:
+        # Биринчи сурам: учурдагы абал, кардар кийинкисин last_id менен жөнөтөт
+        after = await run_in_db(stream_start)(user_id, None)
+        rows, unread_count = [], await run_in_db(broadcasts.unread_total)(audience)
+    else:
+        # Текшерүүдөн мурун жазылуу - ортодо келген сигнал жоголбосун
+        async with get_broker().subscribe(user_id) as subscription:
+            rows, unread_count = await run_in_db(unread_changes)(audience, after)
+            if not rows:
+                try:
+                    await asyncio.wait_for(subscription.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    rows, unread_count = await run_in_db(unread_changes)(audience, after)
+    await _send_json(send, 200, {
+        'notifications': rows,
+        'unread_count': unread_count,
+        'last_id': rows[-1]['id'] if rows else after,
+    }, extra_headers)
+
+
+async def application(scope, receive, send):
+    """STREAM_PATH жана POLL_PATH үчүн ASGI тиркеме (attendance_system/asgi.py багыттайт)"""
+    headers = _headers(scope)
+    cors = _cors_headers(headers)
+    if scope['method'] != 'GET':
+        await _send_json(send, 405, {'error': 'GET гана'}, cors + [(b'allow', b'GET')])
+        return
+
+    params = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    ticket = params.get('ticket', [''])[0]
+    user_id = await run_in_db(read_ticket)(ticket) if ticket else None
+    if user_id is None:
+        await _send_json(send, 401, {'error': 'Тикет жок же мөөнөтү өттү'}, cors)
+        return
+
+    audience = await run_in_db(user_audience)(user_id)
+    if scope['path'] == STREAM_PATH:
+        last_event_id = _int_param(headers.get('last-event-id'))
+        last_id = await run_in_db(stream_start)(user_id, last_event_id)
+        await _stream(send, receive, audience, last_id, cors)
+    else:
+        after = _int_param(params.get('after', [None])[0])
+        timeout = min(_int_param(params.get('timeout', [None])[0], 25), MAX_POLL_SECONDS)
+        await _long_poll(send, audience, after, timeout, cors)
@@ -0,0 +1,203 @@
+"""
+Сурамдын колдонуучусу (principal): ролу жана ага байланышкан жазуулар
+Көрүнүштөр user.userprofile, Student/Teacher.objects.get(user=...), ата-эненин балдары
+жана мугалимдин сабактары үчүн өз суроолорун жибербей, get_principal(request) колдонушат.
+- Сурамдын ичинде бир жолу: натыйжа request.user объектисинде сакталат (сессия да,
+  JWT да колдонуучуну ар бир сурамга бир жолу жүктөйт)
+- Сурамдардын ортосунда: кэште PRINCIPAL_CACHE_TIMEOUT секунд (0 - өчүк).
+  Профиль, студент, мугалим, сабак же ата-эне байланышы өзгөргөндө версия
+  commit'тен кийин көбөйөт (core.signals) - эски жазуулар колдонулбайт.
+  Версия кэште, ошондуктан кэш бардык процесстерге жалпы болгондо гана күйгүзүлөт
+  (демейки: settings.SHARED_CACHE болсо 300, болбосо 0)
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Student, Teacher, UserProfile
+
+PRINCIPAL_VERSION_KEY = 'principal:version'
+PRINCIPAL_KEY = 'principal:{version}:{user_id}'
+
+STAFF_ROLES = ('ADMIN', 'MANAGER')
+
+
+def cache_timeout():
+    return getattr(settings, 'PRINCIPAL_CACHE_TIMEOUT', 0)
+
+
+class Principal:
+    """
+    Колдонуучунун ролу жана жазуулары
+    student: өз Student жазуусу (id, group_id, course_id) же None - STUDENT жана TEACHER үчүн
+    children: ата-эненин балдары [(id, group_id, course_id), ...]
+    """
+
+    def __init__(self, user_id=None, profile_id=None, role=None, student=None, children=(),
+                 teacher_id=None, subject_ids=()):
+        self.user_id = user_id
+        self.profile_id = profile_id
+        self.role = role
+        self.student = tuple(student) if student else None
+        self.children = [tuple(child) for child in children]
+        self.teacher_id = teacher_id
+        self.subject_ids = list(subject_ids)
+
+    def __repr__(self):
+        return f'<Principal user={self.user_id} role={self.role}>'
+
+    @property
+    def has_profile(self):
+        return self.profile_id is not None
+
+    @property
+    def is_admin(self):
+        """ADMIN же MANAGER"""
+        return self.role in STAFF_ROLES
+
+    @property
+    def student_id(self):
+        return self.student[0] if self.student else None
+
+    @property
+    def student_group_id(self):
+        return self.student[1] if self.student else None
+
+    @property
+    def children_ids(self):
+        return [child_id for child_id, _, _ in self.children]
+
+    @property
+    def students(self):
+        """Колдонуучу катышуусун көрө турган студенттер: студенттин өзү же ата-эненин балдары"""
+        if self.role == 'STUDENT':
+            return [self.student] if self.student else []
+        if self.role == 'PARENT':
+            return self.children
+        return []
+
+    @property
+    def student_ids(self):
+        return [student_id for student_id, _, _ in self.students]
+
+    @property
+    def group_ids(self):
+        return sorted({group_id for _, group_id, _ in self.students if group_id is not None})
+
+    @property
+    def course_ids(self):
+        return sorted({course_id for _, _, course_id in self.students if course_id is not None})
+
+    def claims(self):
+        """JWT'ге салынуучу маалымат (core.authentication)"""
+        return {
+            'role': self.role,
+            'profile_id': self.profile_id,
+            'student_id': self.student_id,
+            'group_id': self.student_group_id,
+            'course_id': self.student[2] if self.student else None,
+            'teacher_id': self.teacher_id,
+            'subject_ids': self.subject_ids,
+            'children': self.children,
+        }
+
+    @classmethod
+    def from_claims(cls, user_id, token):
+        """claims() менен салынган токенден - маалымат базасыз"""
+        student = None
+        if token.get('student_id') is not None:
+            student = (token['student_id'], token.get('group_id'), token.get('course_id'))
+        return cls(
+            user_id, token.get('profile_id'), token.get('role'), student, token.get('children', ()),
+            token.get('teacher_id'), token.get('subject_ids', ()),
+        )
+
+    def as_dict(self):
+        return {
+            'user_id': self.user_id,
+            'profile_id': self.profile_id,
+            'role': self.role,
+            'student': self.student,
+            'children': self.children,
+            'teacher_id': self.teacher_id,
+            'subject_ids': self.subject_ids,
+        }
+
+
+def resolve(user_id):
+    """Маалымат базасынан: профиль жана ролго жараша бир-эки суроо"""
+    profile = UserProfile.objects.filter(user_id=user_id).values_list('id', 'role').first()
+    if profile is None:
+        return Principal(user_id)
+    profile_id, role = profile
+
+    student = None
+    if role in ('STUDENT', 'TEACHER'):
+        # Мугалим да студент катары бошотуу сурамын бере алат (LeaveRequestViewSet)
+        student = Student.objects.filter(user_id=user_id).values_list('id', 'group_id', 'course_id').first()
+
+    children = []
+    if role == 'PARENT':
+        children = Student.objects.filter(parents__id=profile_id).order_by('id').values_list(
+            'id', 'group_id', 'course_id',
+        )
+
+    teacher_id, subject_ids = None, []
+    if role == 'TEACHER':
+        rows = list(Teacher.objects.filter(user_id=user_id).order_by('id').values_list('id', 'subject__id'))
+        if rows:
+            teacher_id = rows[0][0]
+            subject_ids = sorted(subject_id for row_teacher, subject_id in rows
+                                 if row_teacher == teacher_id and subject_id is not None)
+
+    return Principal(user_id, profile_id, role, student, children, teacher_id, subject_ids)
+
+
+def _get_version():
+    version = cache.get(PRINCIPAL_VERSION_KEY)
+    if version is None:
+        cache.add(PRINCIPAL_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(PRINCIPAL_VERSION_KEY, 0)
+    return version
+
+
+def _bump_version():
+    try:
+        cache.incr(PRINCIPAL_VERSION_KEY)
+    except ValueError:
+        cache.set(PRINCIPAL_VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate():
+    """Бардык сакталган principal'дарды эскиртүү (транзакция ийгиликтүү бүткөндөн кийин)"""
+    transaction.on_commit(_bump_version)
+
+
+def load(user_id):
+    """Кэштен же маалымат базасынан"""
+    timeout = cache_timeout()
+    if not timeout:
+        return resolve(user_id)
+    key = PRINCIPAL_KEY.format(version=_get_version(), user_id=user_id)
+    data = cache.get(key)
+    if data is not None:
+        return Principal(**data)
+    principal = resolve(user_id)
+    cache.set(key, principal.as_dict(), timeout)
+    return principal
+
+
+def for_user(user):
+    """Колдонуучунун principal'ы - объектте сакталат, ошол сурамда кайра эсептелбейт"""
+    if user is None or not user.is_authenticated:
+        return Principal()
+    principal = getattr(user, '_principal', None)
+    if principal is None or principal.user_id != user.pk:
+        principal = user._principal = load(user.pk)
+    return principal
+
+
+def get_principal(request):
+    return for_user(getattr(request, 'user', None))
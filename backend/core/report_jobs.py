@@ -0,0 +1,285 @@
+"""
+Фондук отчет жумуштары
+Кезек - ReportJob таблицасы (тышкы broker керек эмес):
+- submit_job(): сурам жумушту PENDING абалында сактайт жана дароо жооп берет
+- claim_next_job(): worker жумушту шарттуу UPDATE менен ээлейт - эки worker бир жумушту албайт
+- run_job(): файлды даярдап job.file'га сактайт, даярдыгын progress талаасына жазат
+- Иштеп жаткан жумуштун heartbeat_at талаасы мезгил-мезгили менен жаңыланат; токтоп калган
+  жумуш башталган убакыт боюнча эмес, акыркы белги боюнча аныкталат (requeue_stale_jobs).
+  Натыйжа ээлөө белгиси (claim_token) менен шарттуу жазылат - кайра кезекке коюлган
+  жумуштун мурунку worker'и экинчи worker'дин натыйжасын өзгөртө албайт
+Worker: manage.py run_report_worker
+"""
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .exports import write_detailed_excel, write_detailed_pdf, write_table_excel
+from .models import ReportJob
+from .reports import (
+    ADVANCED_REPORT_TYPES, advanced_report_sheets, parse_date, report_period, report_summary,
+)
+from .statistics import filter_attendances
+
+logger = logging.getLogger(__name__)
+
+# Бир жумуштун аракеттеринин максималдуу саны (worker өлүп калса кайра кезекке кайтат)
+MAX_ATTEMPTS = 3
+
+# progress талаасын жаңылоонун эң кыска аралыгы (секунд)
+PROGRESS_INTERVAL = 2.0
+
+# heartbeat_at талаасын жаңылоонун аралыгы (секунд) - --stale-after мындан бир топ чоң болушу керек
+HEARTBEAT_INTERVAL = 60.0
+
+# Жумуштун параметрлери - GET/POST'тон ушулар гана сакталат
+ATTENDANCE_PARAMS = ('report_type', 'start_date', 'end_date', 'student', 'group')
+ADVANCED_PARAMS = (
+    'report_type', 'student_id', 'group_id', 'course_id', 'subject_id',
+    'teacher_id', 'start_date', 'end_date', 'status_filter',
+)
+
+JOB_PARAMS = {
+    'attendance_excel': ATTENDANCE_PARAMS,
+    'attendance_pdf': ATTENDANCE_PARAMS,
+    'advanced_report': ADVANCED_PARAMS,
+}
+
+
+def worker_name():
+    """Worker'дин аты: host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def clean_params(kind, data):
+    """Жумуштун параметрлерин тандоо жана текшерүү (ValueError - туура эмес маалымат)"""
+    if kind not in JOB_PARAMS:
+        raise ValueError(f"Белгисиз жумуш түрү: {kind}")
+    params = {key: str(data[key]) for key in JOB_PARAMS[kind] if data.get(key) not in (None, '')}
+    for key in ('start_date', 'end_date'):
+        if key in params and parse_date(params[key]) is None:
+            raise ValueError(f"Туура эмес дата: {key}={params[key]}")
+    if kind == 'advanced_report' and params.get('report_type', 'overview') not in ADVANCED_REPORT_TYPES:
+        raise ValueError(f"Белгисиз отчет түрү: {params['report_type']}")
+    return params
+
+
+def submit_job(user, kind, data):
+    """Жаңы жумушту кезекке коюу"""
+    job = ReportJob.objects.create(kind=kind, params=clean_params(kind, data), created_by=user)
+    logger.info("Report job %s submitted", job.pk, extra={'job_id': job.pk, 'kind': kind, 'user_id': user.pk})
+    return job
+
+
+# ============= КЕЗЕК =============
+
+def requeue_stale_jobs(stale_after):
+    """
+    stale_after секунддан бери белги бербеген RUNNING жумуштар (worker өлгөн) -
+    аракеттер калса кайра PENDING, болбосо FAILED
+    Узак иштеген жумуш белги берип турганда кайра кезекке коюлбайт
+    """
+    deadline = timezone.now() - timedelta(seconds=stale_after)
+    stale = ReportJob.objects.filter(
+        Q(heartbeat_at__lt=deadline) | Q(heartbeat_at__isnull=True, started_at__lt=deadline),
+        status='RUNNING',
+    )
+    requeued = stale.filter(attempts__lt=MAX_ATTEMPTS).update(
+        status='PENDING', worker='', claim_token='', progress=0,
+    )
+    failed = stale.update(
+        status='FAILED', claim_token='', finished_at=timezone.now(), message='Worker жооп бербей калды',
+    )
+    return requeued, failed
+
+
+def claim_next_job(worker):
+    """
+    Эң эски PENDING жумушту ээлөө
+    UPDATE ... WHERE status='PENDING' атомдук: башка worker ээлеп алса 0 сап жаңыланат
+    жана кийинкисин сынайбыз
+    """
+    candidates = ReportJob.objects.filter(status='PENDING').order_by('created_at').values_list('pk', flat=True)
+    for job_id in list(candidates[:10]):
+        now = timezone.now()
+        claimed = ReportJob.objects.filter(pk=job_id, status='PENDING').update(
+            status='RUNNING', worker=worker, claim_token=uuid.uuid4().hex, progress=0, message='',
+            attempts=F('attempts') + 1, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=job_id)
+    return None
+
+
+def purge_old_jobs(days):
+    """days күндөн эски бүткөн жумуштарды файлдары менен өчүрүү"""
+    deadline = timezone.now() - timedelta(days=days)
+    old = ReportJob.objects.filter(status__in=['DONE', 'FAILED'], created_at__lt=deadline)
+    count = 0
+    for job in old.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
+
+
+# ============= ЖУМУШТАРДЫ АТКАРУУ =============
+
+class JobLost(Exception):
+    """Жумуш кайра кезекке коюлуп, башка worker'ге өттү - бул аткаруу токтотулат"""
+
+
+def owned(job):
+    """Ушул worker'дин ээлөөсүндөгү жумуштун жолу (шарттуу UPDATE'тер үчүн)"""
+    return ReportJob.objects.filter(pk=job.pk, status='RUNNING', claim_token=job.claim_token)
+
+
+class ProgressReporter:
+    """Даярдыкты progress талаасына жана белгини heartbeat_at'ка жазуу - PROGRESS_INTERVAL'дан көп эмес"""
+
+    def __init__(self, job):
+        self.job = job
+        self.last_update = 0.0
+
+    def __call__(self, done, total):
+        now = time.monotonic()
+        if not total or now - self.last_update < PROGRESS_INTERVAL:
+            return
+        self.last_update = now
+        # 100% - файл сакталгандан кийин гана
+        percent = min(99, int(done * 100 / total))
+        if not owned(self.job).update(progress=percent, heartbeat_at=timezone.now()):
+            raise JobLost(self.job.pk)
+
+
+class Heartbeat:
+    """
+    Жумуш аткарылып жатканда heartbeat_at'ты өзүнчө агымда жаңылоо
+    Даярдыгын билдирбеген этаптар (PDF, кеңири отчет, файлды сактоо) үчүн да worker тирүү көрүнөт
+    """
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = HEARTBEAT_INTERVAL if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'report-job-{job.pk}-heartbeat', daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                if not owned(self.job).update(heartbeat_at=timezone.now()):
+                    return
+        except Exception:
+            logger.exception("Report job %s heartbeat failed", self.job.pk, extra={'job_id': self.job.pk})
+        finally:
+            # Агымдын өз туташуусу
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _attendance_queryset(params):
+    start_date, end_date = report_period(
+        params.get('report_type', 'all'), params.get('start_date'), params.get('end_date'),
+        timezone.now().date(),
+    )
+    attendances = filter_attendances(start_date, end_date, params.get('group'), params.get('student'))
+    return attendances, start_date, end_date
+
+
+def run_attendance_excel(job, fileobj, progress):
+    attendances, _, _ = _attendance_queryset(job.params)
+    write_detailed_excel(fileobj, attendances, progress=progress)
+    return 'detailed_attendance_report.xlsx'
+
+
+def run_attendance_pdf(job, fileobj, progress):
+    attendances, start_date, end_date = _attendance_queryset(job.params)
+    stats = report_summary(attendances, job.params.get('report_type', 'all'), start_date, end_date)
+    write_detailed_pdf(fileobj, attendances, stats)
+    return 'detailed_attendance_report.pdf'
+
+
+def run_advanced_report(job, fileobj, progress):
+    report_type = job.params.get('report_type') or 'overview'
+    write_table_excel(fileobj, advanced_report_sheets(job.params, timezone.now().date()))
+    return f'advanced_report_{report_type}.xlsx'
+
+
+# Жумуштун түрү -> handler(job, fileobj, progress) -> файлдын аты
+JOB_HANDLERS = {
+    'attendance_excel': run_attendance_excel,
+    'attendance_pdf': run_attendance_pdf,
+    'advanced_report': run_advanced_report,
+}
+
+
+def _lost(job):
+    """Жумуш башка worker'ге өттү - анын абалы базадан, бул аткаруунун натыйжасы жазылбайт"""
+    logger.warning(
+        "Report job %s was requeued while running, result discarded", job.pk,
+        extra={'job_id': job.pk, 'kind': job.kind},
+    )
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job):
+    """
+    Ээленген жумушту аткаруу
+    Файл адегенде убактылуу файлга жазылат, анан storage'ке (MEDIA_ROOT/reports/) көчөт
+    DONE/FAILED ээлөө белгиси менен шарттуу жазылат
+    """
+    started = time.perf_counter()
+    try:
+        handler = JOB_HANDLERS[job.kind]
+        with Heartbeat(job), tempfile.TemporaryFile() as tmp:
+            filename = handler(job, tmp, ProgressReporter(job))
+            tmp.seek(0)
+            job.file.save(f'{job.pk}-{filename}', File(tmp), save=False)
+    except JobLost:
+        return _lost(job)
+    except Exception as exc:
+        logger.exception("Report job %s failed", job.pk, extra={'job_id': job.pk, 'kind': job.kind})
+        job.status = 'FAILED'
+        job.message = str(exc)[:255]
+        job.finished_at = timezone.now()
+        if not owned(job).update(status=job.status, message=job.message, finished_at=job.finished_at):
+            return _lost(job)
+        return job
+
+    job.status = 'DONE'
+    job.progress = 100
+    job.finished_at = timezone.now()
+    if not owned(job).update(status=job.status, progress=job.progress, file=job.file.name, finished_at=job.finished_at):
+        # Экинчи worker'дин файлы жана абалы калат - бул аткаруунун файлы керек эмес
+        job.file.delete(save=False)
+        return _lost(job)
+    logger.info(
+        "Report job %s done", job.pk,
+        extra={'job_id': job.pk, 'kind': job.kind, 'job_ms': round((time.perf_counter() - started) * 1000, 2)},
+    )
+    return job
+
+
+def retention_days():
+    """Бүткөн жумуштар канча күн сакталат"""
+    return getattr(settings, 'REPORT_JOB_RETENTION_DAYS', 7)
@@ -0,0 +1,320 @@
+"""
+Отчеттордун фильтрлери жана таблицалары
+report/advanced_report view'лору, фондук отчет жумуштары (report_jobs) жана
+/api/v1/reports/attendance/ (keyset барактоо, NDJSON/CSV агымы) бирдей колдонот
+"""
+import base64
+import csv
+import json
+from datetime import date, datetime, timedelta
+
+from django.db.models import Q
+
+from .models import Attendance, Group, Student, Subject, Teacher
+from .statistics import (
+    EMPTY_COUNTS, STATUS_KEYS, _rate, get_group_status_counts, get_status_breakdown, get_status_counts,
+)
+
+ADVANCED_REPORT_TYPES = (
+    'overview', 'student_details', 'group_analysis',
+    'subject_performance', 'teacher_report', 'attendance_list',
+)
+
+STATUS_LABELS = dict(Attendance.STATUS_CHOICES)
+
+
+def parse_date(value):
+    """'YYYY-MM-DD' сабын date'ке которуу (туура эмес болсо None)"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+# ============= REPORT (катышуу отчету) =============
+
+def report_period(report_type, start_date, end_date, today):
+    """
+    report() view'нун мезгили: daily/weekly/monthly тез фильтрлери
+    же start_date/end_date ('YYYY-MM-DD')
+    """
+    if report_type == 'daily':
+        return today, today
+    if report_type == 'weekly':
+        return today - timedelta(days=today.weekday()), today
+    if report_type == 'monthly':
+        return today.replace(day=1), today
+    return parse_date(start_date), parse_date(end_date)
+
+
+def report_summary(attendances, report_type, start_date, end_date):
+    """PDF отчетунун жыйынтык блогу - бир aggregate суроо"""
+    counts = get_status_counts(attendances)
+    return {
+        'report_type': report_type,
+        'start_date': start_date,
+        'end_date': end_date,
+        'total_records': counts['total'],
+        'present_count': counts['present'],
+        'absent_count': counts['absent'],
+        'late_count': counts['late'],
+        'excused_count': counts['excused'],
+        'attendance_percentage': _rate(counts['present'], counts['total']),
+    }
+
+
+# ============= ADVANCED REPORT (кеңири отчет) =============
+
+def advanced_report_period(start_date, end_date, today):
+    """Кеңири отчеттун мезгили - демейки боюнча акыркы 30 күн"""
+    parsed_start = parse_date(start_date) if start_date else today - timedelta(days=30)
+    parsed_end = parse_date(end_date) if end_date else today
+    if parsed_start is None or parsed_end is None:
+        return today - timedelta(days=30), today
+    return parsed_start, parsed_end
+
+
+def advanced_report_filter(params, start_date, end_date):
+    """Кеңири отчеттун Attendance фильтри (GET параметрлеринен)"""
+    attendance_filter = Q(date__range=[start_date, end_date])
+
+    if params.get('student_id'):
+        attendance_filter &= Q(student_id=params['student_id'])
+    if params.get('group_id'):
+        attendance_filter &= Q(student__group_id=params['group_id'])
+    if params.get('course_id'):
+        attendance_filter &= Q(student__course_id=params['course_id'])
+    if params.get('subject_id'):
+        attendance_filter &= Q(schedule__subject_id=params['subject_id'])
+    if params.get('teacher_id'):
+        attendance_filter &= Q(schedule__teacher_id=params['teacher_id'])
+    if params.get('status_filter'):
+        attendance_filter &= Q(status=params['status_filter'])
+    return attendance_filter
+
+
+def attendance_rate(counts, digits=2):
+    """Катышуу пайызы: (катышкан + кечиккен) / жалпы"""
+    if counts['total'] > 0:
+        return round((counts['present'] + counts['late']) / counts['total'] * 100, digits)
+    return 0
+
+
+def _count_row(counts, digits=2):
+    return [
+        counts['total'], counts['present'], counts['absent'],
+        counts['late'], counts['excused'], attendance_rate(counts, digits),
+    ]
+
+
+COUNT_HEADERS = ['Жалпы', 'Катышты', 'Катышкан жок', 'Кечикти', 'Уруксат менен', 'Катышуу %']
+
+
+def advanced_report_sheets(params, today):
+    """
+    Кеңири отчеттун Excel барактары: [(аты, баш саптар, саптар), ...]
+    Ар бир барак - бир GROUP BY суроосу (объект боюнча count() циклдери жок)
+    """
+    report_type = params.get('report_type') or 'overview'
+    start_date, end_date = advanced_report_period(params.get('start_date'), params.get('end_date'), today)
+    attendances = Attendance.objects.filter(advanced_report_filter(params, start_date, end_date))
+    period = [['Мезгил', f"{start_date:%d.%m.%Y} - {end_date:%d.%m.%Y}"], ['Отчет түрү', report_type]]
+
+    if report_type == 'overview':
+        counts = get_status_counts(attendances)
+        per_group = get_group_status_counts(attendances)
+        groups = Group.objects.in_bulk([group_id for group_id in per_group if group_id is not None])
+        group_rows = sorted(
+            [[groups[group_id].name if group_id in groups else 'Н/Д'] + _count_row(group_counts)
+             for group_id, group_counts in per_group.items()],
+            key=lambda row: row[0],
+        )
+        return [
+            ('Жалпы', ['Көрсөткүч', 'Мааниси'], period + [
+                [STATUS_LABELS.get(status, status), counts[key]] for status, key in STATUS_KEYS.items()
+            ] + [['Жалпы жазуулар', counts['total']]]),
+            ('Группалар', ['Группа'] + COUNT_HEADERS, group_rows),
+        ]
+
+    if report_type == 'student_details':
+        student_id = params.get('student_id')
+        if student_id:
+            records = attendances.order_by('-date', '-marked_at').values_list(
+                'date', 'schedule__subject__subject_name', 'schedule__teacher__name', 'status'
+            )
+            per_subject = get_status_breakdown(attendances, 'schedule__subject_id', 'schedule__subject__subject_name')
+            return [
+                ('Жазуулар', ['Дата', 'Сабак', 'Мугалим', 'Статус'], (
+                    [day.strftime('%d.%m.%Y'), subject or 'Н/Д', teacher or 'Н/Д', STATUS_LABELS.get(status, status)]
+                    for day, subject, teacher, status in records.iterator()
+                )),
+                ('Сабактар', ['Сабак'] + COUNT_HEADERS, [
+                    [row['schedule__subject__subject_name'] or 'Н/Д'] + _count_row(row, 1)
+                    for row in sorted(per_subject, key=lambda row: row['schedule__subject__subject_name'] or '')
+                ]),
+            ]
+        per_student = get_group_status_counts(attendances, 'student_id')
+        students = Student.objects.order_by('group__name', 'name').values_list('id', 'name', 'group__name')
+        return [
+            ('Студенттер', ['Студент', 'Группа'] + COUNT_HEADERS, [
+                [name, group_name or 'Н/Д'] + _count_row(per_student.get(pk, EMPTY_COUNTS), 1)
+                for pk, name, group_name in students
+            ]),
+        ]
+
+    if report_type == 'group_analysis':
+        group_id = params.get('group_id')
+        if not group_id:
+            return [('Группалар', ['Билдирүү'], [['Группа тандалган жок']])]
+        per_student = get_group_status_counts(attendances, 'student_id')
+        students = Student.objects.filter(group_id=group_id).values_list('id', 'name')
+        return [
+            ('Студенттер', ['Студент'] + COUNT_HEADERS, [
+                [name] + _count_row(per_student.get(pk, EMPTY_COUNTS))
+                for pk, name in students
+            ]),
+        ]
+
+    if report_type in ('subject_performance', 'teacher_report'):
+        if report_type == 'subject_performance':
+            title, header, field, model, name_field = 'Сабактар', 'Сабак', 'schedule__subject_id', Subject, 'subject_name'
+        else:
+            title, header, field, model, name_field = 'Мугалимдер', 'Мугалим', 'schedule__teacher_id', Teacher, 'name'
+        per_object = get_group_status_counts(attendances, field)
+        names = dict(model.objects.filter(pk__in=[pk for pk in per_object if pk is not None])
+                     .values_list('pk', name_field))
+        rows = [
+            [names[pk]] + _count_row(counts)
+            for pk, counts in per_object.items() if pk in names and counts['total'] > 0
+        ]
+        rows.sort(key=lambda row: row[-1], reverse=True)
+        return [(title, [header] + COUNT_HEADERS, rows)]
+
+    if report_type == 'attendance_list':
+        records = attendances.order_by('-date', 'student__name').values_list(
+            'date', 'student__name', 'student__group__name',
+            'schedule__subject__subject_name', 'schedule__teacher__name', 'status',
+        )
+        return [
+            ('Жазуулар', ['Дата', 'Студент', 'Группа', 'Сабак', 'Мугалим', 'Статус'], (
+                [day.strftime('%d.%m.%Y'), student, group or 'Н/Д', subject or 'Н/Д',
+                 teacher or 'Н/Д', STATUS_LABELS.get(status, status)]
+                for day, student, group, subject, teacher, status in records.iterator(chunk_size=2000)
+            )),
+        ]
+
+    raise ValueError(f"Белгисиз отчет түрү: {report_type}")
+
+
+# ============= API: КАТЫШУУ ОТЧЕТУ (keyset барактоо жана агым) =============
+
+ATTENDANCE_REPORT_PAGE_SIZE = 200
+ATTENDANCE_REPORT_MAX_PAGE_SIZE = 2000
+
+# Keyset тартиби: (date, id) кемүү боюнча - OFFSET жок, ар бир барак индекс менен башталат
+ATTENDANCE_REPORT_ORDERING = ('-date', '-id')
+
+ATTENDANCE_REPORT_FIELDS = (
+    'id', 'date', 'status', 'marked_at', 'student_id', 'student__name',
+    'student__user__username', 'student__user__first_name', 'student__user__last_name',
+    'student__group__name', 'subject__subject_name', 'schedule__teacher__name',
+    'created_by_id', 'created_by__first_name', 'created_by__last_name',
+)
+
+ATTENDANCE_REPORT_COLUMNS = (
+    'id', 'date', 'student_name', 'student_id', 'group', 'subject', 'teacher',
+    'status', 'status_display', 'marked_at', 'marked_by',
+)
+
+ATTENDANCE_STATUS_DISPLAY = {
+    'Present': '✅ Келди',
+    'Absent': '❌ Келбеди',
+    'Late': '⏰ Кечикти',
+}
+
+
+def _full_name(first_name, last_name):
+    """User.get_full_name() менен бирдей"""
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+def attendance_report_row(values):
+    """values_list(*ATTENDANCE_REPORT_FIELDS) сабынан API жазуусу"""
+    (pk, day, status, marked_at, student_id, student_name, username, first_name, last_name,
+     group_name, subject_name, teacher_name, creator_id, creator_first, creator_last) = values
+    return {
+        'id': pk,
+        'date': day.strftime('%Y-%m-%d'),
+        'student_name': _full_name(first_name, last_name) or username or student_name,
+        'student_id': student_id,
+        'group': group_name or '-',
+        'subject': subject_name or '-',
+        'teacher': teacher_name or '-',
+        'status': status,
+        'status_display': ATTENDANCE_STATUS_DISPLAY.get(status, status),
+        'marked_at': marked_at.strftime('%H:%M') if marked_at else '-',
+        'marked_by': _full_name(creator_first, creator_last) if creator_id else '-',
+    }
+
+
+def encode_cursor(day, pk):
+    """Акыркы саптын (date, id) ачкычынан ачык эмес курсор"""
+    return base64.urlsafe_b64encode(f"{day.isoformat()}:{pk}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Курсордон (date, id) - туура эмес болсо ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        day, pk = raw.split(':')
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('Туура эмес cursor') from exc
+
+
+def attendance_report_page(queryset, cursor=None, page_size=ATTENDANCE_REPORT_PAGE_SIZE):
+    """
+    Бир барак: (жазуулар, кийинки курсор же None)
+    Кийинки барак бар экенин билүү үчүн page_size + 1 сап окулат
+    """
+    if cursor:
+        day, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(date__lt=day) | Q(date=day, id__lt=pk))
+    rows = list(
+        queryset.order_by(*ATTENDANCE_REPORT_ORDERING)
+        .values_list(*ATTENDANCE_REPORT_FIELDS)[:page_size + 1]
+    )
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return [attendance_report_row(values) for values in rows], next_cursor
+
+
+def _iter_report_rows(queryset, chunk_size=2000):
+    rows = queryset.order_by(*ATTENDANCE_REPORT_ORDERING).values_list(*ATTENDANCE_REPORT_FIELDS)
+    for values in rows.iterator(chunk_size=chunk_size):
+        yield attendance_report_row(values)
+
+
+def stream_attendance_ndjson(queryset):
+    """Ар бир сап - өзүнчө JSON объект (application/x-ndjson)"""
+    for row in _iter_report_rows(queryset):
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """csv.writer үчүн - жазылган сапты дароо кайтарат"""
+
+    def write(self, value):
+        return value
+
+
+def stream_attendance_csv(queryset):
+    """CSV: баш сап жана жазуулар (Excel кириллицаны таанышы үчүн BOM менен)"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(ATTENDANCE_REPORT_COLUMNS)
+    for row in _iter_report_rows(queryset):
+        yield writer.writerow([row[column] for column in ATTENDANCE_REPORT_COLUMNS])
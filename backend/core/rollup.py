@@ -0,0 +1,195 @@
+"""
+Күндүк катышуу жыйынтыгын (DailyAttendanceRollup) жүргүзүү
+Статистика чийки Attendance таблицасын эмес, ушул жыйынтыкты окуйт
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Attendance, DailyAttendanceRollup, Student
+
+
+def rollup_key(day, group_id, subject_id, status):
+    """Жыйынтык жолунун ачкычы"""
+    return (day, group_id, subject_id, status)
+
+
+def student_group_id(attendance):
+    """Attendance'тын студентинин группасы (кэштелген болсо кошумча суроосуз)"""
+    if attendance.student_id is None:
+        return None
+    if Attendance.student.is_cached(attendance):
+        return attendance.student.group_id if attendance.student else None
+    return Student.objects.filter(pk=attendance.student_id).values_list('group_id', flat=True).first()
+
+
+def attendance_key(attendance, group_id=None):
+    """Attendance объектисинин жыйынтык ачкычы"""
+    if group_id is None:
+        group_id = student_group_id(attendance)
+    return rollup_key(attendance.date, group_id, attendance.subject_id, attendance.status)
+
+
+def stored_attendance_key(pk):
+    """Базада сакталган Attendance жолунун ачкычы (өзгөртүүгө чейин)"""
+    row = Attendance.objects.filter(pk=pk).values(
+        'date', 'student__group_id', 'subject_id', 'status'
+    ).first()
+    if row is None:
+        return None
+    return rollup_key(row['date'], row['student__group_id'], row['subject_id'], row['status'])
+
+
+def stored_attendance_keys(pks):
+    """{pk: ачкыч} - базада сакталган жолдордун ачкычтары бир суроо менен (топтоп өзгөртүүгө чейин)"""
+    rows = Attendance.objects.filter(pk__in=list(pks)).values_list(
+        'pk', 'date', 'student__group_id', 'subject_id', 'status'
+    )
+    return {pk: rollup_key(day, group_id, subject_id, status) for pk, day, group_id, subject_id, status in rows}
+
+
+def _apply_rollup_delta(key, delta):
+    """Бир жыйынтык жолуна delta кошуу (жок болсо түзүү)"""
+    day, group_id, subject_id, status = key
+    lookup = {'date': day, 'group_id': group_id, 'subject_id': subject_id, 'status': status}
+    updated = DailyAttendanceRollup.objects.filter(**lookup).update(count=F('count') + delta)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            DailyAttendanceRollup.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # Параллелдүү сурам жолду биринчи түзүп койгон
+        DailyAttendanceRollup.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Жыйынтыкка өзгөрүүлөрдү кошуу
+    deltas: {(date, group_id, subject_id, status): +n / -n}
+    Көп ачкыч болсо бир SELECT, бир bulk_update жана бир bulk_create менен
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        if len(deltas) == 1:
+            key, delta = next(iter(deltas.items()))
+            _apply_rollup_delta(key, delta)
+            return
+
+        existing = {}
+        rows = DailyAttendanceRollup.objects.filter(date__in={key[0] for key in deltas})
+        for row in rows:
+            key = rollup_key(row.date, row.group_id, row.subject_id, row.status)
+            if key in deltas:
+                existing[key] = row
+
+        to_update = []
+        for key, row in existing.items():
+            row.count = F('count') + deltas[key]
+            to_update.append(row)
+        DailyAttendanceRollup.objects.bulk_update(to_update, ['count'], batch_size=500)
+
+        missing = [key for key in deltas if key not in existing]
+        try:
+            with transaction.atomic():
+                DailyAttendanceRollup.objects.bulk_create([
+                    DailyAttendanceRollup(
+                        date=day, group_id=group_id, subject_id=subject_id,
+                        status=status, count=deltas[(day, group_id, subject_id, status)]
+                    )
+                    for day, group_id, subject_id, status in missing
+                ], batch_size=500)
+        except IntegrityError:
+            # Параллелдүү сурам айрым жолдорду түзүп койгон - ачкыч боюнча бирден
+            for key in missing:
+                _apply_rollup_delta(key, deltas[key])
+
+
+def record_attendance_change(old_key=None, new_key=None):
+    """Бир Attendance жолунун өзгөрүшүн жыйынтыкка жазуу"""
+    if old_key == new_key:
+        return
+    deltas = Counter()
+    if old_key is not None:
+        deltas[old_key] -= 1
+    if new_key is not None:
+        deltas[new_key] += 1
+    apply_rollup_deltas(deltas)
+
+
+def move_student(student_id, old_group_id, new_group_id):
+    """
+    Студенттин катышуулары башка группанын жыйынтыгына көчөт - бир GROUP BY суроосу
+    Группасы өзгөргөндө же студент өчүрүлгөндө (new_group_id=None, Attendance.student SET_NULL)
+    """
+    if old_group_id == new_group_id:
+        return
+    rows = Attendance.objects.filter(student_id=student_id).order_by().values(
+        'date', 'subject_id', 'status'
+    ).annotate(total=Count('id'))
+    deltas = Counter()
+    for row in rows:
+        deltas[rollup_key(row['date'], old_group_id, row['subject_id'], row['status'])] -= row['total']
+        deltas[rollup_key(row['date'], new_group_id, row['subject_id'], row['status'])] += row['total']
+    apply_rollup_deltas(deltas)
+
+
+def detach_rollup(field, pk):
+    """
+    Группа же сабак өчүрүлөт: анын жыйынтык жолдору NULL ачкычтуу жолдорго кошулат
+    (Attendance.subject жана Student.group SET_NULL болгондогу чийки жолдор сыяктуу)
+    field: 'group_id' же 'subject_id'
+    """
+    rows = DailyAttendanceRollup.objects.filter(**{field: pk})
+    deltas = Counter()
+    for row in rows:
+        key = {'date': row.date, 'group_id': row.group_id, 'subject_id': row.subject_id, 'status': row.status}
+        key[field] = None
+        deltas[rollup_key(key['date'], key['group_id'], key['subject_id'], key['status'])] += row.count
+    with transaction.atomic():
+        rows.delete()
+        apply_rollup_deltas(deltas)
+
+
+def rebuild_rollup(batch_size=1000):
+    """Жыйынтыкты чийки Attendance таблицасынан толук кайра эсептөө"""
+    rows = Attendance.objects.order_by().values(
+        'date', 'student__group_id', 'subject_id', 'status'
+    ).annotate(total=Count('id'))
+
+    with transaction.atomic():
+        DailyAttendanceRollup.objects.all().delete()
+        batch = []
+        created = 0
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(DailyAttendanceRollup(
+                date=row['date'],
+                group_id=row['student__group_id'],
+                subject_id=row['subject_id'],
+                status=row['status'],
+                count=row['total'],
+            ))
+            if len(batch) >= batch_size:
+                DailyAttendanceRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            DailyAttendanceRollup.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def rollup_queryset(start_date=None, end_date=None, group_id=None):
+    """Фильтрленген жыйынтык queryset"""
+    queryset = DailyAttendanceRollup.objects.all()
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    if group_id:
+        queryset = queryset.filter(group_id=group_id)
+    return queryset
@@ -0,0 +1,77 @@
+"""
+Жумалык расписаниенин кэши (get_schedule_data үчүн)
+Даяр JSON (группа, күн, көрүүчү) ачкычы менен сакталат. Эскирген жазууларды өчүрбөйбүз -
+ачкычка кирген версияларды көбөйтөбүз:
+- расписаниенин версиясы: Schedule/TimeSlot/Subject/Teacher/Group өзгөргөндө
+- группанын катышуу версиясы: ошол группанын Attendance'ы өзгөргөндө
+Версиялар DataVersion таблицасында (core.data_versions) - өзгөртүү ошол эле транзакцияда
+көбөйтөт, ошондуктан бардык процесстер аны commit'тен кийин дароо көрөт (кэш LocMem болсо да).
+Кэштин өзү процесске жергиликтүү болушу мүмкүн - анда ар бир процесс торчону бир жолу түзөт.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from . import data_versions
+from .models import DataVersion
+
+SCHEDULE_VERSION = 'schedule'
+ATTENDANCE_VERSION = 'attendance:{group_id}'
+
+
+def cache_timeout():
+    """Кэштелген расписаниенин жашоо мөөнөтү (секунд)"""
+    return getattr(settings, 'SCHEDULE_CACHE_TIMEOUT', 600)
+
+
+def invalidate_schedule():
+    """Бардык расписание кэшин эскиртүү (учурдагы транзакциянын ичинде)"""
+    data_versions.bump(SCHEDULE_VERSION)
+
+
+def invalidate_attendance(group_ids):
+    """Группалардын катышуу маалыматы бар кэшти эскиртүү"""
+    data_versions.bump_many(ATTENDANCE_VERSION.format(group_id=group_id or '') for group_id in group_ids)
+
+
+def _version_tokens(names):
+    """
+    Версиялар бир суроо менен: {аты: 'версия.убакыт'}
+    Убакыт да кирет - rollback болгон транзакциянын версия номери кийин кайра берилсе,
+    ошол учурда сакталган жазуу колдонулбайт
+    """
+    tokens = dict.fromkeys(names, '0')
+    for name, version, updated_at in DataVersion.objects.filter(name__in=names).values_list(
+        'name', 'version', 'updated_at',
+    ):
+        tokens[name] = f'{version}.{updated_at.timestamp():.6f}'
+    return tokens
+
+
+def schedule_cache_key(course_id, group_id, day, viewer, with_attendance=False, student_group_id=None):
+    """
+    Кэш ачкычы
+    viewer: 'staff', 'teacher:<id>', 'STUDENT:<id>', 'PARENT:<id>' ж.б.
+    with_attendance: катышуу маалыматы кошулса - студенттин группасынын катышуу версиясы кирет
+    """
+    attendance_version = ATTENDANCE_VERSION.format(group_id=student_group_id or '')
+    tokens = _version_tokens([SCHEDULE_VERSION, attendance_version] if with_attendance else [SCHEDULE_VERSION])
+    parts = [
+        'schedule:grid',
+        tokens[SCHEDULE_VERSION],
+        str(course_id or ''),
+        str(group_id or ''),
+        day.isoformat(),
+        viewer,
+    ]
+    if with_attendance:
+        parts.append(tokens[attendance_version])
+    return ':'.join(parts)
+
+
+def get_or_build(key, build):
+    """Кэштен даяр JSON'ду алуу, жок болсо build() менен түзүп сактоо"""
+    body = cache.get(key)
+    if body is None:
+        body = build()
+        cache.set(key, body, cache_timeout())
+    return body
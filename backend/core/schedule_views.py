@@ -4,24 +4,39 @@
 """
 
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q, Prefetch, Count
+from django.db import transaction
+from django.db.models import (
+    Q, Case, CharField, F, FilteredRelation, Value, When
+)
+from django.db.models.functions import Cast, Coalesce, Concat, Trim
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.utils import timezone
-from django.utils.translation import gettext as _
 from django.contrib.admin.models import LogEntry, CHANGE
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator
+from collections import Counter
+import hashlib
+import logging
 from datetime import datetime, date, timedelta
 import json
 import calendar
 
 from .models import (
-    UserProfile, Student, Teacher, Course, Group, Attendance, 
-    Subject, Schedule, TimeSlot, Notification
+    Student, Teacher, Course, Group, Attendance,
+    Subject, Schedule, TimeSlot
 )
+from . import schedule_cache, sync
+from .attendance_bulk import mark_lesson_attendance
+from .principal import for_user, get_principal
+from .rollup import apply_rollup_deltas, rollup_key, stored_attendance_keys
+
+logger = logging.getLogger(__name__)
 
 
 @login_required
@@ -56,9 +71,11 @@ def unified_schedule(request):
     elif user_profile.role == 'PARENT':
         # Ата-энелер өз балдарынын группаларын көрө алат
         linked_students = user_profile.parent_profiles.all()
-        print(f"DEBUG: Parent {user_profile.user.username} has {linked_students.count()} linked students")
-        for student in linked_students:
-            print(f"DEBUG: - Student: {student.name} in group {student.group.name if student.group else 'No group'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Диагностикалык суроолор debug каналы күйгүзүлгөндө гана
+            logger.debug("Parent %s has %d linked students", user_profile.user.username, linked_students.count())
+            for student in linked_students.select_related('group'):
+                logger.debug("- Student: %s in group %s", student.name, student.group.name if student.group else 'No group')
         
         if linked_students.exists():
             context.update({
@@ -66,7 +83,6 @@ def unified_schedule(request):
                 'is_restricted_view': True,
                 'user_role': 'PARENT',  # JavaScript үчүн керек
             })
-            print(f"DEBUG: Parent context prepared with {linked_students.count()} students")
         else:
             messages.warning(request, 'Сизге эч кандай студент байланышкан эмес.')
             return redirect('dashboard')
@@ -123,67 +139,106 @@ def get_schedule_data(request):
     """
     course_id = request.GET.get('course_id')
     group_id = request.GET.get('group_id')
-    user_profile = request.user.userprofile
+    principal = get_principal(request)
+    role = principal.role
     
-    print(f"DEBUG: get_schedule_data called - course_id: {course_id}, group_id: {group_id}, user_role: {user_profile.role}")
+    # Катышуусу көрсөтүлүүчү студент (STUDENT же PARENT үчүн): (id, group_id, course_id)
+    target_student = None
     
     # Уруксаттарды текшерүү
-    if user_profile.role == 'STUDENT':
-        try:
-            student = Student.objects.get(user=request.user)
-            print(f"DEBUG: Student found - group: {student.group.id if student.group else 'None'}")
-            if group_id and str(student.group.id) != group_id:
-                return JsonResponse({'error': 'Сизде бул группанын расписаниесин көрүү укугу жок'}, status=403)
-        except Student.DoesNotExist:
-            print(f"DEBUG: Student profile not found for user {request.user.username}")
+    if role == 'STUDENT':
+        if principal.student is None:
             return JsonResponse({'error': 'Студент профили табылган жок'}, status=404)
+        if group_id and str(principal.student_group_id) != group_id:
+            return JsonResponse({'error': 'Сизде бул группанын расписаниесин көрүү укугу жок'}, status=403)
+        target_student = principal.student
     
-    elif user_profile.role == 'PARENT':
+    elif role == 'PARENT':
         # Ата-энелер балдарынын группаларын гана көрө алат
-        linked_groups = [student.group.id for student in user_profile.parent_profiles.all() if student.group]
-        print(f"DEBUG: Parent {user_profile.user.username} linked groups: {linked_groups}")
+        children = principal.children
+        linked_groups = [child_group_id for _, child_group_id, _ in children if child_group_id]
         if group_id and int(group_id) not in linked_groups:
             return JsonResponse({'error': 'Сизде бул группанын расписаниесин көрүү укугу жок'}, status=403)
+        # group_id берилсе ошол группадагы бала, болбосо биринчи бала
+        if group_id:
+            target_student = next((child for child in children if child[1] == int(group_id)), None)
+        elif children:
+            target_student = children[0]
     
-    # Фильтрлерди колдонуп расписаниени алуу
-    schedules_query = Schedule.objects.select_related(
-        'subject', 'teacher', 'group', 'time_slot'
-    ).filter(is_active=True)
+    # Мугалим өз сабактарына гана жоктоо коё алат
+    teacher_id = principal.teacher_id if role == 'TEACHER' else None
     
-    print(f"DEBUG: Initial query - Total active schedules: {schedules_query.count()}")
+    target_student_id, target_group_id = target_student[:2] if target_student else (None, None)
+    today = date.today()
+    if role in ['ADMIN', 'MANAGER']:
+        viewer = 'staff'
+    elif role == 'TEACHER':
+        viewer = f'teacher:{teacher_id}'
+    elif role in ['STUDENT', 'PARENT']:
+        viewer = f'{role}:{target_student_id or ""}'
+    else:
+        viewer = str(role)
     
-    if course_id:
-        schedules_query = schedules_query.filter(group__course_id=course_id)
-        print(f"DEBUG: After course filter (course_id={course_id}): {schedules_query.count()} schedules")
+    key = schedule_cache.schedule_cache_key(
+        course_id, group_id, today, viewer,
+        with_attendance=target_student is not None,
+        student_group_id=target_group_id,
+    )
+    body = schedule_cache.get_or_build(key, lambda: json.dumps(
+        build_schedule_data(role, course_id, group_id, today, teacher_id, target_student_id),
+        cls=DjangoJSONEncoder,
+    ))
+    return HttpResponse(body, content_type='application/json')
+
+
+# Катышуу статусунун расписаниеде көрсөтүлүүчү тексти
+ATTENDANCE_TEXTS = {
+    'Present': 'Катышкан',
+    'Absent': 'Катышпаган',
+    'Late': 'Кечиккен',
+}
+
+
+def week_attendance_overlay(student_id, today):
+    """
+    Студенттин ушул жумадагы катышуусу - бир суроо
+    Натыйжа: {subject_id: акыркы белгиленген статус}
+    """
+    week_start = today - timedelta(days=today.weekday())  # Дүйшөмбү
+    week_end = week_start + timedelta(days=6)  # Жекшемби
+    rows = Attendance.objects.filter(
+        student_id=student_id, date__range=[week_start, week_end]
+    ).order_by('date').values_list('subject_id', 'status')
+    # Дата боюнча өсүү тартибинде - акыркысы калат
+    return dict(rows)
+
+
+def build_schedule_data(role, course_id, group_id, today, teacher_id=None, target_student_id=None):
+    """
+    Жумалык расписаниенин торчосун түзүү (кэшке сакталчу маалымат)
+    Сабактар, убакыт слоттору жана студенттин катышуусу - ар бири бир суроо
+    """
+    schedules = Schedule.objects.select_related(
+        'subject', 'teacher', 'group', 'time_slot'
+    ).filter(is_active=True, time_slot__isnull=False)
     
+    if course_id:
+        schedules = schedules.filter(group__course_id=course_id)
     if group_id:
-        schedules_query = schedules_query.filter(group_id=group_id)
-        print(f"DEBUG: After group filter (group_id={group_id}): {schedules_query.count()} schedules")
-    
-    schedules = schedules_query.order_by('day', 'time_slot__order')
-    
-    print(f"DEBUG: Final result: Found {schedules.count()} schedules for group_id={group_id}, course_id={course_id}")
+        schedules = schedules.filter(group_id=group_id)
+    schedules = schedules.order_by('day', 'time_slot__order')
     
-    # Ар бир расписанинин деталдарын логго жазуу
-    for schedule in schedules[:5]:  # Биринчи 5ин көрсөтүү
-        print(f"DEBUG: Schedule {schedule.id}: {schedule.subject.subject_name} - Group {schedule.group.name} ({schedule.group.course.name}) - {schedule.day}")
-    
-    # Маалыматтарды структуралашуу
-    schedule_data = {}
     time_slots = TimeSlot.objects.filter(is_active=True).order_by('order')
     
-    print(f"DEBUG: Found {time_slots.count()} active time slots")
+    overlay = week_attendance_overlay(target_student_id, today) if target_student_id else None
     
     # Бүгүнкү күндү аныктоо
-    today = date.today()
     today_day_name = calendar.day_name[today.weekday()]  # Monday, Tuesday, ...
+    can_edit = role in ['ADMIN', 'MANAGER']
     
+    # Маалыматтарды структуралашуу
+    schedule_data = {}
     for schedule in schedules:
-        # time_slot NULL болсо, бул schedule'ди өткөрүп кетебиз
-        if not schedule.time_slot:
-            print(f"DEBUG: Skipping schedule {schedule.id} - no time_slot")
-            continue
-            
         day = schedule.day
         time_slot_id = str(schedule.time_slot.id)
         
@@ -193,76 +248,26 @@ def get_schedule_data(request):
         # Бүгүнкү сабакбы текшерүү
         is_today_lesson = (day == today_day_name)
         
+        # Сабакты өтүүчү мугалим: расписаниеде көрсөтүлгөн же сабактын мугалими
+        lesson_teacher = schedule.teacher if schedule.teacher else schedule.subject.teacher
+        
         # Мугалим бүгүнкү сабактарга гана жоктоо коё алат
-        can_mark_today = False
-        if user_profile.role == 'TEACHER' and is_today_lesson:
-            if hasattr(request.user, 'teacher'):
-                teacher_can_mark = (
-                    schedule.teacher == request.user.teacher if schedule.teacher else 
-                    schedule.subject.teacher == request.user.teacher
-                )
-                can_mark_today = teacher_can_mark
+        can_mark_today = bool(
+            role == 'TEACHER' and is_today_lesson and teacher_id
+            and lesson_teacher and lesson_teacher.id == teacher_id
+        )
         
-        # Attendance маалыматын алуу (STUDENT же PARENT үчүн)
+        # Attendance маалыматы (STUDENT же PARENT үчүн)
         attendance_status = None
         attendance_text = None
+        if overlay is not None:
+            attendance_status = overlay.get(schedule.subject_id)
+            attendance_text = ATTENDANCE_TEXTS.get(attendance_status, 'Белгилене элек')
         
-        if user_profile.role in ['STUDENT', 'PARENT']:
-            # Кайсы студенттин attendance'ын алуу керекпиз?
-            target_student = None
-            
-            if user_profile.role == 'STUDENT':
-                try:
-                    target_student = Student.objects.get(user=request.user)
-                except Student.DoesNotExist:
-                    pass
-            elif user_profile.role == 'PARENT':
-                # Ата-эне үчүн: group_id менен дал келген баланын attendance'ын алабыз
-                # Эгер group_id берилген болсо, ошол группадагы баланы табабыз
-                if group_id:
-                    try:
-                        target_student = user_profile.parent_profiles.filter(group_id=group_id).first()
-                        print(f"DEBUG: Parent - found child in group {group_id}: {target_student.name if target_student else 'None'}")
-                    except Exception as e:
-                        print(f"DEBUG: Error finding child in group: {e}")
-                        target_student = user_profile.parent_profiles.first()
-                else:
-                    # Эгер group_id жок болсо, биринчи баланы алабыз
-                    target_student = user_profile.parent_profiles.first()
-            
-            if target_student:
-                # Соңку аптадагы attendance табуу
-                # date и timedelta уже импортированы вверху файла
-                today = date.today()
-                week_start = today - timedelta(days=today.weekday())  # Дүйшөмбү
-                week_end = week_start + timedelta(days=6)  # Жекшемби
-                
-                from core.models import Attendance
-                latest_attendance = Attendance.objects.filter(
-                    student=target_student,
-                    subject=schedule.subject,
-                    date__range=[week_start, week_end]
-                ).order_by('-date').first()
-                
-                if latest_attendance:
-                    attendance_status = latest_attendance.status
-                    if attendance_status == 'Present':
-                        attendance_text = 'Катышкан'
-                    elif attendance_status == 'Absent':  
-                        attendance_text = 'Катышпаган'
-                    elif attendance_status == 'Late':
-                        attendance_text = 'Кечиккен'
-                    else:
-                        attendance_text = 'Белгилене элек'
-                else:
-                    attendance_text = 'Белгилене элек'
-                    
-                print(f"DEBUG: Attendance for {target_student.name} in {schedule.subject.subject_name}: {attendance_text}")
-
         schedule_data[day][time_slot_id] = {
             'id': schedule.id,
             'subject': schedule.subject.subject_name,
-            'teacher': schedule.teacher.name if schedule.teacher else schedule.subject.teacher.name,
+            'teacher': lesson_teacher.name,
             'room': schedule.room or 'Кабинет белгиленген эмес',
             'group': schedule.group.name,
             'attendance_status': attendance_status,  # Кошулду
@@ -273,12 +278,12 @@ def get_schedule_data(request):
                 'start_time': schedule.time_slot.start_time.strftime('%H:%M'),
                 'end_time': schedule.time_slot.end_time.strftime('%H:%M'),
             },
-            'can_edit': user_profile.role in ['ADMIN', 'MANAGER'],
+            'can_edit': can_edit,
             'can_mark_attendance': can_mark_today,  # Бүгүнкү сабакка гана
             'is_today': is_today_lesson,  # Бул маалыматты frontend үчүн кошобуз
         }
     
-    return JsonResponse({
+    return {
         'schedule_data': schedule_data,
         'time_slots': [
             {
@@ -298,12 +303,12 @@ def get_schedule_data(request):
             'Saturday': 'Saturday',
         },
         'user_permissions': {
-            'can_edit': user_profile.role in ['ADMIN', 'MANAGER'],
-            'can_mark_attendance': user_profile.role == 'TEACHER',
-            'is_student': user_profile.role == 'STUDENT',
-            'is_parent': user_profile.role == 'PARENT',
+            'can_edit': can_edit,
+            'can_mark_attendance': role == 'TEACHER',
+            'is_student': role == 'STUDENT',
+            'is_parent': role == 'PARENT',
         }
-    })
+    }
 
 
 @login_required
@@ -311,7 +316,7 @@ def get_groups_for_course(request):
     """Курс боюнча группаларды алуу (AJAX)"""
     course_id = request.GET.get('course_id')
     
-    print(f"DEBUG get_groups_for_course: course_id={course_id}")
+    logger.debug("get_groups_for_course: course_id=%s", course_id)
     
     if not course_id:
         return JsonResponse({'error': 'Course ID керек'}, status=400)
@@ -330,21 +335,16 @@ def get_groups_for_course(request):
                 'student_count': student_count
             })
         
-        print(f"DEBUG get_groups_for_course: Found {len(groups_data)} groups")
+        logger.debug("get_groups_for_course: found %d groups", len(groups_data))
         
         return JsonResponse({
             'groups': groups_data
         })
     except Exception as e:
-        print(f"ERROR in get_groups_for_course: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("get_groups_for_course: ката")
         return JsonResponse({'error': str(e)}, status=500)
 def check_admin_or_manager(user):
-    try:
-        return user.userprofile.role in ['ADMIN', 'MANAGER']
-    except:
-        return False
+    return for_user(user).is_admin
 
 
 @user_passes_test(check_admin_or_manager)
@@ -357,9 +357,8 @@ def save_schedule_lesson(request):
         return JsonResponse({'error': 'POST метод керек'}, status=405)
     
     try:
-        print(f"DEBUG save_schedule_lesson: Request body: {request.body}")
         data = json.loads(request.body)
-        print(f"DEBUG save_schedule_lesson: Parsed data: {data}")
+        logger.debug("save_schedule_lesson: data=%s", data)
         lesson_id = data.get('lesson_id')
         
         # Керектүү маалыматтарды алуу
@@ -370,8 +369,6 @@ def save_schedule_lesson(request):
         group_id = data.get('group_id')
         room = data.get('room', '')
         
-        print(f"DEBUG save_schedule_lesson: time_slot_id={time_slot_id}, day={day}, subject_id={subject_id}, teacher_id={teacher_id}, group_id={group_id}, room={room}")
-        
         if not all([time_slot_id, day, subject_id, group_id]):
             missing_fields = []
             if not time_slot_id: missing_fields.append('time_slot_id')
@@ -380,7 +377,7 @@ def save_schedule_lesson(request):
             if not group_id: missing_fields.append('group_id')
             
             error_msg = f'Төмөнкү талаалар толтурулган жок: {", ".join(missing_fields)}'
-            print(f"DEBUG save_schedule_lesson: Missing fields error: {error_msg}")
+            logger.debug("save_schedule_lesson: %s", error_msg)
             return JsonResponse({'error': error_msg}, status=400)
         
         # Объекттерди алуу
@@ -396,8 +393,6 @@ def save_schedule_lesson(request):
             # Эгерде мугалим тандалбаса, Subject'тин мугалимин колдонобуз
             teacher = subject.teacher
         
-        print(f"DEBUG save_schedule_lesson: Objects found - time_slot={time_slot}, subject={subject}, group={group}, teacher={teacher}")
-        
         # Конфликттерди текшерүү
         existing_schedule = Schedule.objects.filter(
             group=group,
@@ -406,8 +401,6 @@ def save_schedule_lesson(request):
             is_active=True
         ).exclude(id=lesson_id if lesson_id else None).first()
         
-        print(f"DEBUG save_schedule_lesson: Existing schedule check: {existing_schedule}")
-        
         if existing_schedule:
             return JsonResponse({
                 'error': f'Бул убакытта {group.name} группасында башка сабак бар'
@@ -417,8 +410,6 @@ def save_schedule_lesson(request):
         # Лекцияларда мугалим бир убакытта көп группага сабак өтө алат
         # Ошондуктан мугалим конфликтин текшерүүнү алып салдык
         
-        print(f"DEBUG save_schedule_lesson: Teacher conflict check skipped for lectures")
-        
         # Сактоо же жаңылоо
         if lesson_id:
             # Жаңылоо
@@ -455,12 +446,10 @@ def save_schedule_lesson(request):
             })
             
     except json.JSONDecodeError:
-        print("DEBUG save_schedule_lesson: JSON decode error")
+        logger.warning("save_schedule_lesson: JSON decode error")
         return JsonResponse({'error': 'JSON форматы туура эмес'}, status=400)
     except Exception as e:
-        print(f"DEBUG save_schedule_lesson: Exception occurred: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("save_schedule_lesson: ката")
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -491,9 +480,9 @@ def delete_schedule_lesson(request):
         schedule.save()
         
         # Логко жазуу
-        print(f"DEBUG: Schedule {lesson_id} soft deleted. Attendance records preserved: {attendance_count}")
+        logger.info("Schedule %s soft deleted, attendance records preserved: %d", lesson_id, attendance_count)
         
-        message = f'Сабак жашырылды'
+        message = 'Сабак жашырылды'
         if attendance_count > 0:
             message += f' ({attendance_count} жоктоо маалыматы сакталды)'
         
@@ -506,9 +495,7 @@ def delete_schedule_lesson(request):
     except json.JSONDecodeError:
         return JsonResponse({'error': 'JSON форматы туура эмес'}, status=400)
     except Exception as e:
-        print(f"ERROR in delete_schedule_lesson: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("delete_schedule_lesson: ката")
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -550,7 +537,7 @@ def restore_schedule_lesson(request):
         # Бул сабак үчүн attendance маалыматтары барбы текшерүү
         attendance_count = Attendance.objects.filter(schedule=schedule).count()
         
-        message = f'Сабак калыбына келтирилди'
+        message = 'Сабак калыбына келтирилди'
         if attendance_count > 0:
             message += f' ({attendance_count} жоктоо маалыматы кайтарылды)'
         
@@ -563,10 +550,47 @@ def restore_schedule_lesson(request):
     except json.JSONDecodeError:
         return JsonResponse({'error': 'JSON форматы туура эмес'}, status=400)
     except Exception as e:
-        print(f"ERROR in restore_schedule_lesson: {str(e)}")
+        logger.exception("restore_schedule_lesson: ката")
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def lesson_roster(schedule, day):
+    """
+    Сабактын группасындагы студенттер жана алардын ушул күнкү белгилөөсү - бир JOIN суроо
+    Көрсөтүлүүчү ат (Фамилия Аты → аты/фамилиясы → username → student.name → "Студент #id")
+    аннотация менен базада эсептелет
+    """
+    first_name = Trim(Coalesce('user__first_name', Value('')))
+    last_name = Trim(Coalesce('user__last_name', Value('')))
+    
+    return Student.objects.filter(group_id=schedule.group_id).alias(
+        first=first_name,
+        last=last_name,
+        username=Coalesce('user__username', Value('')),
+        plain_name=Trim(Coalesce('name', Value(''))),
+        lesson_attendance=FilteredRelation(
+            'attendance',
+            condition=Q(attendance__schedule_id=schedule.id, attendance__date=day),
+        ),
+    ).annotate(
+        display_name=Case(
+            When(~Q(first='') & ~Q(last=''), then=Concat('last', Value(' '), 'first')),
+            When(~Q(first=''), then='first'),
+            When(~Q(last=''), then='last'),
+            When(~Q(username=''), then='username'),
+            When(~Q(plain_name=''), then='name'),
+            default=Concat(Value('Студент #'), Cast('id', CharField())),
+            output_field=CharField(),
+        ),
+        attendance_id=F('lesson_attendance__id'),
+        attendance_status=F('lesson_attendance__status'),
+        marked_at=F('lesson_attendance__marked_at'),
+        marked_by=F('lesson_attendance__created_by__username'),
+    ).order_by('user__last_name', 'user__first_name').values(
+        'id', 'display_name', 'attendance_id', 'attendance_status', 'marked_at', 'marked_by'
+    )
+
+
 @login_required
 def get_lesson_students(request):
     """Сабак үчүн студенттердин тизмесин алуу (Мугалим/Админ/Менеджер үчүн)"""
@@ -576,72 +600,37 @@ def get_lesson_students(request):
         return JsonResponse({'error': 'Lesson ID керек'}, status=400)
     
     try:
-        schedule = get_object_or_404(Schedule, id=lesson_id, is_active=True)
-        user_profile = request.user.userprofile
+        schedule = get_object_or_404(
+            Schedule.objects.select_related('subject__teacher', 'group', 'teacher', 'time_slot'),
+            id=lesson_id, is_active=True
+        )
+        principal = get_principal(request)
         
         # Мугалим үчүн укук текшерүү
-        if user_profile.role == 'TEACHER':
-            try:
-                user_teacher = Teacher.objects.get(user=request.user)
-                if schedule.teacher != user_teacher and schedule.subject.teacher != user_teacher:
-                    return JsonResponse({'error': 'Сизде бул сабакка жетүү укугу жок'}, status=403)
-            except Teacher.DoesNotExist:
+        if principal.role == 'TEACHER':
+            if principal.teacher_id is None:
                 return JsonResponse({'error': 'Мугалим профили табылган жок'}, status=404)
-        elif user_profile.role not in ['ADMIN', 'MANAGER']:
+            if schedule.teacher_id != principal.teacher_id and schedule.subject.teacher_id != principal.teacher_id:
+                return JsonResponse({'error': 'Сизде бул сабакка жетүү укугу жок'}, status=403)
+        elif not principal.is_admin:
             return JsonResponse({'error': 'Сизде жетүү укугу жок'}, status=403)
         
-        # Группанын студенттерин алуу
-        students = Student.objects.filter(
-            group=schedule.group
-        ).select_related('user').order_by('user__last_name', 'user__first_name')
+        # Группанын студенттери жана бүгүнкү белгилөөсү - бир JOIN суроо
+        students = lesson_roster(schedule, date.today())
         
         students_data = []
         for student in students:
-            # Бул күндүн келүү-кетүүсүн алуу
-            today = date.today()
-            attendance = Attendance.objects.filter(
-                student=student,
-                schedule=schedule,
-                date=today
-            ).first()
-            
-            # Student атын алуу (бардык варианттарды текшерүү)
-            student_name = ""
-            if student.user:
-                # User объектисинен аты
-                first_name = (student.user.first_name or "").strip()
-                last_name = (student.user.last_name or "").strip()
-                if first_name and last_name:
-                    student_name = f"{last_name} {first_name}"
-                elif first_name:
-                    student_name = first_name
-                elif last_name:
-                    student_name = last_name
-                elif student.user.username:
-                    # User аттары бош болсо, username колдонобуз
-                    student_name = student.user.username
-            
-            # Эгер User объектисинен ат алынбаса же user жок болсо, student.name колдонобуз
-            if not student_name or student_name.strip() == "":
-                student_name = student.name or f"Студент #{student.id}"
-            
-            # Эгер дагы деле аты жок болсо, ID колдонобуз
-            if not student_name or student_name.strip() == "":
-                student_name = f"Студент #{student.id}"
-            
-            print(f"DEBUG: Student ID={student.id}, final name='{student_name}'")  # Debug log
-            
             students_data.append({
-                'id': student.id,
-                'name': student_name,
-                'current_status': attendance.status if attendance else 'Present',
-                'attendance_id': attendance.id if attendance else None,
-                'is_marked': bool(attendance),  # Белгиленгенби көрсөтүү
-                'marked_by': attendance.created_by.username if attendance and attendance.created_by else None,
-                'marked_at': attendance.marked_at.strftime('%H:%M') if attendance else None,
+                'id': student['id'],
+                'name': student['display_name'],
+                'current_status': student['attendance_status'] or 'Present',
+                'attendance_id': student['attendance_id'],
+                'is_marked': student['attendance_id'] is not None,  # Белгиленгенби көрсөтүү
+                'marked_by': student['marked_by'],
+                'marked_at': student['marked_at'].strftime('%H:%M') if student['marked_at'] else None,
             })
         
-        return JsonResponse({
+        payload = {
             'students': students_data,
             'lesson_info': {
                 'id': schedule.id,
@@ -652,12 +641,20 @@ def get_lesson_students(request):
                 'time': f"{schedule.time_slot.start_time.strftime('%H:%M')} - {schedule.time_slot.end_time.strftime('%H:%M')}",
                 'day': schedule.get_day_display(),
             }
-        })
+        }
+        
+        # ETag: тизме өзгөрбөсө polling 304 алат
+        body = json.dumps(payload, cls=DjangoJSONEncoder)
+        etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
         
     except Exception as e:
-        print(f"ERROR in get_lesson_students: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("get_lesson_students: ката")
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -672,74 +669,33 @@ def save_attendance(request):
         lesson_id = data.get('lesson_id')
         attendance_data = data.get('attendance_data', {})
         
-        print(f"DEBUG save_attendance: lesson_id={lesson_id}, attendance_data={attendance_data}")
+        logger.debug("save_attendance: lesson_id=%s, students=%d", lesson_id, len(attendance_data))
         
         if not lesson_id or not attendance_data:
             return JsonResponse({'error': 'Lesson ID жана attendance data керек'}, status=400)
         
-        schedule = get_object_or_404(Schedule, id=lesson_id, is_active=True)
-        user_profile = request.user.userprofile
+        schedule = get_object_or_404(
+            Schedule.objects.select_related('subject__teacher'),
+            id=lesson_id, is_active=True
+        )
+        principal = get_principal(request)
         
         # Укук текшерүү
-        if user_profile.role == 'TEACHER':
-            try:
-                user_teacher = Teacher.objects.get(user=request.user)
-                if schedule.teacher != user_teacher and schedule.subject.teacher != user_teacher:
-                    return JsonResponse({'error': 'Сизде бул сабакка жетүү укугу жок'}, status=403)
-            except Teacher.DoesNotExist:
+        if principal.role == 'TEACHER':
+            if principal.teacher_id is None:
                 return JsonResponse({'error': 'Мугалим профили табылган жок'}, status=404)
-        elif user_profile.role not in ['ADMIN', 'MANAGER']:
+            if schedule.teacher_id != principal.teacher_id and schedule.subject.teacher_id != principal.teacher_id:
+                return JsonResponse({'error': 'Сизде бул сабакка жетүү укугу жок'}, status=403)
+        elif not principal.is_admin:
             return JsonResponse({'error': 'Сизде жетүү укугу жок'}, status=403)
         
-        today = date.today()
-        saved_count = 0
-        
-        print(f"DEBUG: Processing {len(attendance_data)} students")
-        
-        skipped_students = []  # Алдын ала белгиленген студенттердин тизмеси
-        
-        for student_id, status in attendance_data.items():
-            try:
-                print(f"DEBUG: Processing student_id={student_id}, status={status}")
-                student = Student.objects.get(id=student_id, group=schedule.group)
-                print(f"DEBUG: Found student: {student.name}")
-                
-                # Бул студенттин attendance алдын ала белгиленгенби текшерүү
-                # UNIQUE constraint: student, subject, date (без schedule)
-                existing_attendance = Attendance.objects.filter(
-                    student=student,
-                    subject=schedule.subject,
-                    date=today
-                ).first()
-                
-                if existing_attendance:
-                    print(f"DEBUG: Student {student.name} attendance already marked as {existing_attendance.status}")
-                    skipped_students.append(student.name)
-                    # Эгер алдын ала белгиленген болсо, өзгөртүүгө болбойт
-                    continue
-                
-                # Жаңы attendance түзүү
-                attendance = Attendance.objects.create(
-                    student=student,
-                    subject=schedule.subject,
-                    schedule=schedule,
-                    date=today,
-                    status=status,
-                    created_by=request.user,
-                    marked_at=datetime.now()
-                )
-                
-                print(f"DEBUG: Saved attendance for {student.name}: {status}")
-                saved_count += 1
-                
-            except Student.DoesNotExist:
-                print(f"DEBUG: Student {student_id} not found")
-                continue
-            except Exception as e:
-                print(f"DEBUG: Error processing student {student_id}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                continue
+        # Группанын тизмеси жана бүгүнкү белгилөөлөр бир жолу окулат,
+        # жаңы жолдор бир bulk insert менен бир транзакцияда сакталат.
+        # Алдын ала белгиленген студенттер өзгөртүлбөйт (UNIQUE: student, subject, date)
+        created, skipped_students = mark_lesson_attendance(
+            schedule, attendance_data, request.user, day=date.today()
+        )
+        saved_count = len(created)
         
         # Жооп түзүү
         if saved_count > 0 and len(skipped_students) > 0:
@@ -760,12 +716,10 @@ def save_attendance(request):
         })
         
     except json.JSONDecodeError as e:
-        print(f"ERROR: JSON decode error: {str(e)}")
+        logger.warning("JSON decode error: %s", e)
         return JsonResponse({'error': 'JSON форматы туура эмес'}, status=400)
     except Exception as e:
-        print(f"ERROR in save_attendance: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("save_attendance: ката")
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -782,7 +736,7 @@ def edit_attendance(request):
         new_status = data.get('new_status')
         edit_reason = data.get('edit_reason', '')
         
-        print(f"DEBUG edit_attendance: attendance_id={attendance_id}, new_status={new_status}")
+        logger.debug("edit_attendance: attendance_id=%s, new_status=%s", attendance_id, new_status)
         
         if not attendance_id or not new_status:
             return JsonResponse({'error': 'Attendance ID жана жаңы статус керек'}, status=400)
@@ -792,45 +746,43 @@ def edit_attendance(request):
         if new_status not in VALID_STATUSES:
             return JsonResponse({'error': 'Туура эмес статус'}, status=400)
         
-        attendance = get_object_or_404(Attendance, id=attendance_id)
-        user_profile = request.user.userprofile
+        attendance = get_object_or_404(
+            Attendance.objects.select_related('student', 'subject', 'schedule'),
+            id=attendance_id
+        )
+        principal = get_principal(request)
         
         # Укук текшерүү
-        if user_profile.role == 'TEACHER':
-            try:
-                user_teacher = Teacher.objects.get(user=request.user)
-                # Мугалим өзүнүн сабагын гана өзгөртө алат
-                if (attendance.schedule and attendance.schedule.teacher != user_teacher and 
-                    attendance.subject.teacher != user_teacher):
-                    return JsonResponse({'error': 'Сизде бул attendance өзгөртүү укугу жок'}, status=403)
-            except Teacher.DoesNotExist:
+        if principal.role == 'TEACHER':
+            if principal.teacher_id is None:
                 return JsonResponse({'error': 'Мугалим профили табылган жок'}, status=404)
-        elif user_profile.role not in ['ADMIN', 'MANAGER']:
+            # Мугалим өзүнүн сабагын гана өзгөртө алат
+            if (attendance.schedule and attendance.schedule.teacher_id != principal.teacher_id and 
+                attendance.subject.teacher_id != principal.teacher_id):
+                return JsonResponse({'error': 'Сизде бул attendance өзгөртүү укугу жок'}, status=403)
+        elif not principal.is_admin:
             return JsonResponse({'error': 'Сизде жетүү укугу жок'}, status=403)
         
         # Эски маалыматты сактоо (audit trail үчүн)
         old_status = attendance.status
-        old_marked_at = attendance.marked_at
-        
-        # Attendance өзгөртүү
-        attendance.status = new_status
-        attendance.marked_at = timezone.now()
-        attendance.save()
-        
-        # Edit log түзүү (кийин admin панелден көрүү үчүн)
-        from django.contrib.admin.models import LogEntry, CHANGE
-        from django.contrib.contenttypes.models import ContentType
-        
-        LogEntry.objects.log_action(
-            user_id=request.user.id,
-            content_type_id=ContentType.objects.get_for_model(Attendance).id,
-            object_id=attendance.id,
-            object_repr=str(attendance),
-            action_flag=CHANGE,
-            change_message=f"Статус өзгөртүлдү: {old_status} → {new_status}. Себеби: {edit_reason}"
-        )
         
-        print(f"DEBUG: Attendance {attendance_id} статус өзгөртүлдү: {old_status} → {new_status}")
+        # Attendance өзгөртүү жана edit log бир транзакцияда
+        with transaction.atomic():
+            attendance.status = new_status
+            attendance.marked_at = timezone.now()
+            attendance.save(update_fields=['status', 'marked_at'])
+            
+            # Edit log түзүү (кийин admin панелден көрүү үчүн)
+            LogEntry.objects.log_action(
+                user_id=request.user.id,
+                content_type_id=ContentType.objects.get_for_model(Attendance).id,
+                object_id=attendance.id,
+                object_repr=str(attendance),
+                action_flag=CHANGE,
+                change_message=f"Статус өзгөртүлдү: {old_status} → {new_status}. Себеби: {edit_reason}"
+            )
+        
+        logger.info("Attendance %s статус өзгөртүлдү: %s → %s", attendance_id, old_status, new_status)
         
         return JsonResponse({
             'success': True,
@@ -842,12 +794,10 @@ def edit_attendance(request):
         })
         
     except json.JSONDecodeError as e:
-        print(f"ERROR: JSON decode error: {str(e)}")
+        logger.warning("JSON decode error: %s", e)
         return JsonResponse({'error': 'JSON форматы туура эмес'}, status=400)
     except Exception as e:
-        print(f"ERROR in edit_attendance: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("edit_attendance: ката")
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -904,9 +854,7 @@ def get_attendance_history(request):
         })
         
     except Exception as e:
-        print(f"ERROR in get_attendance_history: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("get_attendance_history: ката")
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -915,14 +863,12 @@ def teacher_attendance_history(request):
     """Мугалим үчүн жоктоо тарыхы бети"""
     
     # Мугалим эканын текшерүү
-    user_profile = getattr(request.user, 'userprofile', None)
-    if not user_profile or user_profile.role != 'TEACHER':
+    principal = get_principal(request)
+    if principal.role != 'TEACHER':
         messages.error(request, 'Сизде бул бетке кирүү укугу жок!')
         return redirect('dashboard')
     
-    try:
-        teacher = Teacher.objects.get(user=user_profile.user)
-    except Teacher.DoesNotExist:
+    if principal.teacher_id is None:
         messages.error(request, 'Мугалим профили табылган жок!')
         return redirect('dashboard')
     
@@ -935,11 +881,11 @@ def teacher_attendance_history(request):
     student_filter = request.GET.get('student')
     
     # Мугалимдин сабактары
-    teacher_subjects = Subject.objects.filter(teacher=teacher)
+    teacher_subjects = Subject.objects.filter(id__in=principal.subject_ids)
     
     # Жоктоо маалыматтарын алуу
     attendance_query = Attendance.objects.filter(
-        subject__in=teacher_subjects
+        subject_id__in=principal.subject_ids
     ).select_related(
         'student', 'subject', 'student__group'
     ).order_by('-date', '-marked_at')
@@ -1024,21 +970,20 @@ def get_teacher_attendance_history_api(request):
         return JsonResponse({'success': False, 'error': 'Туура эмес запрос'})
     
     # Мугалим эканын текшерүү
-    user_profile = getattr(request.user, 'userprofile', None)
-    if not user_profile or user_profile.role != 'TEACHER':
+    principal = get_principal(request)
+    if principal.role != 'TEACHER':
         return JsonResponse({'success': False, 'error': 'Укук жок'})
+    if principal.teacher_id is None:
+        return JsonResponse({'success': False, 'error': 'Мугалим профили табылган жок'})
     
     try:
-        teacher = Teacher.objects.get(user=user_profile.user)
-        teacher_subjects = Subject.objects.filter(teacher=teacher)
-        
         # Фильтрлер
         subject_id = request.GET.get('subject_id')
         group_id = request.GET.get('group_id')
         date_from = request.GET.get('date_from')
         date_to = request.GET.get('date_to')
         
-        query = Attendance.objects.filter(subject__in=teacher_subjects)
+        query = Attendance.objects.filter(subject_id__in=principal.subject_ids)
         
         if subject_id:
             query = query.filter(subject_id=subject_id)
@@ -1083,8 +1028,8 @@ def bulk_edit_attendance(request):
         return JsonResponse({'success': False, 'error': 'POST метод керек'})
     
     # Мугалим же админ эканын текшерүү
-    user_profile = getattr(request.user, 'userprofile', None)
-    if not user_profile or user_profile.role not in ['TEACHER', 'ADMIN', 'MANAGER']:
+    principal = get_principal(request)
+    if not (principal.is_admin or principal.role == 'TEACHER'):
         return JsonResponse({'success': False, 'error': 'Укук жок'})
     
     try:
@@ -1102,31 +1047,50 @@ def bulk_edit_attendance(request):
         # Мугалим болсо өз сабактарын гана өзгөртө алат
         attendance_query = Attendance.objects.filter(id__in=attendance_ids)
         
-        if user_profile.role == 'TEACHER':
-            try:
-                teacher = Teacher.objects.get(user=user_profile.user)
-                teacher_subjects = Subject.objects.filter(teacher=teacher)
-                attendance_query = attendance_query.filter(subject__in=teacher_subjects)
-            except Teacher.DoesNotExist:
+        if principal.role == 'TEACHER':
+            if principal.teacher_id is None:
                 return JsonResponse({'success': False, 'error': 'Мугалим профили табылган жок'})
+            attendance_query = attendance_query.filter(subject_id__in=principal.subject_ids)
         
-        updated_count = 0
-        for attendance in attendance_query:
-            old_status = attendance.status
-            if old_status != new_status:
+        # Өзгөрө турган жолдор бир суроо менен, жаңылоо бир UPDATE менен
+        changed = list(
+            attendance_query.exclude(status=new_status).select_related('student', 'subject')
+        )
+        updated_count = len(changed)
+        
+        if changed:
+            content_type_id = ContentType.objects.get_for_model(Attendance).id
+            deltas = Counter()
+            log_entries = []
+            # Жыйынтыктын эски ачкычы базадагы жолдон - жаңысы ошол эле ачкыч, статусу гана башка
+            stored_keys = stored_attendance_keys(attendance.id for attendance in changed)
+            for attendance in changed:
+                old_key = stored_keys.get(attendance.id)
+                if old_key is not None:
+                    deltas[old_key] -= 1
+                    deltas[rollup_key(*old_key[:3], new_status)] += 1
+                old_status = attendance.status
                 attendance.status = new_status
-                attendance.save()
                 
                 # Audit log
-                LogEntry.objects.log_action(
+                log_entries.append(LogEntry(
                     user_id=request.user.id,
-                    content_type_id=ContentType.objects.get_for_model(Attendance).id,
-                    object_id=attendance.id,
-                    object_repr=f"{attendance.student.name} - {attendance.subject.subject_name}",
+                    content_type_id=content_type_id,
+                    object_id=str(attendance.id),
+                    object_repr=str(attendance)[:200],
                     action_flag=CHANGE,
                     change_message=f"Массалык өзгөртүү: {old_status} -> {new_status}. Себеби: {reason}"
+                ))
+            
+            with transaction.atomic():
+                Attendance.objects.filter(id__in=[a.id for a in changed]).update(
+                    status=new_status, marked_at=timezone.now()
                 )
-                updated_count += 1
+                # UPDATE сигналдарды чакырбайт - жыйынтык, расписание кэши жана sync журналы түздөн-түз
+                apply_rollup_deltas(deltas)
+                schedule_cache.invalidate_attendance(key[1] for key in deltas)
+                sync.record_changes(changed)
+                LogEntry.objects.bulk_create(log_entries)
         
         return JsonResponse({
             'success': True, 
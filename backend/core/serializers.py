@@ -1,10 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Count
 from datetime import date, timedelta
+import logging
 from .models import (
     UserProfile, Student, Teacher, Course, Group, Subject, 
-    Schedule, Attendance, LeaveRequest, Notification
+    Schedule, Attendance, LeaveRequest, Notification, ReportJob, BroadcastNotification
 )
+from .broadcasts import ID_PREFIX
+from .principal import for_user
+
+logger = logging.getLogger(__name__)
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -31,6 +37,14 @@ class GroupSerializer(serializers.ModelSerializer):
     
     def get_student_count(self, obj):
         """Группадагы студенттердин санын эсептөө"""
+        # GroupViewSet'те сан queryset'ке аннотация катары кошулат (annotate_group_counts)
+        annotated = getattr(obj, 'student_count', None)
+        if annotated is not None:
+            return annotated
+        # Тизмелер үчүн сандар алдын ала бир суроо менен context'ке берилиши мүмкүн
+        counts = self.context.get('group_student_counts')
+        if counts is not None:
+            return counts.get(obj.id, 0)
         return obj.student_set.count()
     
     class Meta:
@@ -76,6 +90,75 @@ class SubjectSerializer(serializers.ModelSerializer):
         model = Subject
         fields = ['id', 'subject_name', 'name', 'teacher', 'course']
 
+def group_student_counts(group_ids=None):
+    """
+    GroupSerializer.student_count үчүн группалардын студент сандары - бир GROUP BY суроосу
+    group_ids берилбесе - бардык группалар
+    """
+    students = Student.objects.exclude(group=None)
+    if group_ids is not None:
+        students = students.filter(group_id__in=set(group_ids) - {None})
+    return dict(students.values('group_id').annotate(count=Count('id')).values_list('group_id', 'count'))
+
+
+# Жумалык статустун тексти (ScheduleSerializer.attendance_text)
+ATTENDANCE_TEXT = {
+    'Present': 'Катышкан',
+    'Absent': 'Катышпаган',
+    'Late': 'Кечиккен',
+    'Excused': 'Себептүү',
+}
+
+
+def week_attendance_map(user, today=None):
+    """
+    ScheduleSerializer үчүн ушул жумалык катышуу картасы - бир Attendance суроосу
+    Студент үчүн өзүнүн, ата-эне үчүн ар бир группадагы биринчи баласынын жазуулары.
+    Башка роллор үчүн None (attendance_status талаасы бош калат)
+    """
+    if not user or not user.is_authenticated:
+        return None
+    principal = for_user(user)
+    
+    student_id = None
+    students = {}
+    if principal.role == 'STUDENT':
+        student_id = principal.student_id
+        if student_id is None:
+            return None
+    elif principal.role == 'PARENT':
+        # Ар бир группа үчүн id боюнча биринчи бала (children id боюнча иреттелген)
+        for child_id, group_id, _ in principal.children:
+            students.setdefault(group_id, child_id)
+        if not students:
+            return None
+    else:
+        return None
+    
+    today = today or date.today()
+    week_start = today - timedelta(days=today.weekday())  # Дүйшөмбү
+    week_end = week_start + timedelta(days=6)  # Жекшемби
+    
+    target_ids = set(students.values()) if students else {student_id}
+    by_schedule = {}
+    by_subject = {}
+    # Дата өсүү тартибинде - акыркы жазуу мурункусун басып калат
+    rows = Attendance.objects.filter(
+        student_id__in=target_ids, date__range=[week_start, week_end], subject__isnull=False,
+    ).order_by('date', 'id').values_list('student_id', 'schedule_id', 'subject_id', 'status')
+    for row_student_id, schedule_id, subject_id, status in rows:
+        if schedule_id is not None:
+            by_schedule[(row_student_id, schedule_id, subject_id)] = status
+        by_subject[(row_student_id, subject_id)] = status
+    
+    return {
+        'student_id': student_id,
+        'students': students,
+        'by_schedule': by_schedule,
+        'by_subject': by_subject,
+    }
+
+
 class ScheduleSerializer(serializers.ModelSerializer):
     subject = SubjectSerializer(read_only=True)
     group = GroupSerializer(read_only=True)
@@ -114,73 +197,28 @@ class ScheduleSerializer(serializers.ModelSerializer):
         return None
     
     def get_attendance_status(self, obj):
-        """Студент үчүн акыркы жумалык attendance статусун алуу"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
+        """
+        Студент үчүн ушул жумалык attendance статусу
+        Маалымат context['attendance_map'] картасынан гана окулат (week_attendance_map)
+        """
+        attendance_map = self.context.get('attendance_map')
+        if not attendance_map or not obj.subject_id:
             return None
         
-        try:
-            profile = request.user.userprofile
-            target_student = None
-            
-            # Студент же Ата-эне үчүн гана
-            if profile.role == 'STUDENT':
-                target_student = Student.objects.filter(user=request.user).first()
-            elif profile.role == 'PARENT':
-                # Ата-эне үчүн: group менен дал келген баланы табуу
-                target_student = profile.parent_profiles.filter(group=obj.group).first()
-            
-            if target_student and obj.subject:
-                from datetime import date, timedelta
-                today = date.today()
-                
-                # Ушул жумалык маалыматтарды алабыз
-                week_start = today - timedelta(days=today.weekday())  # Дүйшөмбү
-                week_end = week_start + timedelta(days=6)  # Жекшемби
-                
-                print(f"🔍 Attendance check: student={target_student.name}, subject={obj.subject.subject_name}, day={obj.day}")
-                print(f"📅 Week range: {week_start} to {week_end}, Today: {today}")
-                
-                # Так ушул schedule үчүн attendance издейбиз (schedule_id менен)
-                latest_attendance = Attendance.objects.filter(
-                    student=target_student,
-                    subject=obj.subject,
-                    schedule=obj,  # Так ушул schedule үчүн
-                    date__range=[week_start, week_end]
-                ).order_by('-date').first()
-                
-                if latest_attendance:
-                    print(f"✅ Found attendance: {latest_attendance.status} on {latest_attendance.date}")
-                    return latest_attendance.status
-                else:
-                    print(f"❌ No attendance found for this schedule in this week")
-                    # Эгерде schedule_id боюнча табылбаса, date жана subject боюнча издейбиз
-                    latest_attendance = Attendance.objects.filter(
-                        student=target_student,
-                        subject=obj.subject,
-                        date__range=[week_start, week_end]
-                    ).order_by('-date').first()
-                    
-                    if latest_attendance:
-                        print(f"✅ Found attendance by subject: {latest_attendance.status} on {latest_attendance.date}")
-                        return latest_attendance.status
-        except Exception as e:
-            print(f"Error getting attendance status: {e}")
+        # Студент - өзү; ата-эне - ушул группадагы баласы
+        student_id = attendance_map['students'].get(obj.group_id, attendance_map['student_id'])
+        if student_id is None:
+            return None
         
-        return None
+        # Адегенде так ушул schedule боюнча, болбосо сабак боюнча
+        status = attendance_map['by_schedule'].get((student_id, obj.id, obj.subject_id))
+        if status is None:
+            status = attendance_map['by_subject'].get((student_id, obj.subject_id))
+        return status
     
     def get_attendance_text(self, obj):
         """Attendance статусунун текстин алуу"""
-        status = self.get_attendance_status(obj)
-        if status:
-            status_map = {
-                'Present': 'Катышкан',
-                'Absent': 'Катышпаган',
-                'Late': 'Кечиккен',
-                'Excused': 'Себептүү'
-            }
-            return status_map.get(status, 'Белгилене элек')
-        return 'Белгилене элек'
+        return ATTENDANCE_TEXT.get(self.get_attendance_status(obj), 'Белгилене элек')
     
     def create(self, validated_data):
         """Жаңы schedule кошуу"""
@@ -242,6 +280,59 @@ class NotificationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['sender', 'created_at']
 
+class BroadcastNotificationSerializer(serializers.ModelSerializer):
+    """
+    Жалпы билдирме NotificationSerializer'дин формасында - кардар бир тизмеде көрсөтөт
+    id 'b' префикси менен, is_read - broadcasts.visible() аннотациясынан
+    """
+    id = serializers.SerializerMethodField()
+    recipient = serializers.SerializerMethodField()
+    sender = UserSerializer(read_only=True)
+    is_read = serializers.BooleanField(read_only=True, default=False)
+    student = serializers.SerializerMethodField(method_name='get_none')
+    leave_request = serializers.SerializerMethodField(method_name='get_none')
+    
+    class Meta:
+        model = BroadcastNotification
+        fields = [
+            'id', 'recipient', 'sender', 'notification_type', 'title',
+            'message', 'created_at', 'is_read', 'student', 'leave_request'
+        ]
+    
+    def get_id(self, obj):
+        return f'{ID_PREFIX}{obj.pk}'
+    
+    def get_recipient(self, obj):
+        request = self.context.get('request')
+        return UserSerializer(request.user).data if request else None
+    
+    def get_none(self, obj):
+        return None
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Фондук отчет жумушу - абалын текшерүү (polling) үчүн"""
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+    
+    def get_download_url(self, obj):
+        """Даяр файлды жүктөө дареги (даяр эмес болсо None)"""
+        if obj.status != 'DONE' or not obj.file:
+            return None
+        request = self.context.get('request')
+        url = f'/api/v1/report-jobs/{obj.pk}/download/'
+        return request.build_absolute_uri(url) if request else url
+    
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'kind', 'kind_display', 'params', 'status', 'status_display',
+            'progress', 'message', 'download_url', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'status', 'progress', 'message', 'created_at', 'started_at', 'finished_at'
+        ]
+
 # ============= СТАТИСТИКА СЕРИАЛАЙЗЕРЛЕРИ =============
 
 class AttendanceStatsSerializer(serializers.Serializer):
@@ -1,8 +1,18 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save, pre_save, post_delete, pre_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import UserProfile, Student, Course, Group, Teacher, Attendance, Notification, Subject, LeaveRequest
-from datetime import timedelta
+from .models import (
+    UserProfile, Student, Course, Group, Teacher, Attendance, Notification, Subject, LeaveRequest,
+    Schedule, TimeSlot, BroadcastNotification
+)
+from . import (
+    absence_notifications, authentication, broadcasts, data_versions, principal, rollup, schedule_cache, sync,
+    unread_counter,
+)
+from collections import Counter
+import logging
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -25,8 +35,11 @@ def create_user_profile(sender, instance, created, **kwargs):
         profile.check_profile_completeness()
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
     """User сакталганда профилди да сактоо"""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        # Кирүү убактысы профилге тиешеси жок - ар бир кирүүдө профиль (жана principal кэши) жаңыланбайт
+        return
     try:
         instance.userprofile.save()
     except UserProfile.DoesNotExist:
@@ -74,87 +87,360 @@ def create_student_or_teacher(sender, instance, created, **kwargs):
             
 @receiver(post_save, sender=Attendance)
 def create_absent_notification(sender, instance, created, **kwargs):
-    if created and instance.status == 'Absent':
-        teacher = instance.subject.teacher
-        if teacher and teacher.user:
-            Notification.objects.create(
-                recipient=teacher.user,
-                notification_type='ABSENCE',
-                title='Студент катышкан жок',
-                message=f"{instance.student.name} {instance.subject.subject_name} сабагына катышкан жок ({instance.date}).",
-                student=instance.student
-            )
+    """Катышпаган студент - мугалимге билдирме commit'тен кийин, сабак боюнча бириктирилип"""
+    if created:
+        absence_notifications.collect([instance])
 
-# АЗЫРЫНЧА КОМЕНТТЕ: Leave Request менен Attendance байланышы
-# @receiver(post_save, sender=LeaveRequest)
-# def handle_leave_request_approval(sender, instance, **kwargs):
-#     """
-#     Leave Request APPROVED болгондо автоматтык Excused attendance түзүү
-#     """
-#     # Эгер approved болсо жана мурда attendance түзүлбөгөн болсо
-    if False:  # Бул функция азырынча өчүрүлгөн
-        from .models import Schedule
-        
-        # Start date дан end date га чейинки бардык күндөр
-        current_date = instance.start_date
-        while current_date <= instance.end_date:
-            # Күндүн английс атын табуу
-            weekday_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            day_name = weekday_names[current_date.weekday()]
-            
-            # Студенттин группасы боюнча ошол күндөгү сабактар
-            schedules = Schedule.objects.filter(
-                group=instance.student.group,
-                day=day_name,
-                is_active=True
-            )
-            
-            for schedule in schedules:
-                try:
-                    # Алгач attendance бар болсо текшерүү
-                    existing_attendance = Attendance.objects.filter(
-                        student=instance.student,
-                        subject=schedule.subject,
-                        date=current_date
-                    ).first()
-                    
-                    if existing_attendance:
-                        # Эгер дагы деле бар болсо, Excused кылуу
-                        existing_attendance.status = 'Excused'
-                        existing_attendance.leave_request = instance
-                        existing_attendance.save()
-                    else:
-                        # Жаңы attendance түзүү
-                        Attendance.objects.create(
-                            student=instance.student,
-                            subject=schedule.subject,
-                            schedule=schedule,
-                            date=current_date,
-                            status='Excused',
-                            created_by=instance.approved_by,
-                            student_name=instance.student.name,
-                            subject_name=schedule.subject.subject_name,
-                            leave_request=instance,
-                            is_active=True
-                        )
-                except Exception as e:
-                    # Ката болсо, лог жазып өтүү
-                    print(f"Error creating attendance: {e}")
-                    continue
-            
-            # Кийинки күнгө өтүү
-            current_date += timedelta(days=1)
-        
-        # Студентке notification жөнөтүү
-        if instance.student.user:
-            try:
-                Notification.objects.create(
-                    recipient=instance.student.user,
-                    notification_type='LEAVE_APPROVED',
-                    title='Бошотуу сурамы бекитилди',
-                    message=f"Сиздин {instance.start_date} - {instance.end_date} аралыгындагы бошотуу сурамыңыз бекитилди.",
-                    student=instance.student,
-                    leave_request=instance
-                )
-            except Exception as e:
-                print(f"Error creating notification: {e}")
\ No newline at end of file
+@receiver(pre_save, sender=Attendance)
+def remember_attendance_rollup_key(sender, instance, **kwargs):
+    """Өзгөртүүгө чейинки жыйынтык ачкычын эстеп калуу"""
+    instance._rollup_old_key = rollup.stored_attendance_key(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Attendance)
+def update_attendance_rollup(sender, instance, **kwargs):
+    """Күндүк жыйынтыкты жана группанын расписание кэшин жаңылоо"""
+    old_key = getattr(instance, '_rollup_old_key', None)
+    new_key = rollup.attendance_key(instance)
+    rollup.record_attendance_change(old_key=old_key, new_key=new_key)
+    schedule_cache.invalidate_attendance(key[1] for key in (old_key, new_key) if key)
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_attendance_from_rollup(sender, instance, **kwargs):
+    """Өчүрүлгөн Attendance'ты жыйынтыктан жана расписание кэшинен алып салуу"""
+    old_key = rollup.attendance_key(instance)
+    rollup.record_attendance_change(old_key=old_key)
+    schedule_cache.invalidate_attendance([old_key[1]])
+
+
+@receiver(post_save, sender=Student)
+def move_student_rollup(sender, instance, created, **kwargs):
+    """Студенттин группасы өзгөрдү - анын катышуулары жаңы группанын жыйынтыгына (rebuild_rollup сыяктуу)"""
+    old = getattr(instance, '_old_student_row', None)
+    if not created and old is not None and old[0] != instance.group_id:
+        rollup.move_student(instance.pk, old[0], instance.group_id)
+
+
+@receiver(pre_delete, sender=Student)
+def detach_student_rollup(sender, instance, **kwargs):
+    """Attendance.student SET_NULL болот - катышуулары группасыз жыйынтыкка"""
+    rollup.move_student(instance.pk, instance.group_id, None)
+
+
+@receiver(pre_delete, sender=Group)
+def detach_group_rollup(sender, instance, **kwargs):
+    rollup.detach_rollup('group_id', instance.pk)
+
+
+@receiver(pre_delete, sender=Subject)
+def detach_subject_rollup(sender, instance, **kwargs):
+    rollup.detach_rollup('subject_id', instance.pk)
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_schedule_cache(sender, **kwargs):
+    """
+    Расписаниенин торчосуна кирген маалымат өзгөрдү - кэшти эскиртүү
+    (save/delete/restore_schedule_lesson, admin жана API аркылуу өзгөртүүлөр)
+    """
+    schedule_cache.invalidate_schedule()
+
+# ============= МААЛЫМДАМА ВЕРСИЯЛАРЫ =============
+
+# Модель -> маалымат түрү (core.data_versions)
+DATA_VERSION_NAMES = {
+    Course: 'course',
+    Group: 'group',
+    Student: 'student',
+    Subject: 'subject',
+    Teacher: 'teacher',
+    TimeSlot: 'timeslot',
+    User: 'user',
+}
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_data_version(sender, update_fields=None, **kwargs):
+    """Маалымдама маалыматы өзгөрдү - API жоопторунун ETag'и жаңыланат"""
+    if sender is User and update_fields and set(update_fields) <= {'last_login'}:
+        # Кирүү убактысы эч бир маалымдама жообуна кирбейт
+        return
+    data_versions.bump(DATA_VERSION_NAMES[sender])
+
+
+# ============= PRINCIPAL КЭШИ =============
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def invalidate_principals(sender, **kwargs):
+    """Ролу, студент/мугалим жазуусу же сабактары өзгөрдү - сакталган principal'дар эскирет"""
+    principal.invalidate()
+
+
+@receiver(m2m_changed, sender=Student.parents.through)
+def invalidate_parent_principals(sender, action, **kwargs):
+    """Ата-эненин балдарынын тизмеси өзгөрдү"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        principal.invalidate()
+
+
+# ============= JWT ТОКЕНДЕРИН ЧАКЫРТЫП АЛУУ =============
+# Токенде ролу жана жазуулары бар (core.authentication) - алар өзгөргөндө эски токендер жараксыз
+
+@receiver(pre_save, sender=UserProfile)
+def remember_profile_role(sender, instance, **kwargs):
+    instance._jwt_old_role = (
+        UserProfile.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=UserProfile)
+def revoke_on_role_change(sender, instance, created, **kwargs):
+    if not created and getattr(instance, '_jwt_old_role', None) != instance.role:
+        authentication.revoke([instance.user_id])
+
+
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=Teacher)
+def revoke_on_profile_or_teacher_delete(sender, instance, **kwargs):
+    authentication.revoke([instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def revoke_inactive_user(sender, instance, **kwargs):
+    if not instance.is_active:
+        authentication.revoke([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance, **kwargs):
+    authentication.forget([instance.pk])
+
+
+@receiver(post_save, sender=Student)
+def revoke_on_student_change(sender, instance, created, **kwargs):
+    """Студенттин группасы/курсу/колдонуучусу өзгөрдү - анын жана ата-энелеринин токендери"""
+    old = getattr(instance, '_old_student_row', None)
+    if not created and old == (instance.group_id, instance.course_id, instance.user_id):
+        return
+    user_ids = [instance.user_id, old[2] if old else None]
+    if not created:
+        user_ids += instance.parents.values_list('user_id', flat=True)
+    authentication.revoke(user_ids)
+
+
+@receiver(pre_delete, sender=Student)
+def revoke_on_student_delete(sender, instance, **kwargs):
+    # Ата-эне байланыштары өчүрүүдө m2m_changed'сиз жоголот - азыр окулат
+    authentication.revoke([instance.user_id, *instance.parents.values_list('user_id', flat=True)])
+
+
+@receiver(post_save, sender=Teacher)
+def revoke_new_teacher(sender, instance, created, **kwargs):
+    if created:
+        authentication.revoke([instance.user_id])
+
+
+@receiver(pre_save, sender=Subject)
+def remember_subject_teacher(sender, instance, **kwargs):
+    instance._jwt_old_teacher_id = (
+        Subject.objects.filter(pk=instance.pk).values_list('teacher_id', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Subject)
+def revoke_on_subject_teacher_change(sender, instance, created, **kwargs):
+    """Мугалимдин сабактарынын тизмеси (subject_ids) өзгөрдү"""
+    old_teacher_id = getattr(instance, '_jwt_old_teacher_id', None)
+    if created or old_teacher_id != instance.teacher_id:
+        authentication.revoke(
+            Teacher.objects.filter(pk__in=[old_teacher_id, instance.teacher_id]).values_list('user_id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Subject)
+def revoke_on_subject_delete(sender, instance, **kwargs):
+    if instance.teacher_id is not None:
+        authentication.revoke(Teacher.objects.filter(pk=instance.teacher_id).values_list('user_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Student.parents.through)
+def revoke_on_parent_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Ата-эненин балдары (children) өзгөрдү"""
+    if action in ('post_add', 'post_remove', 'pre_clear'):
+        authentication.revoke(parent_user_ids(instance, action, reverse, pk_set))
+
+
+# ============= МОБИЛДИК SYNC ЖУРНАЛЫ =============
+
+@receiver(pre_save, sender=Schedule)
+def remember_schedule_sync_scope(sender, instance, **kwargs):
+    """Сабак башка группага/мугалимге өтсө эски чөйрөгө tombstone жазуу үчүн"""
+    instance._sync_old_scope = None
+    if instance.pk:
+        old = Schedule.objects.filter(pk=instance.pk).values('group_id', 'teacher__user_id').first()
+        if old:
+            instance._sync_old_scope = {'group_id': old['group_id'], 'user_id': old['teacher__user_id']}
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=Attendance)
+@receiver(post_save, sender=Notification)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_save, sender=BroadcastNotification)
+def record_sync_change(sender, instance, **kwargs):
+    """Түзүлгөн/өзгөргөн объектти sync журналына жазуу"""
+    entry = sync.change_entry(instance)
+    entries = [entry]
+    old_scope = getattr(instance, '_sync_old_scope', None)
+    if old_scope and old_scope != {'group_id': entry.group_id, 'user_id': entry.user_id}:
+        entries.insert(0, sync.change_entry(instance, 'delete', old_scope))
+    sync.record_entries(entries)
+
+
+@receiver(post_delete, sender=Schedule)
+@receiver(post_delete, sender=Attendance)
+@receiver(post_delete, sender=Notification)
+@receiver(post_delete, sender=LeaveRequest)
+@receiver(post_delete, sender=BroadcastNotification)
+def record_sync_delete(sender, instance, **kwargs):
+    """Өчүрүлгөн объекттин tombstone'у"""
+    sync.record_changes([instance], 'delete')
+
+
+@receiver(pre_save, sender=Notification)
+def remember_notification_unread(sender, instance, **kwargs):
+    """Өзгөртүүгө чейин кимдин окулбаганы эле (эсептегич үчүн)"""
+    old = None
+    if instance.pk:
+        old = Notification.objects.filter(pk=instance.pk).values_list('recipient_id', 'is_read').first()
+    instance._unread_old_recipient = old[0] if old and not old[1] else None
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_counter(sender, instance, **kwargs):
+    """Окулбагандардын эсептегичин жаңылоо (түзүү, окулду, алуучу өзгөрдү)"""
+    deltas = Counter()
+    old_recipient = getattr(instance, '_unread_old_recipient', None)
+    if old_recipient:
+        deltas[old_recipient] -= 1
+    if not instance.is_read:
+        deltas[instance.recipient_id] += 1
+    unread_counter.adjust(deltas)
+
+
+@receiver(post_delete, sender=Notification)
+def remove_from_unread_counter(sender, instance, **kwargs):
+    if not instance.is_read:
+        unread_counter.adjust({instance.recipient_id: -1})
+
+
+@receiver(post_save, sender=BroadcastNotification)
+def count_new_broadcast(sender, instance, created, **kwargs):
+    """Жаңы жалпы билдирме аудиториянын окулбагандарына кошулат"""
+    if created:
+        broadcasts.broadcast_sent(instance)
+
+
+@receiver(pre_delete, sender=BroadcastNotification)
+def uncount_deleted_broadcast(sender, instance, **kwargs):
+    # Белгилер (BroadcastReceipt) cascade менен өчө элек - окугандар азыр аныкталат
+    broadcasts.broadcast_deleted(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def recount_on_role_change(sender, instance, created, **kwargs):
+    """Ролу өзгөрдү - көрө турган жалпы билдирмелер башка, эсептегич кайра саналат"""
+    if not created and getattr(instance, '_jwt_old_role', None) != instance.role:
+        unread_counter.forget([instance.user_id])
+
+
+@receiver(post_save, sender=Student)
+def recount_on_student_change(sender, instance, created, **kwargs):
+    """Студенттин группасы/курсу/колдонуучусу өзгөрдү - анын жана ата-энелеринин эсептегичтери"""
+    old = getattr(instance, '_old_student_row', None)
+    if not created and old == (instance.group_id, instance.course_id, instance.user_id):
+        return
+    user_ids = [instance.user_id, old[2] if old else None]
+    if not created:
+        user_ids += instance.parents.values_list('user_id', flat=True)
+    unread_counter.forget(user_ids)
+
+
+@receiver(pre_delete, sender=Student)
+def recount_on_student_delete(sender, instance, **kwargs):
+    unread_counter.forget([instance.user_id, *instance.parents.values_list('user_id', flat=True)])
+
+
+@receiver(m2m_changed, sender=Student.parents.through)
+def recount_on_parent_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Ата-эненин балдары өзгөрдү"""
+    if action in ('post_add', 'post_remove', 'pre_clear'):
+        unread_counter.forget(parent_user_ids(instance, action, reverse, pk_set))
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_group(sender, instance, **kwargs):
+    # (group_id, course_id, user_id) - JWT токендерин чакыртып алуу да колдонот
+    instance._old_student_row = (
+        Student.objects.filter(pk=instance.pk).values_list('group_id', 'course_id', 'user_id').first()
+        if instance.pk else None
+    )
+    instance._sync_old_group_id = instance._old_student_row[0] if instance._old_student_row else None
+
+
+@receiver(post_save, sender=Student)
+def record_student_scope_change(sender, instance, created, **kwargs):
+    """Студент жаңы түзүлдү же группасы өзгөрдү - анын жана ата-энелеринин sync чөйрөсү өзгөрдү"""
+    if created or getattr(instance, '_sync_old_group_id', None) != instance.group_id:
+        sync.record_scope_change(student_id=instance.pk, user_id=instance.user_id)
+
+
+def parent_user_ids(instance, action, reverse, pk_set):
+    """Student.parents өзгөргөндө тиешелүү ата-энелердин колдонуучулары"""
+    if reverse:
+        # instance - UserProfile (ата-эне)
+        return [instance.user_id]
+    if action == 'pre_clear':
+        return list(instance.parents.values_list('user_id', flat=True))
+    return list(UserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Student.parents.through)
+def record_parent_scope_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Ата-энеге бала кошулду/алынды - ата-эненин sync чөйрөсү өзгөрдү"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    for user_id in parent_user_ids(instance, action, reverse, pk_set):
+        sync.record_scope_change(user_id=user_id)
@@ -4,19 +4,181 @@ Dashboard жана Report үчүн бирдиктүү маалыматтар
 """
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.db.models import Count, Q
-from .models import Student, Teacher, Group, Subject, Attendance
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+from .models import Student, Teacher, Group, Subject, Attendance, DailyAttendanceRollup
+from .rollup import rollup_queryset
 import json
 
 
-def get_unified_statistics(start_date=None, end_date=None, group_id=None, student_id=None):
+# Статус аттары жана алардын натыйжадагы ачкычтары
+STATUS_KEYS = {
+    'Present': 'present',
+    'Absent': 'absent',
+    'Late': 'late',
+    'Excused': 'excused',
+}
+
+EMPTY_COUNTS = {'total': 0, 'present': 0, 'absent': 0, 'late': 0, 'excused': 0}
+
+
+def _status_aggregates(model=Attendance):
     """
-    Биргелешкен статистика функциясы
-    Dashboard жана Report үчүн бирдиктүү маалыматтарды берет
+    Ар бир статус үчүн шарттуу aggregate туюнтмалары
+    Attendance үчүн - Count, DailyAttendanceRollup үчүн - Sum('count')
     """
-    today = timezone.now().date()
+    if model is DailyAttendanceRollup:
+        aggregates = {'total': Coalesce(Sum('count'), 0)}
+        for status, key in STATUS_KEYS.items():
+            aggregates[key] = Coalesce(Sum('count', filter=Q(status=status)), 0)
+        return aggregates
     
-    # Базалык queryset
+    aggregates = {'total': Count('id')}
+    for status, key in STATUS_KEYS.items():
+        aggregates[key] = Count('id', filter=Q(status=status))
+    return aggregates
+
+
+def _rate(part, total):
+    """Пайызды эсептөө (0гө бөлүүдөн коргоо менен)"""
+    if total > 0:
+        return round((part / total) * 100, 1)
+    return 0
+
+
+def get_status_counts(queryset):
+    """
+    Статустар боюнча сандарды бир aggregate суроо менен алуу
+    Натыйжа: {'total', 'present', 'absent', 'late', 'excused'}
+    """
+    return queryset.aggregate(**_status_aggregates(queryset.model))
+
+
+def get_daily_status_counts(queryset):
+    """
+    Күн боюнча статус сандары - бир GROUP BY date суроосу
+    Натыйжа: {date: {'total', 'present', 'absent', 'late', 'excused'}}
+    """
+    rows = queryset.order_by().values('date').annotate(**_status_aggregates(queryset.model))
+    return {row.pop('date'): row for row in rows}
+
+
+def get_group_status_counts(queryset, group_field='student__group_id'):
+    """
+    Группа боюнча статус сандары - бир GROUP BY суроосу
+    Натыйжа: {group_id: {'total', 'present', 'absent', 'late', 'excused'}}
+    """
+    rows = get_status_breakdown(queryset, group_field)
+    return {row.pop(group_field): row for row in rows}
+
+
+def get_status_breakdown(queryset, *fields):
+    """
+    Бир нече талаа боюнча статус сандары - бир GROUP BY суроосу
+    Натыйжа: [{<fields>..., 'total', 'present', 'absent', 'late', 'excused'}, ...]
+    """
+    return list(queryset.order_by().values(*fields).annotate(**_status_aggregates(queryset.model)))
+
+
+
+def annotate_group_counts(queryset, attendance=True):
+    """
+    Группалардын queryset'ине студент жана катышуу сандарын кошуу - бир GROUP BY суроосу
+    Аннотациялар: student_count жана attendance=True болсо attendance_<total|present|absent|late|excused>
+    (Attendance студенттин азыркы группасы боюнча, student__group сыяктуу)
+    """
+    aggregates = {'student_count': Count('student', distinct=True)}
+    if attendance:
+        aggregates['attendance_total'] = Count('student__attendance')
+        for status, key in STATUS_KEYS.items():
+            aggregates[f'attendance_{key}'] = Count(
+                'student__attendance', filter=Q(student__attendance__status=status)
+            )
+    return queryset.annotate(**aggregates)
+
+# Убакыт катарынын бөлүктөрү: day - күн, week - дүйшөмбүдөн башталган жума, month - ай
+GRANULARITIES = ('day', 'week', 'month')
+
+_TRUNCATE = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Бир катардагы бөлүктөрдүн эң көп саны (~1 жыл күн, ~5 жыл жума, 10 жыл ай)
+MAX_BUCKETS = {
+    'day': 366,
+    'week': 260,
+    'month': 120,
+}
+
+
+def bucket_start(day, granularity='day'):
+    """Күн кайсы бөлүккө кирет - бөлүктүн биринчи күнү"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_count(start_date, end_date, granularity='day'):
+    """[start_date, end_date] аралыгындагы бөлүктөрдүн саны"""
+    if end_date < start_date:
+        return 0
+    if granularity == 'week':
+        return (bucket_start(end_date, 'week') - bucket_start(start_date, 'week')).days // 7 + 1
+    if granularity == 'month':
+        return (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    return (end_date - start_date).days + 1
+
+
+def get_status_time_series(queryset, start_date, end_date, granularity='day'):
+    """
+    Мезгил боюнча статус сандары - бир GROUP BY суроосу (күн/жума/ай)
+    Маалымат жок бөлүктөр нөл менен толтурулат
+    Натыйжа: [{'start', 'end', 'total', 'present', 'absent', 'late', 'excused'}, ...] -
+    start/end бөлүктүн чектери, [start_date, end_date] аралыгына кыскартылган
+    Бөлүктөр MAX_BUCKETS'тен көп болсо ValueError
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Белгисиз granularity: {granularity}")
+    if bucket_count(start_date, end_date, granularity) > MAX_BUCKETS[granularity]:
+        raise ValueError(f"Мезгил өтө узун: {granularity} боюнча {MAX_BUCKETS[granularity]} бөлүктөн ашпайт")
+    
+    queryset = queryset.filter(date__range=[start_date, end_date]).order_by()
+    if granularity == 'day':
+        rows = queryset.values(bucket=F('date'))
+    else:
+        rows = queryset.annotate(bucket=_TRUNCATE[granularity]('date')).values('bucket')
+    rows = rows.annotate(**_status_aggregates(queryset.model))
+    per_bucket = {}
+    for row in rows:
+        bucket = row.pop('bucket')
+        # Кээ бир backend'дер Trunc'тан datetime кайтарат
+        per_bucket[bucket.date() if isinstance(bucket, datetime) else bucket] = row
+    
+    series = []
+    current = bucket_start(start_date, granularity)
+    while current <= end_date:
+        following = _next_bucket(current, granularity)
+        counts = per_bucket.get(current, EMPTY_COUNTS)
+        series.append(dict(
+            counts, start=max(current, start_date), end=min(following - timedelta(days=1), end_date)
+        ))
+        current = following
+    return series
+
+
+def filter_attendances(start_date=None, end_date=None, group_id=None, student_id=None):
+    """Report фильтрлери боюнча Attendance queryset"""
     attendances = Attendance.objects.all()
     
     # Дата фильтри
@@ -28,6 +190,18 @@ def get_unified_statistics(start_date=None, end_date=None, group_id=None, studen
         attendances = attendances.filter(student__group_id=group_id)
     if student_id:
         attendances = attendances.filter(student_id=student_id)
+    return attendances
+
+
+def get_unified_statistics(start_date=None, end_date=None, group_id=None, student_id=None):
+    """
+    Биргелешкен статистика функциясы
+    Dashboard жана Report үчүн бирдиктүү маалыматтарды берет
+    """
+    today = timezone.now().date()
+    
+    # Базалык queryset
+    attendances = filter_attendances(start_date, end_date, group_id, student_id)
     
     # Негизги саныктар
     total_students = Student.objects.count()
@@ -35,69 +209,72 @@ def get_unified_statistics(start_date=None, end_date=None, group_id=None, studen
     total_groups = Group.objects.count()
     total_subjects = Subject.objects.count()
     
-    # Attendance статистикасы
-    total_records = attendances.count()
-    present_count = attendances.filter(status='Present').count()
-    absent_count = attendances.filter(status='Absent').count()
-    late_count = attendances.filter(status='Late').count()
-    excused_count = attendances.filter(status='Excused').count()
+    # Студент боюнча фильтр жыйынтык таблицасында жок - ошондо гана чийки Attendance саналат
+    if student_id:
+        source = attendances
+        group_field = 'student__group_id'
+    else:
+        source = rollup_queryset(start_date, end_date, group_id)
+        group_field = 'group_id'
+    
+    # Attendance статистикасы - бир гана aggregate суроо
+    counts = get_status_counts(source)
+    total_records = counts['total']
+    present_count = counts['present']
+    absent_count = counts['absent']
+    late_count = counts['late']
+    excused_count = counts['excused']
     
     # Пайыздар
-    if total_records > 0:
-        present_rate = round((present_count / total_records) * 100, 1)
-        absent_rate = round((absent_count / total_records) * 100, 1)
-        late_rate = round((late_count / total_records) * 100, 1)
-        excused_rate = round((excused_count / total_records) * 100, 1)
-    else:
-        present_rate = absent_rate = late_rate = excused_rate = 0
+    present_rate = _rate(present_count, total_records)
+    absent_rate = _rate(absent_count, total_records)
+    late_rate = _rate(late_count, total_records)
+    excused_rate = _rate(excused_count, total_records)
     
     # Бүгүнкү статистика
-    today_attendances = Attendance.objects.filter(date=today)
-    today_total = today_attendances.count()
-    today_present = today_attendances.filter(status='Present').count()
-    today_absent = today_attendances.filter(status='Absent').count()
-    today_late = today_attendances.filter(status='Late').count()
-    today_excused = today_attendances.filter(status='Excused').count()
-    
-    if today_total > 0:
-        today_present_rate = round((today_present / today_total) * 100, 1)
-        today_absent_rate = round((today_absent / today_total) * 100, 1)
-        today_late_rate = round((today_late / today_total) * 100, 1)
-        today_excused_rate = round((today_excused / today_total) * 100, 1)
-    else:
-        today_present_rate = today_absent_rate = today_late_rate = today_excused_rate = 0
+    today_counts = get_status_counts(rollup_queryset(today, today))
+    today_total = today_counts['total']
+    today_present = today_counts['present']
+    today_absent = today_counts['absent']
+    today_late = today_counts['late']
+    today_excused = today_counts['excused']
+    
+    today_present_rate = _rate(today_present, today_total)
+    today_absent_rate = _rate(today_absent, today_total)
+    today_late_rate = _rate(today_late, today_total)
+    today_excused_rate = _rate(today_excused, today_total)
+    
+    # Группалар боюнча статистика - группалар боюнча группаланган бир суроо
+    per_group = get_group_status_counts(source, group_field)
+    
+    groups = Group.objects.select_related('course').annotate(
+        students_count=Count('student', distinct=True),
+        subjects_count=Count('schedule__subject', distinct=True),
+    ).order_by('course__year', 'name')
+    if group_id:
+        groups = groups.filter(id=group_id)
     
-    # Группалар боюнча статистика
     groups_stats = []
     group_total_records = 0
     group_total_present = 0
     group_total_absent = 0
     
-    for group in Group.objects.all():
-        # Фильтр менен же фильтрсиз attendance
-        if group_id and str(group.id) != str(group_id):
-            continue
-            
-        group_attendances = attendances.filter(student__group=group)
-        group_total = group_attendances.count()
-        group_present = group_attendances.filter(status='Present').count()
-        group_absent = group_attendances.filter(status='Absent').count()
-        
-        if group_total > 0:
-            group_rate = round((group_present / group_total) * 100, 1)
-        else:
-            group_rate = 0
+    for group in groups:
+        group_counts = per_group.get(group.id, EMPTY_COUNTS)
+        group_total = group_counts['total']
+        group_present = group_counts['present']
+        group_absent = group_counts['absent']
         
         groups_stats.append({
             'id': group.id,
             'name': group.name,
             'course': group.course,
-            'students_count': Student.objects.filter(group=group).count(),
+            'students_count': group.students_count,
             'total_records': group_total,
             'present_count': group_present,
             'absent_count': group_absent,
-            'attendance_rate': group_rate,
-            'subjects_count': Subject.objects.filter(schedule__group=group).distinct().count(),
+            'attendance_rate': _rate(group_present, group_total),
+            'subjects_count': group.subjects_count,
         })
         
         group_total_records += group_total
@@ -105,10 +282,7 @@ def get_unified_statistics(start_date=None, end_date=None, group_id=None, studen
         group_total_absent += group_absent
     
     # Жалпы группалардын attendance rate
-    if group_total_records > 0:
-        overall_attendance_rate = round((group_total_present / group_total_records) * 100, 1)
-    else:
-        overall_attendance_rate = 0
+    overall_attendance_rate = _rate(group_total_present, group_total_records)
     
     # Соңку 7 күндүн тренди
     weekly_trend_result = get_weekly_trend_data(today, total_students)
@@ -184,15 +358,18 @@ def get_weekly_trend_data(today, total_students_count):
         'daily_trend': []  # Report үчүн
     }
     
-    for i in range(6, -1, -1):
-        day_date = today - timedelta(days=i)
-        day_attendances = Attendance.objects.filter(date=day_date)
+    # 7 күндүн бардыгы бир GROUP BY date суроосу менен алынат
+    start_day = today - timedelta(days=6)
+    series = get_status_time_series(rollup_queryset(start_day, today), start_day, today)
+    
+    for day_counts in series:
+        day_date = day_counts['start']
         
-        day_total = day_attendances.count()
-        day_present = day_attendances.filter(status='Present').count()
-        day_absent = day_attendances.filter(status='Absent').count()
-        day_late = day_attendances.filter(status='Late').count()
-        day_excused = day_attendances.filter(status='Excused').count()
+        day_total = day_counts['total']
+        day_present = day_counts['present']
+        day_absent = day_counts['absent']
+        day_late = day_counts['late']
+        day_excused = day_counts['excused']
         
         # Жалпы студенттерден пайыз эсептөө (Dashboard үчүн)
         if total_students_count > 0:
@@ -0,0 +1,250 @@
+"""
+Мобилдик тиркеме үчүн delta-sync
+Өзгөрүүлөр ChangeLog таблицасына сигналдардан (сигналсыз bulk жазууларда - түздөн-түз)
+commit'тен кийин жазылат. Кардар токен (акыркы ChangeLog.id) жөнөтөт жана өзүнүн
+көрүнүү чөйрөсүндө андан кийин түзүлгөн/өзгөргөн/өчүрүлгөн жолдорду гана алат:
+- токен жок, эскирген (журнал тазаланган) же колдонуучунун чөйрөсү өзгөргөн - толук snapshot (reset)
+- бир жоопто SYNC_PAGE_SIZE жазуудан ашпайт, has_more болсо кардар дароо кайра сурайт
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from . import broadcasts, notification_stream, principal
+from .models import (
+    Attendance, BroadcastNotification, ChangeLog, LeaveRequest, Notification, Schedule, Teacher,
+)
+
+# Бир жооптогу журнал жазууларынын максималдуу саны
+SYNC_PAGE_SIZE = 500
+
+# Жаңы гана жазылган өзгөрүүлөр бир аз күтөт: параллелдүү commit'тердин id'лери
+# ирети менен көрүнбөй калышы мүмкүн - токен алардан ашып кетпесин
+SETTLE_SECONDS = 1
+
+# Журналдагы модель -> жооптогу коллекция
+COLLECTIONS = {
+    'schedule': 'schedules',
+    'attendance': 'attendance',
+    'notification': 'notifications',
+    'leave_request': 'leave_requests',
+    'broadcast': 'broadcasts',
+}
+
+MODEL_NAMES = {
+    Schedule: 'schedule',
+    Attendance: 'attendance',
+    Notification: 'notification',
+    LeaveRequest: 'leave_request',
+    BroadcastNotification: 'broadcast',
+}
+
+
+# ============= ЖУРНАЛГА ЖАЗУУ =============
+
+def _teacher_user_id(schedule):
+    if schedule.teacher_id is None:
+        return None
+    if Schedule.teacher.is_cached(schedule):
+        return schedule.teacher.user_id if schedule.teacher else None
+    return Teacher.objects.filter(pk=schedule.teacher_id).values_list('user_id', flat=True).first()
+
+
+def schedule_scope(schedule):
+    """Сабак группасына жана мугалимине көрүнөт"""
+    return {'group_id': schedule.group_id, 'user_id': _teacher_user_id(schedule)}
+
+
+SCOPES = {
+    'schedule': schedule_scope,
+    'attendance': lambda attendance: {'student_id': attendance.student_id},
+    'notification': lambda notification: {'user_id': notification.recipient_id},
+    'leave_request': lambda leave_request: {'student_id': leave_request.student_id},
+    # Окулду/өчүрүлдү белгилери колдонуучунун чөйрөсү менен түздөн-түз жазылат
+    'broadcast': lambda broadcast: {},
+}
+
+
+def change_entry(instance, action='upsert', scope=None):
+    """Объекттин журнал жазуусу (сакталбаган)"""
+    model = MODEL_NAMES[type(instance)]
+    if scope is None:
+        scope = SCOPES[model](instance)
+    return ChangeLog(model=model, object_id=instance.pk, action=action, **scope)
+
+
+def _save_entries(entries):
+    ChangeLog.objects.bulk_create(entries)
+    # Билдирмелердин өзгөрүүлөрү ачык агымдарга (SSE/long-poll) да жетет
+    notification_stream.publish_entries(entries)
+
+
+def record_entries(entries):
+    """Журнал жазууларын транзакция ийгиликтүү бүткөндөн кийин бир bulk insert менен сактоо"""
+    entries = [entry for entry in entries if entry.object_id is not None]
+    if entries:
+        transaction.on_commit(lambda: _save_entries(entries))
+
+
+def record_changes(instances, action='upsert'):
+    """Объекттердин түзүлүшүн/өзгөрүшүн (же өчүрүлүшүн) журналга жазуу"""
+    record_entries([change_entry(instance, action) for instance in instances])
+
+
+def record_scope_change(student_id=None, user_id=None):
+    """Колдонуучунун көрүнүү чөйрөсү өзгөрдү (группа, балдар) - кардар толук snapshot алат"""
+    record_entries([ChangeLog(
+        model='scope', object_id=student_id or user_id, student_id=student_id, user_id=user_id,
+    )])
+
+
+def retention_days():
+    """Журнал канча күн сакталат"""
+    return getattr(settings, 'CHANGELOG_RETENTION_DAYS', 30)
+
+
+def prune_changelog(days):
+    """days күндөн эски жазууларды өчүрүү (эң акыркы жазуу токендерди текшерүү үчүн калат)"""
+    last_id = ChangeLog.objects.aggregate(last=Max('id'))['last']
+    if last_id is None:
+        return 0
+    deadline = timezone.now() - timedelta(days=days)
+    deleted, _ = ChangeLog.objects.filter(created_at__lt=deadline, id__lt=last_id).delete()
+    return deleted
+
+
+# ============= КӨРҮНҮҮ ЧӨЙРӨСҮ =============
+
+def user_scope(user):
+    """Колдонуучунун ролу, студенттери (өзү же балдары), алардын группалары жана курстары"""
+    current = principal.for_user(user)
+    return {
+        'user_id': user.id,
+        'role': current.role,
+        'joined': user.date_joined,
+        'student_ids': current.student_ids,
+        'group_ids': current.group_ids,
+        'course_ids': current.course_ids,
+    }
+
+
+def changelog_filter(scope):
+    """Колдонуучуга тиешелүү журнал жазуулары"""
+    condition = Q(user_id=scope['user_id'])
+    # Жалпы билдирмелер - баарына (аудиторияга кирбегендер аларды өчүрүлгөн катары алат)
+    condition |= Q(model='broadcast', user_id__isnull=True)
+    if scope['role'] in ('ADMIN', 'MANAGER'):
+        condition |= Q(model='schedule')
+    if scope['group_ids']:
+        condition |= Q(model='schedule', group_id__in=scope['group_ids'])
+    if scope['student_ids']:
+        condition |= Q(
+            model__in=['attendance', 'leave_request', 'scope'], student_id__in=scope['student_ids'],
+        )
+    return condition
+
+
+def scoped_querysets(scope):
+    """Коллекция -> колдонуучу көрө турган жолдор"""
+    if scope['role'] in ('ADMIN', 'MANAGER'):
+        schedules = Schedule.objects.all()
+    elif scope['role'] == 'TEACHER':
+        schedules = Schedule.objects.filter(teacher__user_id=scope['user_id'])
+    else:
+        schedules = Schedule.objects.filter(group_id__in=scope['group_ids'])
+    return {
+        'schedules': schedules,
+        'attendance': Attendance.objects.filter(student_id__in=scope['student_ids']),
+        'notifications': Notification.objects.filter(recipient_id=scope['user_id']),
+        'leave_requests': LeaveRequest.objects.filter(student_id__in=scope['student_ids']),
+        'broadcasts': broadcasts.visible(scope),
+    }
+
+
+# ============= ӨЗГӨРҮҮЛӨРДҮ ОКУУ =============
+
+def parse_token(value):
+    """Кардардын токени: жок болсо None, туура эмес болсо ValueError"""
+    if value in (None, ''):
+        return None
+    token = int(value)
+    if token < 0:
+        raise ValueError('Туура эмес token')
+    return token
+
+
+def token_is_current(token):
+    """Токенден кийинки жазуулардын баары журналда барбы (тазаланбаганбы)"""
+    bounds = ChangeLog.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['last'] is None:
+        return token == 0
+    return bounds['first'] - 1 <= token <= bounds['last']
+
+
+def _read_log(scope, token, limit):
+    cutoff = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    rows = list(
+        ChangeLog.objects.filter(changelog_filter(scope), id__gt=token)
+        .order_by('id').values_list('id', 'model', 'object_id', 'action', 'created_at')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    actions = {}
+    last_id = token
+    for pk, model, object_id, action, created_at in rows[:limit]:
+        if created_at > cutoff:
+            return actions, last_id, False
+        # Бир объекттин бир нече өзгөрүүсүнөн акыркысы гана
+        actions.setdefault(model, {})[object_id] = action
+        last_id = pk
+    if not has_more:
+        # Чөйрөдөгү жазуулардын баары окулду - токен башка колдонуучулардын өзгөрүүлөрүнөн
+        # да ашып кетет (болбосо журнал тазалангандан кийин кардар бекер snapshot алмак)
+        settled = ChangeLog.objects.filter(created_at__lte=cutoff).aggregate(last=Max('id'))['last']
+        last_id = max(last_id, settled or 0)
+    return actions, last_id, has_more
+
+
+def collect_changes(user, token=None, limit=SYNC_PAGE_SIZE):
+    """
+    Колдонуучу үчүн өзгөрүүлөр
+    Натыйжа: {'reset', 'token', 'has_more', 'upserted': {коллекция: queryset},
+              'upsert_ids': {коллекция: [id, ...]} же None, 'deleted': {коллекция: [id, ...]}}
+    reset=True болсо upserted - чөйрөдөгү бардык жолдор, кардар жергиликтүү маалыматын алмаштырат
+    """
+    scope = user_scope(user)
+    querysets = scoped_querysets(scope)
+    deleted = {collection: [] for collection in querysets}
+
+    if token is not None and token_is_current(token):
+        actions, last_id, has_more = _read_log(scope, token, limit)
+        if 'scope' not in actions:
+            upserted = {}
+            upsert_ids = {}
+            for model, collection in COLLECTIONS.items():
+                changed = actions.get(model, {})
+                upsert_ids[collection] = [pk for pk, action in changed.items() if action == 'upsert']
+                upserted[collection] = querysets[collection].filter(pk__in=upsert_ids[collection])
+                deleted[collection] = sorted(pk for pk, action in changed.items() if action == 'delete')
+            return {
+                'reset': False, 'token': last_id, 'has_more': has_more,
+                'upserted': upserted, 'upsert_ids': upsert_ids, 'deleted': deleted,
+            }
+
+    # Толук snapshot: токен маалыматтан мурун окулат - ортодогу өзгөрүүлөр кийин кайра келет
+    last_id = ChangeLog.objects.aggregate(last=Max('id'))['last'] or 0
+    return {
+        'reset': True, 'token': last_id, 'has_more': False,
+        'upserted': querysets, 'upsert_ids': None, 'deleted': deleted,
+    }
+
+
+def missing_ids(upsert_ids, rows):
+    """
+    upsert болуп белгиленген, бирок азыр чөйрөдө жок объекттер (кийин өчүрүлгөн же
+    чөйрөдөн чыккан) - кардарга өчүрүлгөн катары берилет
+    """
+    found = {row.pk for row in rows}
+    return sorted(pk for pk in upsert_ids if pk not in found)
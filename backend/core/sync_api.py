@@ -0,0 +1,94 @@
+"""
+Мобилдик тиркеменин синхрондоо API'лери
+GET /api/v1/sync/?token=<акыркы токен> - delta-sync
+    Жооп: {'token', 'reset', 'has_more', 'changes': {коллекция: {'upserted': [...], 'deleted': [id, ...]}}}
+    Жолдор кадимки API'дегидей serializer'лер менен берилет - кардар аларды id боюнча
+    жергиликтүү сактагычка кошот/алмаштырат, deleted'дегилерин өчүрөт.
+    broadcasts - колдонуучуга тиешелүү жалпы билдирмелер, id'лери (deleted'де да) 'b12' түрүндө
+GET /api/v1/reference/ - маалымдама маалыматтын толук snapshot'у (тиркеме ачылганда)
+    ETag версиялардан: сакталган көчүрмө эскирбесе If-None-Match'ке 304 кайтат
+"""
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from . import broadcasts, data_versions, sync
+from .api_views import (
+    AttendanceViewSet, LeaveRequestViewSet, NotificationViewSet, ScheduleViewSet, timeslot_data,
+)
+from .models import Course, Group, Subject, Teacher, TimeSlot
+from .serializers import (
+    AttendanceSerializer, BroadcastNotificationSerializer, CourseSerializer, GroupSerializer,
+    LeaveRequestSerializer, NotificationSerializer, ScheduleSerializer, SubjectSerializer, TeacherSerializer,
+    group_student_counts, week_attendance_map,
+)
+from .statistics import annotate_group_counts
+
+# Коллекция -> (serializer, select_related байланыштары)
+SYNC_SERIALIZERS = {
+    'schedules': (ScheduleSerializer, ScheduleViewSet.related_fields),
+    'attendance': (AttendanceSerializer, AttendanceViewSet.related_fields),
+    'notifications': (NotificationSerializer, NotificationViewSet.related_fields),
+    'leave_requests': (LeaveRequestSerializer, LeaveRequestViewSet.related_fields),
+    'broadcasts': (BroadcastNotificationSerializer, ('sender',)),
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """Токенден кийинки өзгөрүүлөр (токен жок же эскирген болсо - толук snapshot)"""
+    try:
+        token = sync.parse_token(request.query_params.get('token'))
+    except ValueError:
+        return Response({'error': 'Туура эмес token'}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = sync.collect_changes(request.user, token)
+    context = {
+        'request': request,
+        'attendance_map': week_attendance_map(request.user),
+        'group_student_counts': group_student_counts(),
+    }
+
+    changes = {}
+    for collection, (serializer_class, related_fields) in SYNC_SERIALIZERS.items():
+        rows = list(result['upserted'][collection].select_related(*related_fields).order_by('pk'))
+        deleted = result['deleted'][collection]
+        if result['upsert_ids'] is not None:
+            # Белгиленгенден кийин өчүрүлгөн же чөйрөдөн чыккан объекттер
+            deleted = sorted(set(deleted) | set(sync.missing_ids(result['upsert_ids'][collection], rows)))
+        if collection == 'broadcasts':
+            deleted = [f'{broadcasts.ID_PREFIX}{pk}' for pk in deleted]
+        changes[collection] = {
+            'upserted': serializer_class(rows, many=True, context=context).data,
+            'deleted': deleted,
+        }
+
+    return Response({
+        'token': str(result['token']),
+        'reset': result['reset'],
+        'has_more': result['has_more'],
+        'changes': changes,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def reference_snapshot(request):
+    """Курстар, группалар, сабактар, мугалимдер жана убакыт слоттору - бир жооп, барактоосуз"""
+    def build():
+        versions, _ = data_versions.get_versions(data_versions.REFERENCE)
+        groups = annotate_group_counts(Group.objects.select_related('course'), attendance=False)
+        return Response({
+            'versions': versions,
+            'courses': CourseSerializer(Course.objects.all(), many=True).data,
+            'groups': GroupSerializer(groups.order_by('name'), many=True).data,
+            'subjects': SubjectSerializer(
+                Subject.objects.select_related('teacher__user', 'course').order_by('subject_name'), many=True,
+            ).data,
+            'teachers': TeacherSerializer(Teacher.objects.select_related('user').order_by('name'), many=True).data,
+            'timeslots': timeslot_data(TimeSlot.objects.filter(is_active=True).order_by('order')),
+        })
+
+    return data_versions.conditional_response(request, data_versions.REFERENCE, build)
@@ -0,0 +1,720 @@
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import broadcasts, principal, schedule_cache, sync, unread_counter
+from .absence_alerts import check_excessive_absences
+from .authentication import TOKEN_STATE_KEY
+from .attendance_bulk import bulk_mark_attendance
+from .models import (
+    AbsenceAlert, Attendance, BroadcastReceipt, Course, DailyAttendanceRollup, Group, Notification, ReportJob, Schedule, Student,
+    Subject, Teacher, TimeSlot, TokenRevocation,
+)
+from .reports import ADVANCED_REPORT_TYPES, advanced_report_sheets
+from .report_jobs import JOB_HANDLERS, JobLost, ProgressReporter, claim_next_job, requeue_stale_jobs, run_job
+from .rollup import rebuild_rollup
+from .statistics import MAX_BUCKETS, get_status_time_series, get_unified_statistics
+
+STATUSES = ['Present', 'Absent', 'Late', 'Excused']
+
+
+class SchoolDataMixin:
+    """Тесттер үчүн курс, группалар, студенттер, сабактар жана катышуулар"""
+
+    def make_school(self, groups=2, students=3, days=3, prefix='G'):
+        course = Course.objects.create(name=f'{prefix} курс', year=1)
+        teacher = Teacher.objects.create(name=f'{prefix} мугалим')
+        subject = Subject.objects.create(subject_name=f'{prefix} сабак', teacher=teacher, course=course)
+        today = date.today()
+        made = []
+        for group_index in range(groups):
+            group = Group.objects.create(name=f'{prefix}-{group_index}', course=course)
+            schedule = Schedule.objects.create(subject=subject, group=group, teacher=teacher, day='Monday')
+            for student_index in range(students):
+                student = Student.objects.create(
+                    name=f'{prefix}-{group_index}-{student_index}', course=course, group=group,
+                )
+                for day in range(days):
+                    Attendance.objects.create(
+                        student=student, subject=subject, schedule=schedule, date=today - timedelta(days=day),
+                        status=STATUSES[(student_index + day) % len(STATUSES)],
+                    )
+            made.append(group)
+        return subject, made
+
+    def make_user(self, username, role=None, student=None):
+        """Колдонуучу, профилинин ролу жана (берилсе) Student жазуусуна байланышы"""
+        user = User.objects.create_user(username, password='x')
+        if role:
+            profile = user.userprofile
+            profile.role = role
+            profile.save()
+        if student is not None:
+            student.user = user
+            student.save()
+        return user
+
+    def count_queries(self, func):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return len(queries)
+
+
+# ============= СТАТИСТИКА =============
+
+class UnifiedStatisticsQueryTests(SchoolDataMixin, TestCase):
+    # Негизги сандар (4), статустар, бүгүн, группалар боюнча, группалар, 7 күндүк тренд
+    UNIFIED_STATISTICS_QUERIES = 9
+
+    def setUp(self):
+        self.make_school()
+
+    def test_unified_statistics_query_count(self):
+        with self.assertNumQueries(self.UNIFIED_STATISTICS_QUERIES):
+            stats = get_unified_statistics()
+        self.assertEqual(stats['total_records'], Attendance.objects.count())
+        self.assertEqual(stats['absent_count'], Attendance.objects.filter(status='Absent').count())
+        self.assertEqual(
+            sum(group['total_records'] for group in stats['groups_stats']), Attendance.objects.count(),
+        )
+
+    def test_unified_statistics_does_not_grow_with_data(self):
+        before = self.count_queries(get_unified_statistics)
+        self.make_school(groups=4, students=5, days=5, prefix='H')
+        self.assertEqual(self.count_queries(get_unified_statistics), before)
+
+    def test_dashboard_stats_does_not_grow_with_data(self):
+        admin = User.objects.create_superuser('stats_admin', password='x')
+
+        def request():
+            # Жаңы объект - principal User'де сакталбасын
+            client = APIClient()
+            client.force_authenticate(User.objects.get(pk=admin.pk))
+            self.assertEqual(client.get('/api/v1/dashboard/stats/').status_code, 200)
+
+        before = self.count_queries(request)
+        self.make_school(groups=4, students=5, days=5, prefix='H')
+        self.assertEqual(self.count_queries(request), before)
+
+
+class StatusTimeSeriesLimitTests(TestCase):
+    START = date(2019, 12, 30)
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('series_admin', password='x')
+
+    def statistics(self, **params):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.admin.pk))
+        return client.get('/api/v1/reports/statistics/', params)
+
+    def test_series_over_the_limit_is_rejected(self):
+        # START - дүйшөмбү: жумалар толук
+        longest_end = {
+            'day': self.START + timedelta(days=MAX_BUCKETS['day'] - 1),
+            'week': self.START + timedelta(weeks=MAX_BUCKETS['week'], days=-1),
+            'month': date(2029, 11, 30),
+        }
+        for granularity, end in longest_end.items():
+            with self.subTest(granularity=granularity):
+                series = get_status_time_series(Attendance.objects.all(), self.START, end, granularity)
+                self.assertEqual(len(series), MAX_BUCKETS[granularity])
+                with self.assertRaises(ValueError):
+                    get_status_time_series(
+                        Attendance.objects.all(), self.START, end + timedelta(days=1), granularity,
+                    )
+
+    def test_statistics_api_rejects_long_ranges(self):
+        response = self.statistics(start_date='2000-01-01', end_date='2020-01-01', granularity='day')
+        self.assertEqual(response.status_code, 400)
+        response = self.statistics(start_date='2000-01-01', end_date='2009-12-31', granularity='month')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['daily_stats']), MAX_BUCKETS['month'])
+
+
+# ============= ТОПТОП БЕЛГИЛӨӨ =============
+
+class BulkMarkQueryTests(SchoolDataMixin, TestCase):
+    # Студенттер, сабактар, бар жолдор, UPDATE, жыйынтык (SELECT/UPDATE/INSERT), расписание версиясы,
+    # sync, savepoint'тер
+    MAX_QUERIES = 13
+
+    def setUp(self):
+        self.make_school(groups=4, students=10, days=4)
+        self.schedules = list(Schedule.objects.values_list('id', flat=True))
+
+    def payload(self, size):
+        """Бар жолдорго аралаш статус жана расписание"""
+        rows = Attendance.objects.order_by('id')[:size]
+        return [
+            {
+                'student_id': row.student_id, 'subject_id': row.subject_id, 'date': row.date.isoformat(),
+                'schedule_id': self.schedules[index % len(self.schedules)],
+                'status': STATUSES[(index * 3 + 1) % len(STATUSES)],
+            }
+            for index, row in enumerate(rows)
+        ]
+
+    def mark(self, records):
+        result = bulk_mark_attendance(records, user=None)
+        self.assertEqual((result['updated'], result['errors']), (len(records), []))
+
+    def test_mixed_update_query_count_does_not_grow(self):
+        small, large = self.payload(8), self.payload(160)
+        small_queries = self.count_queries(lambda: self.mark(small))
+        self.assertLessEqual(small_queries, self.MAX_QUERIES)
+        self.assertEqual(self.count_queries(lambda: self.mark(large)), small_queries)
+
+        for record in large:
+            row = Attendance.objects.get(
+                student_id=record['student_id'], subject_id=record['subject_id'], date=record['date'],
+            )
+            self.assertEqual((row.status, row.schedule_id), (record['status'], record['schedule_id']))
+
+
+# ============= РАСПИСАНИЕ КЭШИ =============
+
+class ScheduleCacheTests(SchoolDataMixin, TestCase):
+    def setUp(self):
+        self.subject, self.groups = self.make_school(groups=2, students=1, days=1)
+        self.client.force_login(User.objects.create_superuser('grid_admin', password='x'))
+
+    def grid(self):
+        response = self.client.get('/ky/api/schedule/data/', {'group_id': self.groups[0].pk})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def key(self, group):
+        return schedule_cache.schedule_cache_key(
+            None, None, date.today(), 'STUDENT:1', with_attendance=True, student_group_id=group.pk,
+        )
+
+    def test_grid_is_rebuilt_after_save(self):
+        self.assertEqual(self.grid()['time_slots'], [])
+        TimeSlot.objects.create(name='1-пара', start_time='08:00', end_time='09:20')
+        self.assertEqual([slot['name'] for slot in self.grid()['time_slots']], ['1-пара'])
+
+    def test_versions_come_from_the_database(self):
+        # Башка процесстин (же тазаланган) кэши ошол эле ачкычты көрөт
+        before = self.key(self.groups[0])
+        cache.clear()
+        self.assertEqual(self.key(self.groups[0]), before)
+
+        Schedule.objects.filter(group=self.groups[0]).first().save()
+        self.assertNotEqual(self.key(self.groups[0]), before)
+
+    def test_attendance_change_only_touches_its_group(self):
+        first, second = self.key(self.groups[0]), self.key(self.groups[1])
+        attendance = Attendance.objects.filter(student__group=self.groups[0]).first()
+        attendance.status = 'Excused'
+        attendance.save()
+        self.assertNotEqual(self.key(self.groups[0]), first)
+        self.assertEqual(self.key(self.groups[1]), second)
+
+
+# ============= КЕҢИРИ ОТЧЕТ =============
+
+class AdvancedReportQueryTests(SchoolDataMixin, TestCase):
+    """Ар бир отчет түрүнүн суроо саны маалыматтын көлөмүнөн көз каранды эмес"""
+
+    # Отчет түрү боюнча суроолордун жогорку чеги
+    MAX_QUERIES = {
+        'overview': 3,
+        'student_details': 2,
+        'group_analysis': 2,
+        'subject_performance': 2,
+        'teacher_report': 2,
+        'attendance_list': 1,
+    }
+
+    def setUp(self):
+        self.subject, self.groups = self.make_school()
+
+    def params(self, report_type):
+        params = {'report_type': report_type}
+        if report_type == 'group_analysis':
+            params['group_id'] = str(self.groups[0].pk)
+        return params
+
+    def build(self, params):
+        # Генератор барактар да толук окулат - iterator() суроолору да саналат
+        return [
+            (title, headers, list(rows))
+            for title, headers, rows in advanced_report_sheets(params, date.today())
+        ]
+
+    def test_every_report_type_has_a_ceiling(self):
+        self.assertEqual(set(self.MAX_QUERIES), set(ADVANCED_REPORT_TYPES))
+
+    def test_query_ceiling_per_report_type(self):
+        for report_type in ADVANCED_REPORT_TYPES:
+            with self.subTest(report_type=report_type):
+                params = self.params(report_type)
+                small = self.count_queries(lambda: self.build(params))
+                self.assertLessEqual(small, self.MAX_QUERIES[report_type])
+
+                # Көбүрөөк группа/студент/сабак - суроо саны өзгөрбөйт
+                self.make_school(groups=3, students=4, days=4, prefix=f'{report_type}-more')
+                self.assertEqual(self.count_queries(lambda: self.build(params)), small)
+
+    def test_student_details_for_one_student(self):
+        student = Student.objects.filter(group=self.groups[0]).first()
+        params = {'report_type': 'student_details', 'student_id': str(student.pk)}
+        with self.assertNumQueries(2):
+            sheets = self.build(params)
+        self.assertEqual(len(sheets[0][2]), Attendance.objects.filter(student=student).count())
+
+
+# ============= КАТЫШУУ ТАРЫХЫ =============
+
+class AttendanceHistoryTests(SchoolDataMixin, TestCase):
+    def setUp(self):
+        self.subject, self.groups = self.make_school(groups=1, students=2, days=2)
+        self.orphan = Attendance.objects.create(
+            student=None, subject=self.subject, date=date.today(), status='Absent', student_name='Өчүрүлгөн',
+        )
+        self.admin = User.objects.create_superuser('history_admin', password='x')
+
+    def history(self, **params):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.admin.pk))
+        response = client.get('/api/v1/attendance/history/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_history_with_orphaned_row(self):
+        ids = [row['id'] for row in self.history()['results']]
+        self.assertIn(self.orphan.pk, ids)
+        self.assertEqual(len(ids), Attendance.objects.count())
+
+    def test_compact_history_with_orphaned_row(self):
+        self.assertIn(self.orphan.pk, self.history(compact='1')['ids'])
+
+    def test_compact_history_with_legacy_status(self):
+        Attendance.objects.filter(pk=self.orphan.pk).update(status='Sick')
+        data = self.history(compact='1')
+        statuses = dict(zip(data['ids'], data['status']))
+        self.assertEqual(statuses[self.orphan.pk], -1)
+        self.assertTrue(all(code >= 0 for pk, code in statuses.items() if pk != self.orphan.pk))
+
+
+# ============= PRINCIPAL КЭШИ =============
+
+@override_settings(PRINCIPAL_CACHE_TIMEOUT=300)
+class PrincipalCacheTests(SchoolDataMixin, TestCase):
+    def setUp(self):
+        self.subject, self.groups = self.make_school(groups=2, students=1, days=1)
+        self.student_row = Student.objects.get(group=self.groups[0])
+        self.student = self.make_user('principal_student', 'STUDENT', self.student_row)
+        self.parent = self.make_user('principal_parent', 'PARENT')
+        cache.clear()
+
+    def test_cached_between_requests(self):
+        principal.load(self.student.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(principal.load(self.student.pk).role, 'STUDENT')
+
+    def test_role_change_invalidates(self):
+        principal.load(self.student.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = self.student.userprofile
+            profile.role = 'TEACHER'
+            profile.save()
+        self.assertEqual(principal.load(self.student.pk).role, 'TEACHER')
+
+    def test_regroup_invalidates(self):
+        self.assertEqual(principal.load(self.student.pk).student_group_id, self.groups[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student_row.group = self.groups[1]
+            self.student_row.save()
+        self.assertEqual(principal.load(self.student.pk).student_group_id, self.groups[1].pk)
+
+    def test_children_change_invalidates(self):
+        self.assertEqual(principal.load(self.parent.pk).children_ids, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student_row.parents.add(self.parent.userprofile)
+        self.assertEqual(principal.load(self.parent.pk).children_ids, [self.student_row.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student_row.parents.remove(self.parent.userprofile)
+        self.assertEqual(principal.load(self.parent.pk).children_ids, [])
+
+    @override_settings(PRINCIPAL_CACHE_TIMEOUT=0)
+    def test_disabled_cache_reads_the_database(self):
+        # Жалпы кэш жок болгондогу демейки: башка процесстин commit'и дароо көрүнөт
+        principal.load(self.student.pk)
+        profile = self.student.userprofile
+        profile.role = 'PARENT'
+        profile.save()
+        self.assertEqual(principal.load(self.student.pk).role, 'PARENT')
+
+
+# ============= JWT =============
+
+class JwtAuthenticationTests(SchoolDataMixin, TestCase):
+    UNREAD_URL = '/api/v1/notifications/unread_count/'
+
+    def setUp(self):
+        self.subject, self.groups = self.make_school(groups=2, students=1, days=1)
+        self.student_row = Student.objects.get(group=self.groups[0])
+        self.user = self.make_user('jwt_student', 'STUDENT', self.student_row)
+        self.parent = self.make_user('jwt_parent', 'PARENT')
+        self.student_row.parents.add(self.parent.userprofile)
+        # Байланыштыруу токендерди чакыртып алды - кирүү андан кийинки секундда болгондой
+        TokenRevocation.objects.update(revoked_at=timezone.now() - timedelta(seconds=5))
+        unread_counter.get_count(self.user.pk)
+        cache.clear()
+
+    def login(self, user):
+        """Кирүү - токен иштейт"""
+        response = self.client.post('/api/auth/login/', {'username': user.username, 'password': 'x'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.get(response.json()['access']).status_code, 200)
+        return response.json()
+
+    def get(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client.get(self.UNREAD_URL)
+
+    def assert_rejected(self, access, code):
+        response = self.get(access)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], code)
+
+    def test_login_token_carries_claims(self):
+        tokens = self.login(self.user)
+        claims = AccessToken(tokens['access'])
+        self.assertEqual(
+            (claims['role'], claims['student_id'], claims['group_id']),
+            ('STUDENT', self.student_row.pk, self.groups[0].pk),
+        )
+        self.assertEqual(tokens['user']['student_id'], self.student_row.pk)
+        # User жүктөлбөйт: чакыртып алуу абалы жана окулбагандардын эсептегичи
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get(tokens['access']).status_code, 200)
+
+    def test_refresh_reads_current_claims(self):
+        tokens = self.login(self.user)
+        self.student_row.group = self.groups[1]
+        self.student_row.save()
+        response = self.client.post('/api/auth/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        access = response.json()['access']
+        self.assertEqual(AccessToken(access)['group_id'], self.groups[1].pk)
+        # Чакыртып алуудан кийинки секундда берилген токен
+        TokenRevocation.objects.update(revoked_at=timezone.now() - timedelta(seconds=5))
+        self.assertEqual(self.get(access).status_code, 200)
+
+    def test_role_change_revokes_in_the_database(self):
+        access = self.login(self.user)['access']
+        profile = self.user.userprofile
+        profile.role = 'TEACHER'
+        profile.save()
+        # Кэш тазаланса да (башка процесс, кайра жүргүзүү) - маалымат базасынан
+        cache.clear()
+        self.assert_rejected(access, 'token_revoked')
+        self.assertTrue(TokenRevocation.objects.filter(user_id=self.user.pk).exists())
+
+    def test_deactivated_user_is_rejected(self):
+        access = self.login(self.user)['access']
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assert_rejected(access, 'user_inactive')
+
+    def test_regroup_revokes_student_and_parents(self):
+        student_access = self.login(self.user)['access']
+        parent_access = self.login(self.parent)['access']
+        self.student_row.group = self.groups[1]
+        self.student_row.save()
+        self.assert_rejected(student_access, 'token_revoked')
+        self.assert_rejected(parent_access, 'token_revoked')
+
+    def test_deleted_user_is_rejected(self):
+        access = self.login(self.user)['access']
+        self.user.delete()
+        self.assert_rejected(access, 'user_not_found')
+
+    @override_settings(SHARED_CACHE=True)
+    def test_shared_cache_state_is_dropped_on_revoke(self):
+        access = self.login(self.user)['access']
+        self.assertIsNotNone(cache.get(TOKEN_STATE_KEY.format(user_id=self.user.pk)))
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = self.user.userprofile
+            profile.role = 'PARENT'
+            profile.save()
+        self.assert_rejected(access, 'token_revoked')
+
+
+# ============= ОКУЛБАГАН БИЛДИРМЕЛЕР =============
+
+@override_settings(PRINCIPAL_CACHE_TIMEOUT=0)
+class UnreadCounterTests(SchoolDataMixin, TestCase):
+    """Эсептегич = окулбаган жеке + окулбаган жалпы билдирмелер"""
+
+    def setUp(self):
+        self.subject, self.groups = self.make_school(groups=2, students=2, days=1)
+        first, second = Student.objects.filter(group=self.groups[0])[:2]
+        other = Student.objects.filter(group=self.groups[1]).first()
+        self.student = self.make_user('unread_student', 'STUDENT', first)
+        self.classmate = self.make_user('unread_classmate', 'STUDENT', second)
+        self.other = self.make_user('unread_other', 'STUDENT', other)
+        self.parent = self.make_user('unread_parent', 'PARENT')
+        first.parents.add(self.parent.userprofile)
+        self.admin = User.objects.create_superuser('unread_admin', password='x')
+        self.users = [self.student, self.classmate, self.other, self.parent, self.admin]
+        Notification.objects.create(recipient=self.student, title='Жеке', message='...')
+        # Эсептегичтин саптары түзүлөт
+        self.counts()
+
+    def counts(self):
+        return {user.username: unread_counter.get_count(user.pk) for user in self.users}
+
+    def exact(self):
+        counts = {}
+        for user in self.users:
+            user = User.objects.get(pk=user.pk)
+            direct = Notification.objects.filter(recipient=user, is_read=False).count()
+            counts[user.username] = direct + broadcasts.unread_count(sync.user_scope(user))
+        return counts
+
+    def scope(self, user):
+        return sync.user_scope(User.objects.get(pk=user.pk))
+
+    def test_counter_follows_send_read_dismiss_and_delete(self):
+        before = self.counts()
+        group_news = broadcasts.send(self.admin, 'Группа', '...', role='STUDENT', group=self.groups[0])
+        everyone = broadcasts.send(self.admin, 'Баарына', '...')
+        after_send = self.counts()
+        self.assertEqual(after_send, self.exact())
+        self.assertEqual(after_send['unread_student'], before['unread_student'] + 2)
+        self.assertEqual(after_send['unread_other'], before['unread_other'] + 1)
+
+        self.assertEqual(broadcasts.mark_all_read(self.scope(self.student)), 2)
+        self.assertEqual(broadcasts.mark_all_read(self.scope(self.student)), 0)
+        broadcasts.dismiss(self.parent.pk, everyone)
+        broadcasts.dismiss(self.classmate.pk, group_news)
+        self.assertEqual(self.counts(), self.exact())
+
+        everyone.delete()
+        group_news.delete()
+        self.assertEqual(self.counts(), self.exact())
+        self.assertEqual(self.counts(), before)
+
+    def test_mark_read_returns_inserted_rows_only(self):
+        first = broadcasts.send(self.admin, 'Биринчи', '...')
+        second = broadcasts.send(self.admin, 'Экинчи', '...')
+        BroadcastReceipt.objects.create(broadcast=first, user=self.student)
+        # is_read аннотациясы жок объекттер - биринчиси мурда эле окулган
+        self.assertEqual(broadcasts.mark_read(self.student.pk, [first, second]), 1)
+
+    def test_audience_change_recounts(self):
+        broadcasts.send(self.admin, 'Группа', '...', role='STUDENT', group=self.groups[0])
+        student = Student.objects.get(user=self.student)
+        student.group = self.groups[1]
+        student.save()
+        self.assertEqual(self.counts(), self.exact())
+
+        profile = self.other.userprofile
+        profile.role = 'PARENT'
+        profile.save()
+        Student.objects.get(user=self.classmate).parents.add(self.other.userprofile)
+        self.assertEqual(self.counts(), self.exact())
+
+    def test_unread_total_is_one_read(self):
+        for index in range(5):
+            broadcasts.send(self.admin, f'Билдирме {index}', '...')
+        scope = self.scope(self.student)
+        with self.assertNumQueries(1):
+            total = broadcasts.unread_total(scope)
+        self.assertEqual(total, self.exact()['unread_student'])
+
+
+# ============= КЕЛБЕГЕНДИК ЭСКЕРТҮҮЛӨРҮ =============
+
+class AbsenceAlertTests(SchoolDataMixin, TestCase):
+    def setUp(self):
+        self.make_school(groups=1, students=2, days=1)
+        self.student = Student.objects.first()
+        today = date.today()
+        for day in range(3):
+            Attendance.objects.update_or_create(
+                student=self.student, subject=None, date=today - timedelta(days=day + 1),
+                defaults={'status': 'Absent'},
+            )
+        # Өчүрүлгөн студенттердин келбегендери
+        for day in range(4):
+            Attendance.objects.create(student=None, date=today - timedelta(days=day), status='Absent')
+
+    def test_rows_without_student_are_ignored(self):
+        report = check_excessive_absences(days=10, threshold=3)
+        self.assertEqual((report['flagged'], report['alerted']), (1, 1))
+        self.assertEqual(list(AbsenceAlert.objects.values_list('student_id', flat=True)), [self.student.pk])
+        # Кайра иштетүү - жаңы эскертүү жок
+        self.assertEqual(check_excessive_absences(days=10, threshold=3)['alerted'], 0)
+
+
+# ============= КҮНДҮК ЖЫЙЫНТЫК =============
+
+class RollupConsistencyTests(SchoolDataMixin, TestCase):
+    """Жыйынтык ар дайым rebuild_rollup() менен бирдей болушу керек"""
+
+    def setUp(self):
+        self.subject, self.groups = self.make_school(groups=3, students=4, days=5)
+        # NULL ачкычтуу жолдор алдын ала бар: группасыз студент жана сабаксыз катышуу
+        today = date.today()
+        orphan = Student.objects.create(name='Группасыз')
+        Attendance.objects.create(student=orphan, subject=self.subject, date=today, status='Present')
+        student = Student.objects.filter(group=self.groups[0]).first()
+        Attendance.objects.create(student=student, subject=None, date=today, status='Present')
+
+    def snapshot(self):
+        return sorted(
+            (row.date, row.group_id or 0, row.subject_id or 0, row.status, row.count)
+            for row in DailyAttendanceRollup.objects.exclude(count=0)
+        )
+
+    def assert_rollup_matches_rebuild(self):
+        incremental = self.snapshot()
+        rebuild_rollup()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(get_unified_statistics()['total_records'], Attendance.objects.count())
+
+    def test_subject_delete(self):
+        self.subject.delete()
+        self.assertEqual(Attendance.objects.filter(subject__isnull=True).count(), Attendance.objects.count())
+        self.assert_rollup_matches_rebuild()
+
+    def test_group_delete(self):
+        self.groups[0].delete()
+        self.assert_rollup_matches_rebuild()
+
+    def test_student_delete(self):
+        Student.objects.filter(group=self.groups[1]).first().delete()
+        self.assert_rollup_matches_rebuild()
+
+    def test_student_regroup(self):
+        student = Student.objects.filter(group=self.groups[0]).first()
+        student.group = self.groups[1]
+        student.save()
+        self.assert_rollup_matches_rebuild()
+
+    def test_bulk_edits_after_regroup(self):
+        student = Student.objects.filter(group=self.groups[0]).first()
+        student.group = self.groups[1]
+        student.save()
+
+        # API'нин bulk жолу (AttendanceViewSet.bulk)
+        rows = Attendance.objects.filter(student=student)
+        result = bulk_mark_attendance([
+            {'student_id': student.id, 'subject_id': row.subject_id, 'date': row.date.isoformat(), 'status': 'Late'}
+            for row in rows
+        ], user=None)
+        self.assertEqual(result['updated'], rows.count())
+        self.assert_rollup_matches_rebuild()
+
+        # Расписаниедеги топтоп өзгөртүү
+        admin = User.objects.create_superuser('rollup_admin', password='x')
+        self.client.force_login(admin)
+        response = self.client.post(
+            '/ky/api/attendance/bulk-edit/',
+            json.dumps({'attendance_ids': list(rows.values_list('id', flat=True)), 'new_status': 'Excused'}),
+            content_type='application/json',
+        )
+        self.assertTrue(response.json()['success'], response.json())
+        self.assertEqual(rows.filter(status='Excused').count(), rows.count())
+        self.assert_rollup_matches_rebuild()
+
+    def test_null_keyed_buckets_are_unique(self):
+        day = date.today()
+        DailyAttendanceRollup.objects.create(date=day, group=None, subject=None, status='Present', count=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyAttendanceRollup.objects.create(date=day, group=None, subject=None, status='Present', count=1)
+
+
+# ============= ОТЧЕТ ЖУМУШТАРЫ =============
+
+class ReportJobQueueTests(TestCase):
+    STALE_AFTER = 1800
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        user = User.objects.create_user('jobs_user', password='x')
+        self.job = ReportJob.objects.create(kind='advanced_report', created_by=user)
+        self.long_ago = timezone.now() - timedelta(seconds=self.STALE_AFTER * 2)
+
+    def test_running_job_with_recent_heartbeat_is_not_requeued(self):
+        claim_next_job('worker-a')
+        ReportJob.objects.filter(pk=self.job.pk).update(started_at=self.long_ago)
+        self.assertEqual(requeue_stale_jobs(self.STALE_AFTER), (0, 0))
+        self.assertEqual(ReportJob.objects.get(pk=self.job.pk).status, 'RUNNING')
+
+    def test_job_without_heartbeat_is_requeued(self):
+        claim_next_job('worker-a')
+        ReportJob.objects.filter(pk=self.job.pk).update(heartbeat_at=self.long_ago)
+        self.assertEqual(requeue_stale_jobs(self.STALE_AFTER), (1, 0))
+        job = ReportJob.objects.get(pk=self.job.pk)
+        self.assertEqual((job.status, job.claim_token), ('PENDING', ''))
+
+    def test_progress_refreshes_heartbeat(self):
+        job = claim_next_job('worker-a')
+        ReportJob.objects.filter(pk=job.pk).update(heartbeat_at=self.long_ago)
+        ProgressReporter(job)(5, 10)
+        job.refresh_from_db()
+        self.assertEqual(job.progress, 50)
+        self.assertGreater(job.heartbeat_at, self.long_ago)
+
+    def requeue_and_run_second(self, job):
+        """Биринчи worker иштеп жатканда жумуш кайра кезекке коюлуп, экинчи worker аткарат"""
+        ReportJob.objects.filter(pk=job.pk).update(heartbeat_at=self.long_ago)
+        requeue_stale_jobs(self.STALE_AFTER)
+        second = claim_next_job('worker-b')
+        self.assertEqual(run_job(second).status, 'DONE')
+        return second
+
+    def test_requeued_worker_does_not_overwrite_second_result(self):
+        def handler(job, fileobj, progress):
+            if job.worker == 'worker-a':
+                self.requeue_and_run_second(job)
+            fileobj.write(job.worker.encode())
+            return 'report.xlsx'
+
+        with mock.patch.dict(JOB_HANDLERS, {'advanced_report': handler}):
+            result = run_job(claim_next_job('worker-a'))
+
+        self.assertEqual((result.status, result.worker), ('DONE', 'worker-b'))
+        with result.file.open('rb') as stored:
+            self.assertEqual(stored.read(), b'worker-b')
+
+    def test_requeued_worker_does_not_mark_failed(self):
+        def handler(job, fileobj, progress):
+            if job.worker == 'worker-a':
+                self.requeue_and_run_second(job)
+                raise ValueError('first run failed')
+            return 'report.xlsx'
+
+        with mock.patch.dict(JOB_HANDLERS, {'advanced_report': handler}):
+            result = run_job(claim_next_job('worker-a'))
+
+        self.assertEqual((result.status, result.message), ('DONE', ''))
+
+    def test_progress_after_requeue_stops_the_run(self):
+        job = claim_next_job('worker-a')
+        ReportJob.objects.filter(pk=job.pk).update(heartbeat_at=self.long_ago)
+        requeue_stale_jobs(self.STALE_AFTER)
+        with self.assertRaises(JobLost):
+            ProgressReporter(job)(5, 10)
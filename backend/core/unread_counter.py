@@ -0,0 +1,129 @@
+"""
+Окулбаган билдирмелердин денормалдаштырылган эсептегичтери
+Шаблондор (context processor), API жана билдирмелердин агымы санды Notification жана
+BroadcastNotification таблицаларынан эсептебей, UnreadNotificationCounter'дин бир сабынан окушат.
+Сан = окулбаган жеке билдирмелер + окулбаган жалпы билдирмелер (core.broadcasts).
+- Сигналдар: түзүү, save() менен окуу/өзгөртүү, өчүрүү - ошол эле транзакцияда
+- Сигналсыз жазуулар (bulk_create, update) adjust()'ту түздөн-түз чакырат
+- Жалпы билдирме: жөнөтүүдө/өчүрүүдө аудиториянын саптары adjust_users() менен
+- Колдонуучунун аудиториясы (ролу, группасы, балдары) өзгөрсө сабы өчүрүлөт (forget)
+- Сабы жок колдонуучунун саны биринчи окууда так эсептелип түзүлөт
+- Четтөөлөр (сигналсыз жазуу унутулса, параллелдүү түзүү): manage.py reconcile_unread_counters
+"""
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification, UnreadNotificationCounter
+
+RECONCILE_BATCH_SIZE = 500
+
+
+def adjust(deltas):
+    """
+    {user_id: өзгөрүү} - учурдагы транзакцияда, бирдей өзгөрүүлөр бир UPDATE менен
+    Сабы жок колдонуучулар өткөрүлөт: алардын саны окулганда так эсептелет
+    """
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if user_id and delta:
+            by_delta[delta].append(user_id)
+    now = timezone.now()
+    for delta, user_ids in by_delta.items():
+        UnreadNotificationCounter.objects.filter(user_id__in=user_ids).update(
+            count=Greatest(F('count') + delta, Value(0)), updated_at=now,
+        )
+
+
+def adjust_users(user_ids, delta):
+    """Колдонуучулардын (тизме же pk subquery) эсептегичтерине бирдей өзгөрүү - бир UPDATE"""
+    UnreadNotificationCounter.objects.filter(user_id__in=user_ids).update(
+        count=Greatest(F('count') + delta, Value(0)), updated_at=timezone.now(),
+    )
+
+
+def forget(user_ids):
+    """Сабын өчүрүү - кийинки окууда так эсептелет (жалпы билдирмелердин аудиториясы өзгөргөндө)"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        UnreadNotificationCounter.objects.filter(user_id__in=user_ids).delete()
+
+
+def notifications_created(notifications):
+    """bulk_create менен түзүлгөн билдирмелер - окулбагандары алуучуларынын санына кошулат"""
+    adjust(Counter(n.recipient_id for n in notifications if not n.is_read))
+
+
+def notifications_read(user_id, count):
+    """Колдонуучунун count билдирмеси UPDATE менен окулду деп белгиленди"""
+    adjust({user_id: -count})
+
+
+def _actual_counts(user_ids):
+    """Так сандар: жеке билдирмелер бир GROUP BY менен, жалпылары колдонуучу боюнча"""
+    from .broadcasts import unread_counts
+
+    rows = (
+        Notification.objects.filter(recipient_id__in=user_ids, is_read=False)
+        .order_by().values('recipient_id').annotate(total=Count('id'))
+        .values_list('recipient_id', 'total')
+    )
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(rows)
+    for user_id, count in unread_counts(user_ids).items():
+        counts[user_id] += count
+    return counts
+
+
+def get_count(user_id):
+    """Окулбагандардын саны - бир сап окуу"""
+    count = UnreadNotificationCounter.objects.filter(user_id=user_id).values_list('count', flat=True).first()
+    if count is None:
+        count = _actual_counts([user_id])[user_id]
+        UnreadNotificationCounter.objects.bulk_create(
+            [UnreadNotificationCounter(user_id=user_id, count=count)], ignore_conflicts=True,
+        )
+    return count
+
+
+def reconcile(batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Бардык колдонуучулардын эсептегичтерин чыныгы санга теңөө, batch_size колдонуучудан
+    Ар бир топ өз транзакциясында: эсептегичтер кулпуланып, андан кийин саналат -
+    параллелдүү билдирмелер кулпу бошогондон кийин өз өзгөрүүсүн туура кошот
+    Натыйжа: {'checked', 'fixed', 'created'}
+    """
+    stats = {'checked': 0, 'fixed': 0, 'created': 0}
+    last_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return stats
+        last_id = user_ids[-1]
+
+        with transaction.atomic():
+            stored = dict(
+                UnreadNotificationCounter.objects.select_for_update()
+                .filter(user_id__in=user_ids).values_list('user_id', 'count')
+            )
+            actual = _actual_counts(user_ids)
+            now = timezone.now()
+            for user_id, count in stored.items():
+                if count != actual[user_id]:
+                    UnreadNotificationCounter.objects.filter(user_id=user_id).update(
+                        count=actual[user_id], updated_at=now,
+                    )
+                    stats['fixed'] += 1
+            missing = [
+                UnreadNotificationCounter(user_id=user_id, count=actual[user_id])
+                for user_id in user_ids if user_id not in stored
+            ]
+            UnreadNotificationCounter.objects.bulk_create(missing, ignore_conflicts=True)
+            stats['created'] += len(missing)
+        stats['checked'] += len(user_ids)
@@ -3,20 +3,29 @@ from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import login, authenticate, logout as auth_logout
 from django.contrib.auth.forms import UserCreationForm
+from django.db import transaction
 from django.db.models import Q, Count
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.utils.translation import gettext as _
 from .models import UserProfile, Student, Teacher, Course, Group, Attendance, Notification, Subject, Schedule, LeaveRequest, TimeSlot
+from .exports import excel_file_response, write_detailed_excel, write_detailed_pdf, write_simple_excel
+from .report_jobs import submit_job
+from .principal import for_user, get_principal
+from .reports import advanced_report_filter, advanced_report_period, attendance_rate, report_period
+from .statistics import EMPTY_COUNTS, get_daily_status_counts, get_group_status_counts, get_status_breakdown, get_status_counts
+from . import absence_alerts, broadcasts, sync, unread_counter
 from .forms import StudentRegistrationForm, NotificationForm, LeaveRequestForm, UserProfileForm, UserUpdateForm, PasswordChangeCustomForm
 from reportlab.pdfgen import canvas
-from openpyxl import Workbook
 from datetime import datetime, date, timedelta
 from dal import autocomplete
 from django import forms
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 # ============= NOTIFICATION HELPER FUNCTIONS =============
 
@@ -33,51 +42,8 @@ def create_notification(recipient, notification_type, title, message, sender=Non
     )
 
 def check_excessive_absences():
-    """Көп жолу келбеген студенттер үчүн билдирмелер жөнөтүү"""
-    from collections import defaultdict
-    
-    # Соңку 10 күндө 3 жолудан көп келбеген студенттерди тапуу
-    last_10_days = date.today() - timedelta(days=10)
-    
-    student_absences = defaultdict(int)
-    recent_absences = Attendance.objects.filter(
-        date__gte=last_10_days,
-        status='Absent'
-    )
-    
-    for absence in recent_absences:
-        student_absences[absence.student] += 1
-    
-    # 3тен көп жок болгон студенттер үчүн билдирме
-    for student, absence_count in student_absences.items():
-        if absence_count >= 3:
-            # Ошол студенттин ата-энелерине билдирме жөнөтүү
-            parent_profiles = student.parents.all()
-            for parent_profile in parent_profiles:
-                create_notification(
-                    recipient=parent_profile.user,
-                    notification_type='ABSENCE',
-                    title=f'⚠️ {student.name} көп жолу келбеди',
-                    message=f'Сиздин балаңыз {student.name} соңку 10 күн ичинде {absence_count} жолу сабактан келген жок. Анын себебин аныктап, зарыл чараларды көрүүгө өтүнөбүз.',
-                    student=student
-                )
-            
-            # Класс жетекчисине да билдирме
-            if student.group:
-                # Студенттин группасы менен иштеген мугалимдерди тапуу
-                group_teachers = Teacher.objects.filter(
-                    subject__schedule__group=student.group
-                ).distinct()
-                
-                for teacher in group_teachers:
-                    if teacher.user:
-                        create_notification(
-                            recipient=teacher.user,
-                            notification_type='ABSENCE',
-                            title=f'⚠️ {student.name} көп жолу келбеди',
-                            message=f'Студент {student.name} ({student.group.name}) соңку 10 күн ичинде {absence_count} жолу сабактан келген жок.',
-                            student=student
-                        )
+    """Көп жолу келбеген студенттер үчүн билдирмелер жөнөтүү (core.absence_alerts)"""
+    return absence_alerts.check_excessive_absences()
 
 def send_leave_request_notification(leave_request):
     """Бошотуу сурамы жөнөтүлгөндө билдирме"""
@@ -128,11 +94,11 @@ def send_leave_decision_notification(leave_request, approved_by):
 
 @login_required
 def mark_schedule_attendance(request, group_id, period):
-    try:
-        if request.user.userprofile.role != 'TEACHER':
-            return JsonResponse({'error': 'Бул функция мугалимдер үчүн гана.'}, status=403)
-    except:
+    principal = get_principal(request)
+    if not principal.has_profile:
         return JsonResponse({'error': 'Колдонуучу профили табылган жок.'}, status=403)
+    if principal.role != 'TEACHER':
+        return JsonResponse({'error': 'Бул функция мугалимдер үчүн гана.'}, status=403)
     
     group = get_object_or_404(Group, id=group_id)
     students = Student.objects.filter(group=group)
@@ -155,11 +121,11 @@ def mark_schedule_attendance(request, group_id, period):
 @csrf_exempt
 @login_required
 def submit_schedule_attendance(request):
-    try:
-        if request.user.userprofile.role != 'TEACHER':
-            return JsonResponse({'error': 'Бул функция мугалимдер үчүн гана.'}, status=403)
-    except:
+    principal = get_principal(request)
+    if not principal.has_profile:
         return JsonResponse({'error': 'Колдонуучу профили табылган жок.'}, status=403)
+    if principal.role != 'TEACHER':
+        return JsonResponse({'error': 'Бул функция мугалимдер үчүн гана.'}, status=403)
     
     if request.method == 'POST':
         for key, value in request.POST.items():
@@ -209,22 +175,13 @@ class UserProfileAutocomplete(autocomplete.Select2QuerySetView):
 
 # Ролдорду текшерүү
 def is_admin_or_manager(user):
-    try:
-        return user.userprofile.role in ['ADMIN', 'MANAGER']
-    except:
-        return False
+    return for_user(user).is_admin
 
 def is_teacher(user):
-    try:
-        return user.userprofile.role == 'TEACHER'
-    except:
-        return False
+    return for_user(user).role == 'TEACHER'
 
 def is_admin_manager_or_teacher(user):
-    try:
-        return user.userprofile.role in ['ADMIN', 'MANAGER', 'TEACHER']
-    except:
-        return False
+    return for_user(user).role in ['ADMIN', 'MANAGER', 'TEACHER']
 
 # View'дор
 def home(request):
@@ -284,10 +241,9 @@ import json
 @csrf_exempt
 def user_login(request):
     if request.method == 'POST':
-        # CSRF debug маалыматы
-        print(f"POST request from user: {request.user}")
-        print(f"CSRF cookie: {request.META.get('CSRF_COOKIE')}")
-        print(f"POST CSRF token: {request.POST.get('csrfmiddlewaretoken')}")
+        # CSRF debug маалыматы (токендин өзү логго жазылбайт)
+        logger.debug("user_login POST: csrf_cookie=%s, csrf_token=%s",
+                     bool(request.META.get('CSRF_COOKIE')), bool(request.POST.get('csrfmiddlewaretoken')))
         
         username = request.POST['username']
         password = request.POST['password']
@@ -355,16 +311,16 @@ def dashboard(request):
     from datetime import datetime, timedelta
     from .statistics import get_unified_statistics
     
-    print(f"Dashboard view called for user: {request.user}")
+    logger.debug("Dashboard view called for user: %s", request.user)
     
     try:
         profile, created = UserProfile.objects.get_or_create(user=request.user, defaults={'role': 'STUDENT'})
         if created:
             messages.info(request, _('Your profile has been automatically created (STUDENT role).'))
         role = profile.role
-        print(f"User role: {role}")
+        logger.debug("User role: %s", role)
     except Exception as e:
-        print(f"Error getting user profile: {e}")
+        logger.exception("Error getting user profile")
         return HttpResponse(f"Error: {e}", status=500)
     
     # Бүгүнкү дата
@@ -583,25 +539,17 @@ def dashboard(request):
             messages.error(request, _('Your child profile is not linked. Please contact administrator.'))
             context.update({'message': 'Баланын маалыматы жок'})
 
-    print(f"Dashboard context keys: {list(context.keys())}")
-    print(f"Rendering dashboard.html template")
-    
-    # Context маалыматтарын толук чыгаралы  
-    print(f"Student object: {context.get('student_obj')}")
-    if 'student_obj' in context and context['student_obj']:
-        student = context['student_obj']
-        print(f"Student details: name={student.name}, group={student.group}")
-        if hasattr(student, 'group') and student.group:
-            print(f"Group details: {student.group.name}")
+    if logger.isEnabledFor(logging.DEBUG):
+        # Context маалыматтарын толук чыгаралы (student.group кошумча суроо - debug каналында гана)
+        logger.debug("Dashboard context keys: %s", list(context.keys()))
+        student = context.get('student_obj')
+        if student:
+            logger.debug("Student details: name=%s, group=%s", student.name, student.group)
     
     try:
-        response = render(request, 'dashboard.html', context)
-        print(f"Template rendered successfully, content length: {len(response.content)}")
-        return response
+        return render(request, 'dashboard.html', context)
     except Exception as e:
-        print(f"Template rendering error: {e}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Template rendering error")
         return HttpResponse(f"Template error: {e}", status=500)
 
 
@@ -788,12 +736,12 @@ def modern_dashboard(request):
 
 @login_required
 def send_notification(request):
-    try:
-        if request.user.userprofile.role != 'TEACHER':
-            messages.error(request, _('This function is for teachers only.'))
-            return redirect('dashboard')
-    except:
+    principal = get_principal(request)
+    if not principal.has_profile:
         messages.error(request, _('User profile not found.'))
+    if principal.role != 'TEACHER':
+        messages.error(request, _('This function is for teachers only.'))
+        return redirect('dashboard')
         return redirect('dashboard')
     
     teacher = Teacher.objects.get(user=request.user)
@@ -955,7 +903,7 @@ def student_schedule(request):
         linked_students = user_profile.parent_profiles.all()
         if linked_students.exists():
             student = linked_students.first()  # Биринчи балды алуу
-            print(f"DEBUG: Parent {user_profile.user.username} viewing schedule for student {student.name}")
+            logger.debug("Parent %s viewing schedule for student %s", user_profile.user.username, student.name)
         else:
             messages.error(request, 'Сизге эч кандай студент байланышкан эмес.')
             return redirect('dashboard')
@@ -1066,12 +1014,12 @@ from datetime import date
 @login_required
 def teacher_schedule(request):
     """Мугалимдин расписаниесин көрүү жана жоктоо белгилөө"""
-    try:
-        if request.user.userprofile.role != 'TEACHER':
-            messages.error(request, _('This function is for teachers only.'))
-            return redirect('dashboard')
-    except:
+    principal = get_principal(request)
+    if not principal.has_profile:
         messages.error(request, _('User profile not found.'))
+    if principal.role != 'TEACHER':
+        messages.error(request, _('This function is for teachers only.'))
+        return redirect('dashboard')
         return redirect('dashboard')
     
     try:
@@ -1137,12 +1085,12 @@ def teacher_schedule(request):
 @login_required
 def teacher_attendance(request):
     """Мугалим үчүн жеке жоктоо системасы"""
-    try:
-        if request.user.userprofile.role != 'TEACHER':
-            messages.error(request, _('This function is for teachers only.'))
-            return redirect('dashboard')
-    except:
+    principal = get_principal(request)
+    if not principal.has_profile:
         messages.error(request, _('User profile not found.'))
+    if principal.role != 'TEACHER':
+        messages.error(request, _('This function is for teachers only.'))
+        return redirect('dashboard')
         return redirect('dashboard')
     
     try:
@@ -1158,27 +1106,29 @@ def teacher_attendance(request):
             schedule = get_object_or_404(Schedule, id=schedule_id, subject__teacher=teacher)
             
             saved_count = 0
-            for key, value in request.POST.items():
-                if key.startswith('status_') and value:
-                    try:
-                        student_id = key.replace('status_', '')
-                        student = get_object_or_404(Student, id=student_id, group=schedule.group)
+            # Бир транзакция: катышпагандар тууралуу бир билдирме commit'тен кийин
+            with transaction.atomic():
+                for key, value in request.POST.items():
+                    if key.startswith('status_') and value:
+                        try:
+                            student_id = key.replace('status_', '')
+                            student = get_object_or_404(Student, id=student_id, group=schedule.group)
                         
-                        # Attendance сактоо
-                        attendance, created = Attendance.objects.update_or_create(
-                            student=student,
-                            subject=schedule.subject,
-                            schedule=schedule,
-                            date=date.today(),
-                            defaults={
-                                'status': value, 
-                                'created_by': request.user
-                            }
-                        )
-                        saved_count += 1
+                            # Attendance сактоо
+                            attendance, created = Attendance.objects.update_or_create(
+                                student=student,
+                                subject=schedule.subject,
+                                schedule=schedule,
+                                date=date.today(),
+                                defaults={
+                                    'status': value, 
+                                    'created_by': request.user
+                                }
+                            )
+                            saved_count += 1
                         
-                    except (Student.DoesNotExist, ValueError):
-                        continue
+                        except (Student.DoesNotExist, ValueError):
+                            continue
             
             if saved_count > 0:
                 messages.success(request, _('Attendance marked for {} students.').format(saved_count))
@@ -1212,28 +1162,29 @@ def teacher_attendance(request):
     return render(request, 'teacher_attendance.html', context)
 @login_required
 def mark_attendance(request, subject_id):
-    try:
-        if request.user.userprofile.role not in ['TEACHER', 'ADMIN', 'MANAGER']:
-            messages.error(request, _('This function is for teachers or administrators only.'))
-            return redirect('dashboard')
-    except:
+    principal = get_principal(request)
+    if not principal.has_profile:
         messages.error(request, _('User profile not found.'))
+    if principal.role not in ['TEACHER', 'ADMIN', 'MANAGER']:
+        messages.error(request, _('This function is for teachers or administrators only.'))
+        return redirect('dashboard')
         return redirect('dashboard')
     
     subject = get_object_or_404(Subject, id=subject_id)
     students = Student.objects.filter(group=subject.course.group_set.first())
     
     if request.method == 'POST':
-        for student in students:
-            status = request.POST.get(f'status_{student.id}')
-            if status:
-                Attendance.objects.create(
-                    student=student,
-                    subject=subject,
-                    date=date.today(),
-                    status=status,
-                    created_by=request.user
-                )
+        with transaction.atomic():
+            for student in students:
+                status = request.POST.get(f'status_{student.id}')
+                if status:
+                    Attendance.objects.create(
+                        student=student,
+                        subject=subject,
+                        date=date.today(),
+                        status=status,
+                        created_by=request.user
+                    )
         messages.success(request, 'Катышуу белгиленди.')
         return redirect('schedule')  # Бул жерде багыттоо туура эмес, анткени 'schedule' жок. 'dashboard' же 'teacher_schedule' колдонуңуз.
     
@@ -1242,12 +1193,12 @@ def mark_attendance(request, subject_id):
 
 @login_required
 def mark_group_attendance(request, schedule_id):
-    try:
-        if request.user.userprofile.role != 'TEACHER':
-            messages.error(request, 'Бул функция мугалимдер үчүн гана.')
-            return redirect('dashboard')
-    except:
+    principal = get_principal(request)
+    if not principal.has_profile:
         messages.error(request, 'Колдонуучу профили табылган жок.')
+    if principal.role != 'TEACHER':
+        messages.error(request, 'Бул функция мугалимдер үчүн гана.')
+        return redirect('dashboard')
         return redirect('dashboard')
     
     from datetime import date
@@ -1279,22 +1230,23 @@ def mark_group_attendance(request, schedule_id):
             students_with_leave[student.id] = {'has_leave': False}
     
     if request.method == 'POST':
-        for student in students:
-            status = request.POST.get(f'status_{student.id}')
-            if status:
-                attendance, created = Attendance.objects.update_or_create(
-                    student=student,
-                    subject=schedule.subject,
-                    schedule=schedule,
-                    date=date.today(),
-                    defaults={
-                        'status': status, 
-                        'created_by': request.user,
-                        'student_name': student.name,
-                        'subject_name': schedule.subject.subject_name,
-                        'is_active': True
-                    }
-                )
+        with transaction.atomic():
+            for student in students:
+                status = request.POST.get(f'status_{student.id}')
+                if status:
+                    attendance, created = Attendance.objects.update_or_create(
+                        student=student,
+                        subject=schedule.subject,
+                        schedule=schedule,
+                        date=date.today(),
+                        defaults={
+                            'status': status, 
+                            'created_by': request.user,
+                            'student_name': student.name,
+                            'subject_name': schedule.subject.subject_name,
+                            'is_active': True
+                        }
+                    )
         messages.success(request, 'Катышуу белгиленди.')
         return redirect('teacher_schedule')
     
@@ -1310,7 +1262,6 @@ def mark_group_attendance(request, schedule_id):
 @user_passes_test(is_admin_or_manager)
 def report(request):
     from django.utils import timezone
-    from datetime import datetime, timedelta
     from .statistics import get_unified_statistics
     import json
     
@@ -1321,34 +1272,23 @@ def report(request):
     student_id = request.GET.get('student')
     group_id = request.GET.get('group')
     
-    # Дата өзгөртүү
-    parsed_start_date = None
-    parsed_end_date = None
-    
-    if start_date:
-        try:
-            parsed_start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        except ValueError:
-            parsed_start_date = None
+    # Дата өзгөртүү жана быстрые фильтры (daily/weekly/monthly)
+    today = timezone.now().date()
+    parsed_start_date, parsed_end_date = report_period(report_type, start_date, end_date, today)
     
-    if end_date:
+    # Фондук экспорт: чоң мезгилдер үчүн файл worker'де даярдалат,
+    # клиент абалын /api/v1/report-jobs/<id>/ аркылуу текшерет
+    format_type = request.POST.get('format') if request.method == 'POST' else None
+    if format_type in ('pdf', 'excel') and request.POST.get('background'):
         try:
-            parsed_end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-        except ValueError:
-            parsed_end_date = None
-    
-    # Быстрые фильтры
-    today = timezone.now().date()
-    if report_type == 'daily':
-        parsed_start_date = parsed_end_date = today
-    elif report_type == 'weekly':
-        week_start = today - timedelta(days=today.weekday())
-        parsed_start_date = week_start
-        parsed_end_date = today
-    elif report_type == 'monthly':
-        month_start = today.replace(day=1)
-        parsed_start_date = month_start
-        parsed_end_date = today
+            job = submit_job(request.user, f'attendance_{format_type}', request.GET)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        return JsonResponse({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/v1/report-jobs/{job.id}/',
+        }, status=202)
     
     # Биргелешкен статистика функциясын колдонуу
     stats = get_unified_statistics(
@@ -1416,126 +1356,15 @@ def export_detailed_pdf(attendances, stats):
     """Детальный PDF отчет с статистикой"""
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="detailed_attendance_report.pdf"'
-    
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.pdfbase import pdfutils
-    from reportlab.lib.units import inch
-    
-    doc = SimpleDocTemplate(response, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center
-    )
-    elements.append(Paragraph("Катышуу Системасы - Детальный Отчет", title_style))
-    elements.append(Spacer(1, 20))
-    
-    # Statistics Summary
-    summary_data = [
-        ['Жалпы жазуулар:', stats['total_records']],
-        ['Катышкандар:', stats['present_count']],
-        ['Катышпагандар:', stats['absent_count']], 
-        ['Кечиккендер:', stats['late_count']],
-        ['Уруксат менен жоктор:', stats['excused_count']],
-        ['Катышуу пайызы:', f"{stats['attendance_percentage']}%"],
-    ]
-    
-    summary_table = Table(summary_data)
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 30))
-    
-    # Attendance Records Table
-    if attendances.exists():
-        elements.append(Paragraph("Катышуу Жазуулары", styles['Heading2']))
-        elements.append(Spacer(1, 10))
-        
-        data = [['Студент', 'Сабак', 'Дата', 'Статус']]
-        for att in attendances[:50]:  # Limit to 50 records for PDF
-            data.append([
-                att.student.name,
-                att.subject.subject_name if att.subject else 'Н/Д',
-                att.date.strftime('%d.%m.%Y'),
-                att.get_status_display()
-            ])
-        
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(table)
-    
-    doc.build(elements)
+    write_detailed_pdf(response, attendances, stats)
     return response
 
 def export_detailed_excel(attendances):
-    """Детальный Excel отчет"""
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="detailed_attendance_report.xlsx"'
-    
-    workbook = Workbook()
-    
-    # Main data sheet
-    worksheet = workbook.active
-    worksheet.title = "Катышуу Жазуулары"
-    
-    # Headers
-    headers = ['Студент', 'Группа', 'Сабак', 'Дата', 'Статус', 'Жаратылган күнү', 'Жараткан']
-    for col_num, header in enumerate(headers, 1):
-        worksheet.cell(row=1, column=col_num, value=header)
-    
-    # Data
-    for row_num, att in enumerate(attendances, 2):
-        worksheet.cell(row=row_num, column=1, value=att.student.name)
-        worksheet.cell(row=row_num, column=2, value=att.student.group.name if att.student.group else 'Н/Д')
-        worksheet.cell(row=row_num, column=3, value=att.subject.subject_name if att.subject else 'Н/Д')
-        worksheet.cell(row=row_num, column=4, value=att.date.strftime('%d.%m.%Y'))
-        worksheet.cell(row=row_num, column=5, value=att.get_status_display())
-        worksheet.cell(row=row_num, column=6, value=att.date.strftime('%d.%m.%Y'))
-        worksheet.cell(row=row_num, column=7, value=att.created_by.username if att.created_by else 'Система')
-    
-    # Statistics sheet
-    stats_sheet = workbook.create_sheet("Статистика")
-    stats_data = [
-        ['Көрсөткүч', 'Мааниси'],
-        ['Жалпы жазуулар', attendances.count()],
-        ['Катышкандар', attendances.filter(status='Present').count()],
-        ['Катышпагандар', attendances.filter(status='Absent').count()],
-        ['Кечиккендер', attendances.filter(status='Late').count()],
-        ['Уруксат менен жоктор', attendances.filter(status='Excused').count()],
-    ]
-    
-    for row_num, (label, value) in enumerate(stats_data, 1):
-        stats_sheet.cell(row=row_num, column=1, value=label)
-        stats_sheet.cell(row=row_num, column=2, value=value)
-    
-    workbook.save(response)
-    return response
+    """Детальный Excel отчет (write-only workbook, саптар агым менен)"""
+    return excel_file_response(write_detailed_excel, attendances, 'detailed_attendance_report.xlsx')
 
+@login_required
+@user_passes_test(is_admin_or_manager)
 def export_pdf(request):
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="report.pdf"'
@@ -1549,24 +1378,11 @@ def export_pdf(request):
     p.save()
     return response
 
+@login_required
+@user_passes_test(is_admin_or_manager)
 def export_excel(request):
-    wb = Workbook()
-    ws = wb.active
-    ws['A1'] = 'Студент'
-    ws['B1'] = 'Сабак'
-    ws['C1'] = 'Статус'
-    ws['D1'] = 'Дата'
-    row = 2
-    for att in Attendance.objects.all():
-        ws[f'A{row}'] = att.student.name
-        ws[f'B{row}'] = att.subject.subject_name if att.subject else 'Н/Д'
-        ws[f'C{row}'] = att.status
-        ws[f'D{row}'] = str(att.date)
-        row += 1
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="report.xlsx"'
-    wb.save(response)
-    return response
+    """Бардык катышуунун жөнөкөй Excel отчету (write-only workbook, саптар агым менен)"""
+    return excel_file_response(write_simple_excel, Attendance.objects.all(), 'report.xlsx')
 
 # Жалпы расписание view (ролдорго жараша багыттоо)
 @login_required
@@ -1602,7 +1418,7 @@ def submit_leave_request(request):
         linked_students = user_profile.parent_profiles.all()
         if linked_students.exists():
             student = linked_students.first()  # Биринчи балды алуу
-            print(f"DEBUG: Parent {user_profile.user.username} submitting leave for student {student.name}")
+            logger.debug("Parent %s submitting leave for student %s", user_profile.user.username, student.name)
         else:
             messages.error(request, _('No student is linked to you.'))
             return redirect('dashboard')
@@ -1723,8 +1539,10 @@ def approve_leave_request(request, request_id):
 @login_required
 def notifications(request):
     """Колдонуучунун билдирмелерин көрсөтүү"""
-    user_notifications = Notification.objects.filter(recipient=request.user)
-    unread_count = user_notifications.filter(is_read=False).count()
+    # Жеке жана жалпы билдирмелер бир тизмеде
+    scope = sync.user_scope(request.user)
+    user_notifications = broadcasts.load_feed(broadcasts.feed(request.user, scope), scope)
+    unread_count = broadcasts.unread_total(scope)
     
     return render(request, 'notifications/list.html', {
         'notifications': user_notifications,
@@ -1747,7 +1565,12 @@ def mark_notification_read(request, notification_id):
 @login_required
 def mark_all_notifications_read(request):
     """Бардык билдирмелерди окулган деп белгилөө"""
-    Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+    unread = list(Notification.objects.filter(recipient=request.user, is_read=False).only('id', 'recipient_id'))
+    updated = Notification.objects.filter(pk__in=[n.pk for n in unread], is_read=False).update(is_read=True)
+    # UPDATE сигналдарды чакырбайт - sync журналы жана эсептегич түздөн-түз
+    sync.record_changes(unread)
+    unread_counter.notifications_read(request.user.pk, updated)
+    broadcasts.mark_all_read(sync.user_scope(request.user))
     messages.success(request, 'Бардык билдирмелер окулган деп белгиленди.')
     return redirect('notifications')
 
@@ -1761,34 +1584,20 @@ def send_bulk_notification(request):
         recipient_type = request.POST.get('recipient_type')  # all_students, all_parents, specific_group
         group_id = request.POST.get('group_id')
         
-        recipients = []
-        
-        if recipient_type == 'all_students':
-            recipients = User.objects.filter(userprofile__role='STUDENT')
-        elif recipient_type == 'all_parents':
-            recipients = User.objects.filter(userprofile__role='PARENT')
-        elif recipient_type == 'specific_group' and group_id:
-            recipients = User.objects.filter(
-                student__group_id=group_id
-            )
+        role = broadcasts.RECIPIENT_ROLES.get(recipient_type)
+        group = None
+        if recipient_type == 'specific_group':
+            group = Group.objects.filter(pk=group_id).first() if group_id else None
+            if group is None:
+                role = None
         
-        # Билдирмелерди түзүү
-        notifications_to_create = []
-        for recipient in recipients:
-            notifications_to_create.append(
-                Notification(
-                    recipient=recipient,
-                    sender=request.user,
-                    notification_type='GENERAL',
-                    title=title,
-                    message=message
-                )
-            )
+        # Бир жалпы билдирме - алуучулар окууда аудиториядан аныкталат (core.broadcasts)
+        recipients = 0
+        if role:
+            broadcast = broadcasts.send(request.user, title, message, role=role, group=group)
+            recipients = broadcasts.recipients(broadcast).count()
         
-        # Bulk create для эффективности
-        Notification.objects.bulk_create(notifications_to_create)
-        
-        messages.success(request, f'{len(recipients)} колдонуучуга билдирме жөнөтүлдү.')
+        messages.success(request, f'{recipients} колдонуучуга билдирме жөнөтүлдү.')
         return redirect('notifications')
     
     groups = Group.objects.all()
@@ -2431,7 +2240,7 @@ def mark_student_attendance(request, schedule_id):
 def advanced_report(request):
     """Админ жана менеджер үчүн кеңири отчет системасы"""
     from django.utils import timezone
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     from django.db.models import Count, Q, Avg
     from django.http import JsonResponse
     import json
@@ -2442,12 +2251,21 @@ def advanced_report(request):
     report_type = request.GET.get('report_type', 'overview')
     student_id = request.GET.get('student_id')
     group_id = request.GET.get('group_id')
-    course_id = request.GET.get('course_id')
-    subject_id = request.GET.get('subject_id')
-    teacher_id = request.GET.get('teacher_id')
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
-    status_filter = request.GET.get('status_filter')  # Present, Absent, Late
+    # course_id, subject_id, teacher_id, status_filter - reports.advanced_report_filter окуйт
+    
+    # Excel экспорт - фондук жумуш катары (ошол эле фильтрлер менен)
+    if request.GET.get('export') == 'excel':
+        try:
+            job = submit_job(request.user, 'advanced_report', request.GET)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        return JsonResponse({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/v1/report-jobs/{job.id}/',
+        }, status=202)
     
     # Дата анализи
     today = timezone.now().date()
@@ -2455,13 +2273,7 @@ def advanced_report(request):
         start_date = (today - timedelta(days=30)).strftime('%Y-%m-%d')
     if not end_date:
         end_date = today.strftime('%Y-%m-%d')
-    
-    try:
-        parsed_start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        parsed_end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-    except ValueError:
-        parsed_start_date = today - timedelta(days=30)
-        parsed_end_date = today
+    parsed_start_date, parsed_end_date = advanced_report_period(start_date, end_date, today)
     
     # Базалык данныйлар
     context.update({
@@ -2476,20 +2288,7 @@ def advanced_report(request):
     })
     
     # Attendance базалык filter
-    attendance_filter = Q(date__range=[parsed_start_date, parsed_end_date])
-    
-    if student_id:
-        attendance_filter &= Q(student_id=student_id)
-    if group_id:
-        attendance_filter &= Q(student__group_id=group_id)
-    if course_id:
-        attendance_filter &= Q(student__course_id=course_id)
-    if subject_id:
-        attendance_filter &= Q(schedule__subject_id=subject_id)
-    if teacher_id:
-        attendance_filter &= Q(schedule__teacher_id=teacher_id)
-    if status_filter:
-        attendance_filter &= Q(status=status_filter)
+    attendance_filter = advanced_report_filter(request.GET, parsed_start_date, parsed_end_date)
     
     # Отчет түрүнө жараша данныйлар
     if report_type == 'overview':
@@ -2534,93 +2333,51 @@ def advanced_report(request):
             
             context['student_attendances'] = student_attendances
             
-            # Студенттин статистикасы
-            student_stats = {
-                'total': student_attendances.count(),
-                'present': student_attendances.filter(status='Present').count(),
-                'absent': student_attendances.filter(status='Absent').count(),
-                'late': student_attendances.filter(status='Late').count(),
-                'excused': student_attendances.filter(status='Excused').count(),
-            }
-            
-            if student_stats['total'] > 0:
-                student_stats['attendance_rate'] = round(
-                    (student_stats['present'] + student_stats['late']) / student_stats['total'] * 100, 2
-                )
-            else:
-                student_stats['attendance_rate'] = 0
-                
+            # Студенттин статистикасы - бир aggregate суроо
+            student_stats = get_status_counts(student_attendances)
+            student_stats['attendance_rate'] = attendance_rate(student_stats)
             context['student_stats'] = student_stats
             
-            # Сабактар боюнча статистика
+            # Сабактар боюнча статистика - бир GROUP BY суроосу
             subject_breakdown = []
-            subjects_attended = student_attendances.values('schedule__subject__id', 'schedule__subject__subject_name').distinct()
-            
-            for subj in subjects_attended:
-                subj_attendances = student_attendances.filter(schedule__subject__id=subj['schedule__subject__id'])
-                subj_stats = {
-                    'subject_name': subj['schedule__subject__subject_name'],
-                    'total': subj_attendances.count(),
-                    'present': subj_attendances.filter(status='Present').count(),
-                    'absent': subj_attendances.filter(status='Absent').count(),
-                    'late': subj_attendances.filter(status='Late').count(),
-                    'excused': subj_attendances.filter(status='Excused').count(),
-                }
-                if subj_stats['total'] > 0:
-                    subj_stats['attendance_rate'] = round(
-                        (subj_stats['present'] + subj_stats['late']) / subj_stats['total'] * 100, 1
-                    )
-                else:
-                    subj_stats['attendance_rate'] = 0
+            per_subject = get_status_breakdown(
+                student_attendances, 'schedule__subject__id', 'schedule__subject__subject_name'
+            )
+            for subj_stats in sorted(per_subject, key=lambda row: row['schedule__subject__subject_name'] or ''):
+                subj_stats.pop('schedule__subject__id')
+                subj_stats['subject_name'] = subj_stats.pop('schedule__subject__subject_name')
+                subj_stats['attendance_rate'] = attendance_rate(subj_stats, 1)
                 subject_breakdown.append(subj_stats)
             
             context['subject_breakdown'] = subject_breakdown
             
-            # Күндөр боюнча тренд (соңку 30 күн)
+            # Күндөр боюнча тренд - бир GROUP BY date суроосу (жаңы күндөр биринчи)
+            daily_counts = get_daily_status_counts(student_attendances)
             daily_attendance = {}
-            for attendance in student_attendances:
-                date_str = attendance.date.strftime('%Y-%m-%d')
-                if date_str not in daily_attendance:
-                    daily_attendance[date_str] = {'present': 0, 'absent': 0, 'late': 0, 'excused': 0}
-                
-                if attendance.status == 'Present':
-                    daily_attendance[date_str]['present'] += 1
-                elif attendance.status == 'Absent':
-                    daily_attendance[date_str]['absent'] += 1
-                elif attendance.status == 'Late':
-                    daily_attendance[date_str]['late'] += 1
-                elif attendance.status == 'Excused':
-                    daily_attendance[date_str]['excused'] += 1
+            for day in sorted(daily_counts, reverse=True):
+                counts = daily_counts[day]
+                daily_attendance[day.strftime('%Y-%m-%d')] = {
+                    'present': counts['present'],
+                    'absent': counts['absent'],
+                    'late': counts['late'],
+                    'excused': counts['excused'],
+                }
             
             # JSON форматка айландыруу (график үчүн)
-            import json
             context['daily_attendance_json'] = json.dumps(daily_attendance)
         else:
             # Эгерде студент тандалбаса, бардык студенттердин жалпы статистикасын көрсөтөбүз
+            # Студенттердин тизмеси + студент боюнча бир GROUP BY суроосу
             all_students = Student.objects.all().order_by('group__name', 'name')
+            per_student = get_group_status_counts(
+                Attendance.objects.filter(attendance_filter), 'student_id'
+            )
             
             students_with_stats = []
             for student in all_students:
-                student_attendances = Attendance.objects.filter(
-                    attendance_filter, student=student
-                )
-                
-                stats = {
-                    'student': student,
-                    'total': student_attendances.count(),
-                    'present': student_attendances.filter(status='Present').count(),
-                    'absent': student_attendances.filter(status='Absent').count(),
-                    'late': student_attendances.filter(status='Late').count(),
-                    'excused': student_attendances.filter(status='Excused').count(),
-                }
-                
-                if stats['total'] > 0:
-                    stats['attendance_rate'] = round(
-                        (stats['present'] + stats['late']) / stats['total'] * 100, 1
-                    )
-                else:
-                    stats['attendance_rate'] = 0
-                
+                stats = dict(per_student.get(student.id, EMPTY_COUNTS))
+                stats['student'] = student
+                stats['attendance_rate'] = attendance_rate(stats, 1)
                 students_with_stats.append(stats)
             
             context['students_with_stats'] = students_with_stats
@@ -2635,91 +2392,47 @@ def advanced_report(request):
             group_students = Student.objects.filter(group=group)
             context['group_students'] = group_students
             
-            # Ар бир студенттин статистикасы
+            # Ар бир студенттин статистикасы - бир GROUP BY суроосу
+            per_student = get_group_status_counts(
+                Attendance.objects.filter(attendance_filter, student__group=group), 'student_id'
+            )
             student_stats = []
             for student in group_students:
-                student_attendances = Attendance.objects.filter(
-                    attendance_filter, student=student
-                )
-                
-                stats = {
-                    'student': student,
-                    'total': student_attendances.count(),
-                    'present': student_attendances.filter(status='Present').count(),
-                    'absent': student_attendances.filter(status='Absent').count(),
-                    'late': student_attendances.filter(status='Late').count(),
-                }
-                
-                if stats['total'] > 0:
-                    stats['attendance_rate'] = round(
-                        (stats['present'] + stats['late']) / stats['total'] * 100, 2
-                    )
-                else:
-                    stats['attendance_rate'] = 0
-                    
+                stats = dict(per_student.get(student.id, EMPTY_COUNTS))
+                stats['student'] = student
+                stats['attendance_rate'] = attendance_rate(stats)
                 student_stats.append(stats)
             
             context['student_statistics'] = student_stats
             
     elif report_type == 'subject_performance':
-        # Сабактар боюнча анализ
+        # Сабактар боюнча анализ - сабак боюнча бир GROUP BY суроосу
+        per_subject = get_group_status_counts(
+            Attendance.objects.filter(attendance_filter), 'schedule__subject_id'
+        )
         subject_stats = []
-        subjects = Subject.objects.all()
-        
-        for subject in subjects:
-            subject_attendances = Attendance.objects.filter(
-                attendance_filter, schedule__subject=subject
-            )
-            
-            stats = {
-                'subject': subject,
-                'total': subject_attendances.count(),
-                'present': subject_attendances.filter(status='Present').count(),
-                'absent': subject_attendances.filter(status='Absent').count(),
-                'late': subject_attendances.filter(status='Late').count(),
-            }
-            
-            if stats['total'] > 0:
-                stats['attendance_rate'] = round(
-                    (stats['present'] + stats['late']) / stats['total'] * 100, 2
-                )
-            else:
-                stats['attendance_rate'] = 0
-                
-            if stats['total'] > 0:  # Эгерде attendance болсо гана кошабыз
-                subject_stats.append(stats)
+        # Attendance болгон сабактар гана
+        for subject in Subject.objects.filter(pk__in=[pk for pk in per_subject if pk is not None]).order_by('pk'):
+            stats = per_subject[subject.pk]
+            stats['subject'] = subject
+            stats['attendance_rate'] = attendance_rate(stats)
+            subject_stats.append(stats)
         
         # Attendance rate боюнча иретке салуу
         subject_stats.sort(key=lambda x: x['attendance_rate'], reverse=True)
         context['subject_statistics'] = subject_stats
         
     elif report_type == 'teacher_report':
-        # Мугалимдер боюнча отчет
+        # Мугалимдер боюнча отчет - мугалим боюнча бир GROUP BY суроосу
+        per_teacher = get_group_status_counts(
+            Attendance.objects.filter(attendance_filter), 'schedule__teacher_id'
+        )
         teacher_stats = []
-        teachers = Teacher.objects.all()
-        
-        for teacher in teachers:
-            teacher_attendances = Attendance.objects.filter(
-                attendance_filter, schedule__teacher=teacher
-            )
-            
-            stats = {
-                'teacher': teacher,
-                'total': teacher_attendances.count(),
-                'present': teacher_attendances.filter(status='Present').count(),
-                'absent': teacher_attendances.filter(status='Absent').count(),
-                'late': teacher_attendances.filter(status='Late').count(),
-            }
-            
-            if stats['total'] > 0:
-                stats['attendance_rate'] = round(
-                    (stats['present'] + stats['late']) / stats['total'] * 100, 2
-                )
-            else:
-                stats['attendance_rate'] = 0
-                
-            if stats['total'] > 0:
-                teacher_stats.append(stats)
+        for teacher in Teacher.objects.filter(pk__in=[pk for pk in per_teacher if pk is not None]).order_by('pk'):
+            stats = per_teacher[teacher.pk]
+            stats['teacher'] = teacher
+            stats['attendance_rate'] = attendance_rate(stats)
+            teacher_stats.append(stats)
         
         teacher_stats.sort(key=lambda x: x['attendance_rate'], reverse=True)
         context['teacher_statistics'] = teacher_stats
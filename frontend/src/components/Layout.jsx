@@ -17,34 +17,75 @@ const Layout = ({ children }) => {
   const [isSearching, setIsSearching] = useState(false)
   const [showResults, setShowResults] = useState(false)
 
-  // Билдирүүлөрдү жүктөө
+  // Окулбаган билдирүүлөр: сервер SSE агымы менен өзү жөнөтөт,
+  // агым жок болсо (WSGI сервер, эски браузер) - мурдагыдай 30 секунд сайын сурам
   useEffect(() => {
+    if (!user) return
+
+    let source = null
+    let interval = null
+    let retry = null
+    let closed = false
+
     const fetchNotifications = async () => {
       try {
-        const response = await api.get('/v1/notifications/')
-        const data = response.data
-        
-        // Окулбаган билдирүүлөрдү эсептөө
-        let notifications = []
-        if (Array.isArray(data)) {
-          notifications = data
-        } else if (data && Array.isArray(data.results)) {
-          notifications = data.results
-        }
-        
-        const unread = notifications.filter(n => !n.is_read).length
-        setUnreadCount(unread)
+        // Сервер эсептегичтен берет - тизмени жүктөп санабайбыз
+        const response = await api.get('/v1/notifications/unread_count/')
+        setUnreadCount(response.data.unread_count || 0)
       } catch (error) {
         console.error('Билдирүүлөрдү жүктөөдө ката:', error)
         setUnreadCount(0)
       }
     }
 
-    if (user) {
+    const startPolling = () => {
       fetchNotifications()
       // Ар 30 секундта жаңылоо
-      const interval = setInterval(fetchNotifications, 30000)
-      return () => clearInterval(interval)
+      interval = setInterval(fetchNotifications, 30000)
+    }
+
+    const connect = async () => {
+      let opened = false
+      try {
+        const { data } = await api.post('/v1/notifications/stream_ticket/')
+        if (closed) return
+        source = new EventSource(
+          `${api.defaults.baseURL}/v1/notifications/stream/?ticket=${encodeURIComponent(data.ticket)}`
+        )
+      } catch (error) {
+        if (!closed) startPolling()
+        return
+      }
+
+      const updateCount = (event) => setUnreadCount(JSON.parse(event.data).unread_count)
+      source.onopen = () => { opened = true }
+      source.addEventListener('unread', updateCount)
+      source.addEventListener('notification', updateCount)
+      source.onerror = () => {
+        // Үзүлгөн туташууну браузер өзү калыбына келтирет - жабылганда гана (тикеттин мөөнөтү өттү,
+        // сервер агымды колдобойт) биз чечебиз
+        if (source.readyState !== EventSource.CLOSED) return
+        source = null
+        if (closed) return
+        if (opened) {
+          retry = setTimeout(connect, 5000)
+        } else {
+          startPolling()
+        }
+      }
+    }
+
+    if (window.EventSource) {
+      connect()
+    } else {
+      startPolling()
+    }
+
+    return () => {
+      closed = true
+      if (source) source.close()
+      clearInterval(interval)
+      clearTimeout(retry)
     }
   }, [user])
 
@@ -31,6 +31,8 @@ function ReportsPage() {
   
   // Loading
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loadingFilters, setLoadingFilters] = useState(true);
 
   // Translations
@@ -164,6 +166,11 @@ function ReportsPage() {
       en: 'Marked At',
       ru: 'Время отметки',
       ky: 'Белгиленген убакыт'
+    },
+    loadMore: {
+      en: 'Load more',
+      ru: 'Загрузить ещё',
+      ky: 'Дагы жүктөө'
     }
   };
 
@@ -210,15 +217,20 @@ function ReportsPage() {
     loadFilterOptions();
   }, [user.role]);
 
-  // Load attendance data
-  const loadAttendanceData = async () => {
+  // Load attendance data (cursor - next page of the keyset-paginated report)
+  const loadAttendanceData = async (cursor = null) => {
     try {
-      setLoading(true);
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
       
       const params = {
         start_date: startDate,
         end_date: endDate
       };
+      if (cursor) params.cursor = cursor;
       
       if (selectedGroup) params.group = selectedGroup;
       if (selectedStudent) params.student = selectedStudent;
@@ -227,12 +239,18 @@ function ReportsPage() {
       if (selectedStatus) params.status = selectedStatus;
       
       const response = await api.get('/v1/reports/attendance/', { params });
-      setAttendanceData(response.data.attendance);
-      setStatistics(response.data.statistics);
+      if (cursor) {
+        setAttendanceData((rows) => [...rows, ...response.data.attendance]);
+      } else {
+        setAttendanceData(response.data.attendance);
+        setStatistics(response.data.statistics);
+      }
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error loading attendance data:', error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -485,6 +503,15 @@ function ReportsPage() {
             </tbody>
           </table>
         )}
+        {!loading && nextCursor && (
+          <button
+            onClick={() => loadAttendanceData(nextCursor)}
+            className="btn-search"
+            disabled={loadingMore}
+          >
+            {loadingMore ? 'Loading...' : txt('loadMore')}
+          </button>
+        )}
       </div>
     </div>
   );
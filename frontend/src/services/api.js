@@ -35,4 +35,24 @@ api.interceptors.response.use(
   }
 )
 
+// Background report jobs - submit, poll status, download the finished file
+export const reportJobsApi = {
+  submit: (kind, params = {}) => api.post('/v1/report-jobs/', { kind, params }),
+  get: (id) => api.get(`/v1/report-jobs/${id}/`),
+  list: () => api.get('/v1/report-jobs/'),
+  remove: (id) => api.delete(`/v1/report-jobs/${id}/`),
+  download: (id) => api.get(`/v1/report-jobs/${id}/download/`, { responseType: 'blob' }),
+
+  // Resolves with the job once it is DONE, rejects when it FAILED
+  async waitFor(id, { interval = 2000, onProgress } = {}) {
+    for (;;) {
+      const { data } = await api.get(`/v1/report-jobs/${id}/`)
+      if (onProgress) onProgress(data)
+      if (data.status === 'DONE') return data
+      if (data.status === 'FAILED') throw new Error(data.message || 'Report job failed')
+      await new Promise((resolve) => setTimeout(resolve, interval))
+    }
+  }
+}
+
 export default api
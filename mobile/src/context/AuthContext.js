@@ -1,6 +1,6 @@
 import React, { createContext, useState, useContext, useEffect } from 'react';
 import AsyncStorage from '@react-native-async-storage/async-storage';
-import api from '../services/api';
+import api, { REFERENCE_STORAGE_KEY, SYNC_STORAGE_KEY } from '../services/api';
 
 const AuthContext = createContext();
 
@@ -56,7 +56,7 @@ export const AuthProvider = ({ children }) => {
 
   const logout = async () => {
     try {
-      await AsyncStorage.multiRemove(['token', 'refresh_token', 'user']);
+      await AsyncStorage.multiRemove(['token', 'refresh_token', 'user', SYNC_STORAGE_KEY, REFERENCE_STORAGE_KEY]);
       setUser(null);
     } catch (error) {
       console.error('Failed to logout:', error);
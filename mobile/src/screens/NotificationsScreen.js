@@ -13,9 +13,12 @@ import {
 } from 'react-native';
 import { useAuth } from '../context/AuthContext';
 import { useLanguage } from '../context/LanguageContext';
-import api from '../services/api';
+import api, { syncApi } from '../services/api';
 import Icon from 'react-native-vector-icons/FontAwesome5';
 
+// Broadcast (audience-wide) notifications have ids like 'b12' and sync as their own collection
+const collectionOf = (id) => (String(id).startsWith('b') ? 'broadcasts' : 'notifications');
+
 const Notifications = () => {
   const { user } = useAuth();
   const { t } = useLanguage();
@@ -31,10 +34,9 @@ const Notifications = () => {
   const fetchNotifications = async () => {
     setLoading(true);
     try {
-      const params = filter !== 'all' ? { status: filter } : {};
-      const response = await api.get('/v1/notifications/', { params });
-      const data = response.data;
-      setNotifications(Array.isArray(data) ? data : data.results || []);
+      // Only notifications changed since the last visit are downloaded
+      const { notifications: rows = [], broadcasts = [] } = await syncApi.pull();
+      setNotifications([...rows, ...broadcasts].sort((a, b) => new Date(b.created_at) - new Date(a.created_at)));
     } catch (error) {
       console.error('Failed to fetch notifications:', error);
       Alert.alert(t('error'), t('error') + ': ' + error.message);
@@ -52,7 +54,8 @@ const Notifications = () => {
 
   const markAsRead = async (notificationId) => {
     try {
-      await api.post(`/v1/notifications/${notificationId}/mark_read/`);
+      const { data } = await api.post(`/v1/notifications/${notificationId}/mark_read/`);
+      await syncApi.apply(collectionOf(notificationId), { upserted: [data] });
       fetchNotifications();
     } catch (error) {
       console.error('Failed to mark as read:', error);
@@ -63,6 +66,9 @@ const Notifications = () => {
   const markAllAsRead = async () => {
     try {
       await api.post('/v1/notifications/mark_all_read/');
+      const read = notifications.map((n) => ({ ...n, is_read: true }));
+      await syncApi.apply('notifications', { upserted: read.filter((n) => collectionOf(n.id) === 'notifications') });
+      await syncApi.apply('broadcasts', { upserted: read.filter((n) => collectionOf(n.id) === 'broadcasts') });
       fetchNotifications();
       Alert.alert(t('success'), t('markAllAsRead'));
     } catch (error) {
@@ -83,6 +89,7 @@ const Notifications = () => {
           onPress: async () => {
             try {
               await api.delete(`/v1/notifications/${notificationId}/`);
+              await syncApi.apply(collectionOf(notificationId), { deleted: [notificationId] });
               fetchNotifications();
               Alert.alert(t('success'), t('deleted') || t('success'));
             } catch (error) {
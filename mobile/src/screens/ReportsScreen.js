@@ -13,7 +13,7 @@ import { Picker } from '@react-native-picker/picker';
 // import DateTimePicker from '@react-native-community/datetimepicker';
 import { useAuth } from '../context/AuthContext';
 import { useLanguage } from '../context/LanguageContext';
-import api from '../services/api';
+import api, { referenceApi } from '../services/api';
 
 export default function ReportsScreen() {
   const { user } = useAuth();
@@ -46,6 +46,8 @@ export default function ReportsScreen() {
 
   // Loading
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loadingFilters, setLoadingFilters] = useState(true);
 
   // Translations
@@ -149,6 +151,11 @@ export default function ReportsScreen() {
       en: 'No data found',
       ru: 'Данные не найдены',
       ky: 'Маалымат табылган жок'
+    },
+    loadMore: {
+      en: 'Load more',
+      ru: 'Загрузить ещё',
+      ky: 'Дагы жүктөө'
     }
   };
 
@@ -171,23 +178,21 @@ export default function ReportsScreen() {
       setLoadingFilters(true);
 
       if (user.role === 'ADMIN' || user.role === 'MANAGER') {
-        const [groupsRes, subjectsRes, teachersRes, studentsRes] = await Promise.all([
-          api.get('/v1/groups/'),
-          api.get('/v1/subjects/'),
-          api.get('/v1/teachers/'),
+        // Reference lists come from the cached snapshot (304 while nothing changed)
+        const [reference, studentsRes] = await Promise.all([
+          referenceApi.load(),
           api.get('/v1/students/')
         ]);
-        // Handle both paginated and non-paginated responses
-        setGroups(Array.isArray(groupsRes.data) ? groupsRes.data : groupsRes.data.results || []);
-        setSubjects(Array.isArray(subjectsRes.data) ? subjectsRes.data : subjectsRes.data.results || []);
-        setTeachers(Array.isArray(teachersRes.data) ? teachersRes.data : teachersRes.data.results || []);
+        setGroups(reference.groups);
+        setSubjects(reference.subjects);
+        setTeachers(reference.teachers);
         setStudents(Array.isArray(studentsRes.data) ? studentsRes.data : studentsRes.data.results || []);
       } else if (user.role === 'TEACHER') {
-        const [subjectsRes, studentsRes] = await Promise.all([
-          api.get('/v1/subjects/'),
+        const [reference, studentsRes] = await Promise.all([
+          referenceApi.load(),
           api.get('/v1/students/')
         ]);
-        setSubjects(Array.isArray(subjectsRes.data) ? subjectsRes.data : subjectsRes.data.results || []);
+        setSubjects(reference.subjects);
         setStudents(Array.isArray(studentsRes.data) ? studentsRes.data : studentsRes.data.results || []);
       }
     } catch (error) {
@@ -204,14 +209,20 @@ export default function ReportsScreen() {
     }
   }, [loadingFilters]);
 
-  const loadAttendanceData = async () => {
+  // cursor - next page of the keyset-paginated report
+  const loadAttendanceData = async (cursor = null) => {
     try {
-      setLoading(true);
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
 
       const params = {
         start_date: startDate.toISOString().split('T')[0],
         end_date: endDate.toISOString().split('T')[0]
       };
+      if (cursor) params.cursor = cursor;
 
       if (selectedGroup) params.group = selectedGroup;
       if (selectedStudent) params.student = selectedStudent;
@@ -220,12 +231,18 @@ export default function ReportsScreen() {
       if (selectedStatus) params.status = selectedStatus;
 
       const response = await api.get('/v1/reports/attendance/', { params });
-      setAttendanceData(response.data.attendance);
-      setStatistics(response.data.statistics);
+      if (cursor) {
+        setAttendanceData((rows) => [...rows, ...response.data.attendance]);
+      } else {
+        setAttendanceData(response.data.attendance);
+        setStatistics(response.data.statistics);
+      }
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error loading attendance data:', error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -512,6 +529,19 @@ export default function ReportsScreen() {
             </View>
           ))
         )}
+        {!loading && nextCursor && (
+          <TouchableOpacity
+            style={styles.searchButton}
+            onPress={() => loadAttendanceData(nextCursor)}
+            disabled={loadingMore}
+          >
+            {loadingMore ? (
+              <ActivityIndicator color="white" />
+            ) : (
+              <Text style={styles.searchButtonText}>{txt('loadMore')}</Text>
+            )}
+          </TouchableOpacity>
+        )}
       </View>
     </ScrollView>
   );
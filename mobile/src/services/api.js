@@ -4,6 +4,11 @@ import Constants from 'expo-constants';
 
 const API_BASE_URL = Constants.expoConfig?.extra?.apiUrl || 'http://127.0.0.1:8000/api';
 
+// Local copy of the delta-synced collections (see syncApi)
+export const SYNC_STORAGE_KEY = 'sync_state';
+// Reference data snapshot and its ETag (see referenceApi)
+export const REFERENCE_STORAGE_KEY = 'reference_snapshot';
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -36,7 +41,7 @@ api.interceptors.response.use(
   async (error) => {
     if (error.response?.status === 401) {
       try {
-        await AsyncStorage.multiRemove(['token', 'refresh_token', 'user']);
+        await AsyncStorage.multiRemove(['token', 'refresh_token', 'user', SYNC_STORAGE_KEY, REFERENCE_STORAGE_KEY]);
       } catch (e) {
         console.error('Error clearing storage:', e);
       }
@@ -45,4 +50,109 @@ api.interceptors.response.use(
   }
 );
 
+// Background report jobs - submit, poll status, download the finished file
+export const reportJobsApi = {
+  submit: (kind, params = {}) => api.post('/v1/report-jobs/', { kind, params }),
+  get: (id) => api.get(`/v1/report-jobs/${id}/`),
+  list: () => api.get('/v1/report-jobs/'),
+  remove: (id) => api.delete(`/v1/report-jobs/${id}/`),
+  download: (id) => api.get(`/v1/report-jobs/${id}/download/`, { responseType: 'blob' }),
+
+  // Resolves with the job once it is DONE, rejects when it FAILED
+  async waitFor(id, { interval = 2000, onProgress } = {}) {
+    for (;;) {
+      const { data } = await api.get(`/v1/report-jobs/${id}/`);
+      if (onProgress) onProgress(data);
+      if (data.status === 'DONE') return data;
+      if (data.status === 'FAILED') throw new Error(data.message || 'Report job failed');
+      await new Promise((resolve) => setTimeout(resolve, interval));
+    }
+  },
+};
+
+// Attendance history in compact (columnar) mode - rows are rebuilt on the device.
+// Pass the returned `next` URL to load the following page.
+export const attendanceHistoryApi = {
+  async load(params = {}, next = null) {
+    const { data } = next
+      ? await api.get(next)
+      : await api.get('/v1/attendance/history/', { params: { ...params, compact: 1 } });
+    const rows = data.ids.map((id, i) => ({
+      id,
+      date: data.dates[i],
+      status: data.statuses[data.status[i]],
+      student_id: data.student_ids[i],
+      student_name: data.students[data.student_ids[i]],
+      subject_id: data.subject_ids[i],
+      subject_name: data.subject_ids[i] != null ? data.subjects[data.subject_ids[i]] : null,
+      schedule_id: data.schedule_ids[i],
+    }));
+    return { rows, next: data.next };
+  },
+};
+
+// Delta sync - schedules, attendance, notifications and leave requests are kept on the
+// device and only rows changed since the stored token are downloaded.
+// reset=true replaces the local copy (first sync, expired token or changed group/children).
+export const syncApi = {
+  async load() {
+    const raw = await AsyncStorage.getItem(SYNC_STORAGE_KEY);
+    return raw ? JSON.parse(raw) : { token: null, collections: {} };
+  },
+
+  merge(state, name, { upserted = [], deleted = [] }) {
+    const rows = state.collections[name] || {};
+    upserted.forEach((row) => { rows[row.id] = row; });
+    deleted.forEach((id) => { delete rows[id]; });
+    state.collections[name] = rows;
+  },
+
+  // Downloads all pending changes and resolves with { collection: [rows] }
+  async pull() {
+    const state = await this.load();
+    let more = true;
+    while (more) {
+      const params = state.token != null ? { token: state.token } : {};
+      const { data } = await api.get('/v1/sync/', { params });
+      if (data.reset) state.collections = {};
+      Object.entries(data.changes).forEach(([name, changes]) => this.merge(state, name, changes));
+      state.token = data.token;
+      more = data.has_more;
+    }
+    await AsyncStorage.setItem(SYNC_STORAGE_KEY, JSON.stringify(state));
+    return Object.fromEntries(
+      Object.entries(state.collections).map(([name, rows]) => [name, Object.values(rows)])
+    );
+  },
+
+  // Applies the result of the device's own write right away - the next pull
+  // may deliver the same change again, which is harmless
+  async apply(name, changes) {
+    const state = await this.load();
+    this.merge(state, name, changes);
+    await AsyncStorage.setItem(SYNC_STORAGE_KEY, JSON.stringify(state));
+  },
+
+  clear: () => AsyncStorage.removeItem(SYNC_STORAGE_KEY),
+};
+
+// Courses, groups, subjects, teachers and time slots in one response. The stored copy is
+// revalidated with If-None-Match - the server answers 304 without a body while it is current.
+export const referenceApi = {
+  async load() {
+    const raw = await AsyncStorage.getItem(REFERENCE_STORAGE_KEY);
+    const cached = raw ? JSON.parse(raw) : null;
+    const response = await api.get('/v1/reference/', {
+      headers: cached ? { 'If-None-Match': cached.etag } : {},
+      validateStatus: (status) => status === 200 || status === 304,
+    });
+    if (response.status === 304 && cached) return cached.data;
+    await AsyncStorage.setItem(
+      REFERENCE_STORAGE_KEY,
+      JSON.stringify({ etag: response.headers.etag, data: response.data })
+    );
+    return response.data;
+  },
+};
+
 export default api;